@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+检查提示词与输出的token预算：
+
+- 期刊示例过长、超出 max_prompt_tokens 时先裁掉排在后面的示例段落，主题等输入保持不变，记录裁剪掉的token数；
+- 裁掉示例后仍放不下时压缩其余输入的空白：行首缩进保留，待精炼的框架正文原样不动；
+- 裁剪后仍放不进预算的请求在发送前被拒绝（模型调用数为 0），invoke 接口返回 413，流式接口以带 413 的 error 事件结束；
+- 各节点的 max_tokens 按配置设置到 OpenAI/Anthropic/Gemini 模型上，未配置时生成与精炼按 max_framework_length 留出余量；
+- 结构化输出（8 个小节的提纲、逐节修改意见）的工具调用 JSON 放得进按小节数计算的输出上限，不会被截断。
+
+用法：python benchmarks/bench_budget.py
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from langchain_anthropic import ChatAnthropic
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from fake_llm import FakeChatModel, initial_state
+
+from agent.budget import OUTPUT_HEADROOM, PromptTooLargeError, count_message_tokens, token_counter, with_output_limit
+from agent.clients import llm_registry, register_provider
+from agent.llm_call import estimate_tokens
+from agent.tools_and_schemas import FrameworkCritique, FrameworkOutline, FrameworkSection, SectionRevision
+
+model = FakeChatModel(latency=0.2, output_tokens=20)
+register_provider("fake", lambda key, pools: model, provider="fake")
+llm_registry.clear()
+
+from agent import graph  # noqa: E402
+from agent.app import app  # noqa: E402
+from agent.coalesce import SingleFlight, set_single_flight  # noqa: E402
+from agent.llm_call import arun_llm_call  # noqa: E402
+
+EXAMPLES = "\n\n".join(f"示例段落 {i}：" + "理论框架包括研究背景、研究问题与假设。" * 20 for i in range(30))
+
+
+def check_trimming() -> bool:
+    state = {**initial_state(), "max_prompt_tokens": 2000}
+    call = graph._generation_request(state)
+    call.inputs["journal_examples"] = EXAMPLES
+    messages = call.messages
+    kept = call.inputs["journal_examples"].count("示例段落")
+    print(f"裁剪: 提示词 {call.prompt_tokens} token（上限 2000），裁掉 {call.trimmed_tokens} token，示例保留 {kept}/30 段")
+    return (
+        call.prompt_tokens <= 2000 and call.trimmed_tokens > 0 and 0 < kept < 30
+        and state["paper_topic"] in "".join(str(message.content) for message in messages)
+        and call.report()["trimmed_tokens"] == call.trimmed_tokens
+    )
+
+
+def check_compression() -> bool:
+    framework = "\n".join(f"{i}. 第{i}部分\n    - 子项 {i}.1\n        - 细节 {i}.1.1" for i in range(1, 6))
+    state = {**initial_state(), "current_framework": framework, "journal_requirements": "期刊要求" + " " * 3000 + "\n    篇幅  8000字"}
+    call = graph._refinement_request(state)
+    call.inputs["journal_examples"] = ""
+    full = count_message_tokens(call.prompt.format_messages(**call.inputs), call.model)
+    call.max_prompt_tokens = full - 100
+    call.messages
+    requirements = call.inputs["journal_requirements"]
+    print(f"压缩空白: 提示词 {full} -> {call.prompt_tokens} token，框架正文{'未改动' if call.inputs['current_framework'] == framework else '被改动'}，"
+          f"其余输入的行首缩进{'保留' if requirements.endswith(chr(10) + '    篇幅 8000字') else '丢失'}")
+    return call.inputs["current_framework"] == framework and requirements == "期刊要求\n    篇幅 8000字" and call.prompt_tokens <= full - 100
+
+
+async def check_rejection() -> bool:
+    state = {**initial_state(), "current_framework": "框架内容。" * 5000, "max_prompt_tokens": 2000}
+    call = graph._refinement_request(state)
+    model.calls = 0
+    start = time.perf_counter()
+    try:
+        await arun_llm_call(call)
+        rejected = False
+    except PromptTooLargeError as error:
+        rejected = True
+        print(f"拒绝: {error}，耗时 {(time.perf_counter() - start) * 1000:.1f}ms，模型调用 {model.calls} 次")
+
+    set_single_flight(SingleFlight(enabled=False))
+    params = {
+        key: value for key, value in initial_state().items()
+        if key not in ("messages", "current_framework", "refinement_count", "final_framework")
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post("/paper-framework/invoke", params={**params, "max_prompt_tokens": 50}, json=[])
+        stream = await client.post("/paper-framework/stream", params={**params, "max_prompt_tokens": 50}, json=[])
+    events = [block for block in stream.text.split("\n\n") if block.startswith("event: error")]
+    error = json.loads(events[-1].split("data: ", 1)[1]) if events else {}
+    print(f"接口: max_prompt_tokens=50 时 invoke 返回 {response.status_code}，"
+          f"流式接口以 error 事件结束（status {error.get('status')}，节点 {error.get('node')}）")
+    streamed = stream.text.rstrip().split("\n\n")[-1].startswith("event: error") and error.get("status") == 413
+    return rejected and model.calls == 0 and response.status_code == 413 and streamed
+
+
+def check_output_limits() -> bool:
+    models = {
+        "openai": ChatOpenAI(model="gpt-4o", api_key="sk-bench"),
+        "anthropic": ChatAnthropic(model="claude-sonnet-4-20250514", api_key="sk-bench"),
+        "google": ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key="bench"),
+    }
+    limited = {provider: with_output_limit(llm, provider, 1234) for provider, llm in models.items()}
+    applied = {
+        "openai": limited["openai"].max_tokens,
+        "anthropic": limited["anthropic"].max_tokens,
+        "google": limited["google"].max_output_tokens,
+    }
+    print(f"模型参数: {applied}，原模型未改动: {models['openai'].max_tokens is None}")
+    ok = all(value == 1234 for value in applied.values()) and models["openai"].max_tokens is None
+
+    state = initial_state()
+    default = graph._generation_request(state).output_limit
+    configured = graph._generation_request(state, {"configurable": {"generate_max_tokens": 800}}).output_limit
+    validate = graph._validation_request(state, {"configurable": {"validate_max_tokens": 300}}).output_limit
+    print(f"节点输出上限: 生成默认 {default}，generate_max_tokens=800 时 {configured}，validate_max_tokens=300 时 {validate}")
+    return ok and default == int(3000 * OUTPUT_HEADROOM) and configured == 800 and validate == 300
+
+
+def structured_tokens(result: BaseModel) -> int:
+    """工具调用参数 JSON 的token数，取分词与估计中较大的一个"""
+    arguments = json.dumps(result.model_dump(), ensure_ascii=False)
+    return max(token_counter("gpt-4o")(arguments), estimate_tokens(arguments))
+
+
+def check_structured_limits() -> bool:
+    state = initial_state()
+    sections = [
+        FrameworkSection(
+            section_name=f"第{i}部分：知识图谱驱动的问题生成机制",
+            key_points=[f"要点{j}：阐明低资源语言场景下知识图谱构建与问题类型预测之间的关系及其理论依据" for j in range(4)],
+        )
+        for i in range(1, 9)
+    ]
+    outline = FrameworkOutline(sections=sections)
+    outline_limit = graph._outline_request(state, {"configurable": {"max_framework_sections": 8}}).output_limit
+
+    state["current_framework"] = "\n\n".join(f"## {section.section_name}\n" + "\n".join(section.key_points) for section in sections)
+    critique = FrameworkCritique(revisions=[
+        SectionRevision(section_name=section.section_name, issues=[f"问题{j}：论证不充分，缺少与核心构念对应的文献支撑和操作化定义" for j in range(3)])
+        for section in sections
+    ])
+    critique_limit = graph._critique_request(state).output_limit
+    print(f"结构化输出上限: 8 节提纲 {structured_tokens(outline)} token / 上限 {outline_limit}，"
+          f"逐节修改意见 {structured_tokens(critique)} token / 上限 {critique_limit}（原先固定为 {int(300 * OUTPUT_HEADROOM)}）")
+    return structured_tokens(outline) <= outline_limit and structured_tokens(critique) <= critique_limit
+
+
+async def main() -> bool:
+    counter = token_counter("gpt-4o")
+    print(f"gpt-4o 计数方式: {'tiktoken' if counter.__name__ == '<lambda>' else '估计（tiktoken 编码表不可用）'}")
+    results = [check_trimming(), check_compression(), await check_rejection(), check_output_limits(), check_structured_limits()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    print("✅ 提示词在预算内裁剪，超限请求提前拒绝，输出上限按节点生效" if ok else "❌ token预算未按预期工作")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+检查点的两个指标：
+
+- 每步写入开销：同样的运行分别不启用检查点、使用内存检查点和SQLite检查点，比较平均每个超步多出的耗时；
+- 断点续跑：第 LOOPS 轮精炼时服务商超时，从检查点继续后只补做未完成的调用，总调用数只比不中断的运行多失败的那一次。
+
+用法：python benchmarks/bench_checkpoint.py [运行次数]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fake_llm import FakeChatModel, FakeTimeoutError, initial_state
+
+from agent.checkpoint import open_checkpointer, thread_config
+from agent.clients import llm_registry, register_provider
+from agent.graph import create_paper_framework_graph
+
+LOOPS = 5
+# 每步额外耗时的上限（毫秒），真实的LLM调用通常需要数秒
+MAX_STEP_OVERHEAD_MS = 5.0
+
+
+def install(model: FakeChatModel) -> None:
+    register_provider("fake", lambda key, pools: model, provider="fake")
+    llm_registry.clear()
+
+
+async def timed_runs(backend: str, runs: int) -> tuple:
+    """返回 (总耗时, 超步数)；假模型不等待，耗时差即为检查点的开销"""
+    install(FakeChatModel(latency=0))
+    async with open_checkpointer(backend) as checkpointer:
+        graph = create_paper_framework_graph(checkpointer)
+        steps = 0
+        start = time.perf_counter()
+        for index in range(runs):
+            config = thread_config({}, f"{backend}-{index}" if checkpointer else None)
+            await graph.ainvoke({**initial_state("fake", LOOPS), "bypass_cache": True}, config)
+        elapsed = time.perf_counter() - start
+        if checkpointer:
+            steps = len([state async for state in graph.aget_state_history(thread_config({}, f"{backend}-0"))])
+    return elapsed, steps
+
+
+async def resume_calls() -> tuple:
+    """返回 (不中断的调用数, 中断并续跑的调用数, 续跑后的精炼轮数)"""
+    model = FakeChatModel(latency=0.001)
+    install(model)
+    async with open_checkpointer("sqlite") as checkpointer:
+        graph = create_paper_framework_graph(checkpointer)
+        state = {**initial_state("fake", LOOPS), "bypass_cache": True}
+        await graph.ainvoke(state, thread_config({}, "baseline"))
+        baseline = model.calls
+
+        # 第 1 次调用为生成，第 LOOPS 次精炼对应第 LOOPS + 1 次调用
+        model = FakeChatModel(latency=0.001, fail_calls={LOOPS + 1})
+        install(model)
+        config = thread_config({}, "interrupted")
+        try:
+            await graph.ainvoke(state, config)
+        except FakeTimeoutError:
+            pass
+        result = await graph.ainvoke(None, config)
+    return baseline, model.calls, result["refinement_count"]
+
+
+async def main(runs: int) -> bool:
+    os.environ["FRAMEWORK_CHECKPOINT_PATH"] = os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite")
+
+    await timed_runs("none", 1)
+    baseline, _ = await timed_runs("none", runs)
+    ok = True
+    for backend in ("memory", "sqlite"):
+        elapsed, steps = await timed_runs(backend, runs)
+        per_step = (elapsed - baseline) / (runs * steps) * 1000
+        print(f"{backend}: {runs} 次运行 {elapsed:.2f}s（不启用 {baseline:.2f}s），每次 {steps} 个检查点，"
+              f"每步额外 {per_step:.2f}ms")
+        ok = ok and per_step < MAX_STEP_OVERHEAD_MS
+
+    uninterrupted, resumed, loops = await resume_calls()
+    print(f"断点续跑: 不中断 {uninterrupted} 次调用，中断后续跑共 {resumed} 次调用，完成 {loops} 轮精炼")
+    return ok and resumed == uninterrupted + 1 and loops == LOOPS
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ok = asyncio.run(main(runs))
+    print("✅ 检查点开销可以忽略，续跑不重做已完成的调用" if ok else "❌ 检查点开销过大或续跑重做了调用")
+    sys.exit(0 if ok else 1)
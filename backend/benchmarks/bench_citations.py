@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+检查引用标记的插入与检索元数据的处理：
+
+- 在 100KB 文档中插入数千个引用标记：单次拼接与逐个切片重建（旧写法）的结果相同、耗时对比；
+- 按随机大小分块流式插入的结果与一次插入相同；
+- get_citations / resolve_urls 与旧写法的结果相同，以及处理数千条 grounding support 的耗时。
+
+用法：python benchmarks/bench_citations.py [引用数]
+"""
+
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from agent.utils import CitationInserter, get_citations, insert_citation_markers, resolve_urls
+
+DOCUMENT_SIZE = 100_000
+CHUNKS = 500
+
+
+def legacy_resolve_urls(urls_to_resolve, id):
+    prefix = f"https://vertexaisearch.cloud.google.com/id/"
+    urls = [site.web.uri for site in urls_to_resolve]
+    resolved_map = {}
+    for idx, url in enumerate(urls):
+        if url not in resolved_map:
+            resolved_map[url] = f"{prefix}{id}-{idx}"
+    return resolved_map
+
+
+def legacy_insert_citation_markers(text, citations_list):
+    sorted_citations = sorted(citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True)
+    modified_text = text
+    for citation_info in sorted_citations:
+        end_idx = citation_info["end_index"]
+        marker_to_insert = ""
+        for segment in citation_info["segments"]:
+            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
+        modified_text = modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
+    return modified_text
+
+
+def legacy_get_citations(response, resolved_urls_map):
+    citations = []
+    candidate = response.candidates[0]
+    for support in candidate.grounding_metadata.grounding_supports:
+        if support.segment is None or support.segment.end_index is None:
+            continue
+        citation = {
+            "start_index": support.segment.start_index if support.segment.start_index is not None else 0,
+            "end_index": support.segment.end_index,
+            "segments": [],
+        }
+        for ind in support.grounding_chunk_indices or []:
+            try:
+                chunk = candidate.grounding_metadata.grounding_chunks[ind]
+                citation["segments"].append({
+                    "label": chunk.web.title.split(".")[:-1][0],
+                    "short_url": resolved_urls_map.get(chunk.web.uri, None),
+                    "value": chunk.web.uri,
+                })
+            except (IndexError, AttributeError, NameError):
+                pass
+        citations.append(citation)
+    return citations
+
+
+def fake_response(rng: random.Random, text_length: int, supports: int) -> SimpleNamespace:
+    """模拟 Gemini 带 grounding_metadata 的响应：同一来源被多次引用，部分索引越界或缺少结束位置"""
+    chunks = [
+        SimpleNamespace(web=SimpleNamespace(uri=f"https://source{i % (CHUNKS // 2)}.example/", title=f"site{i}.com"))
+        for i in range(CHUNKS)
+    ]
+    grounding_supports = []
+    for _ in range(supports):
+        end = rng.randrange(text_length + 1)
+        segment = SimpleNamespace(start_index=rng.choice([None, max(end - 80, 0)]), end_index=rng.choice([end] * 9 + [None]))
+        indices = [rng.randrange(CHUNKS + 5) for _ in range(rng.randint(1, 3))]
+        grounding_supports.append(SimpleNamespace(segment=segment, grounding_chunk_indices=indices))
+    metadata = SimpleNamespace(grounding_chunks=chunks, grounding_supports=grounding_supports)
+    return SimpleNamespace(candidates=[SimpleNamespace(grounding_metadata=metadata)])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def stream(text: str, citations: list, rng: random.Random) -> str:
+    inserter, pieces, pos = CitationInserter(citations), [], 0
+    while pos < len(text):
+        size = rng.randint(1, 400)
+        pieces.append(inserter.feed(text[pos:pos + size]))
+        pos += size
+    return "".join(pieces) + inserter.finish()
+
+
+def main(n: int) -> bool:
+    rng = random.Random(0)
+    text = "".join(rng.choice("理论框架研究方法 abcdefg.\n") for _ in range(DOCUMENT_SIZE))
+    response = fake_response(rng, len(text), n)
+    chunks = response.candidates[0].grounding_metadata.grounding_chunks
+
+    resolved, resolve_ms = timed(resolve_urls, chunks, 7)
+    citations, citations_ms = timed(get_citations, response, resolved)
+    legacy_citations, legacy_citations_ms = timed(legacy_get_citations, response, legacy_resolve_urls(chunks, 7))
+    same_metadata = resolved == legacy_resolve_urls(chunks, 7) and citations == legacy_citations
+    print(f"{len(chunks)} 个来源（去重后 {len(resolved)} 个）、{n} 条 support -> {len(citations)} 个引用："
+          f"resolve_urls {resolve_ms:.2f}ms，get_citations {citations_ms:.2f}ms（旧写法 {legacy_citations_ms:.2f}ms），"
+          f"结果{'相同' if same_metadata else '不同'}")
+
+    inserted, insert_ms = timed(insert_citation_markers, text, citations)
+    legacy, legacy_ms = timed(legacy_insert_citation_markers, text, citations)
+    streamed = stream(text, citations, rng)
+    print(f"{len(text) // 1000}K 字文档插入 {len(citations)} 个引用：单次拼接 {insert_ms:.1f}ms，逐个切片 {legacy_ms:.1f}ms"
+          f"（{legacy_ms / insert_ms:.0f}x），结果{'相同' if inserted == legacy else '不同'}，"
+          f"流式插入{'相同' if streamed == inserted else '不同'}")
+    return same_metadata and inserted == legacy and streamed == inserted and insert_ms < legacy_ms
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    print("✅ 引用标记单次插入，结果与旧写法一致" if ok else "❌ 引用处理未按预期工作")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+检查相同请求的合并：
+
+- N 个输入相同（仅空白不同）的并发 invoke 请求只运行一次图，模型调用数等于单次运行，所有请求得到相同的框架；
+- 关闭合并时模型调用数为 N 倍；
+- 中途加入的流式请求补收已产生的事件，拼出的输出与第一个请求完全相同；
+- 合并的请求创建了事件流却从未读取时不计入，读取事件的请求都断开后运行仍被取消；
+- /metrics 中 framework_requests_total{coalesced="true"} 等于被合并的请求数。
+
+用法：python benchmarks/bench_coalesce.py [并发数]
+"""
+
+import asyncio
+import json
+import sys
+
+import httpx
+
+from fake_llm import FakeChatModel
+
+from agent.clients import llm_registry, register_provider
+
+model = FakeChatModel(latency=0.2, token_delay=0.005, output_tokens=20)
+register_provider("fake", lambda key, pools: model, provider="fake")
+llm_registry.clear()
+
+from agent.app import app  # noqa: E402
+from agent.coalesce import SingleFlight, set_single_flight  # noqa: E402
+
+PARAMS = {
+    "paper_topic": "低资源语言的问题生成",
+    "methodology": "基于知识图谱的Transformer模型",
+    "journal_requirements": "Information Systems Research",
+    "framework_refinement_loops": 1,
+    "framework_model": "fake-model",
+    "api_config": "fake",
+    "bypass_cache": True,
+}
+
+
+async def invoke_all(client: httpx.AsyncClient, n: int) -> list:
+    # 同一个班级提交的题目只在空白上有差异
+    variants = [{**PARAMS, "paper_topic": " " * (i % 3) + PARAMS["paper_topic"]} for i in range(n)]
+    responses = await asyncio.gather(*[client.post("/paper-framework/invoke", params=p, json=[]) for p in variants])
+    for response in responses:
+        response.raise_for_status()
+    return [response.json() for response in responses]
+
+
+async def stream_text(client: httpx.AsyncClient, delay: float) -> tuple:
+    await asyncio.sleep(delay)
+    tokens, coalesced = [], None
+    async with client.stream("POST", "/paper-framework/stream", params=PARAMS, json=[]) as response:
+        coalesced = response.headers["X-Coalesced"]
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "token":
+                tokens.append(json.loads(line[len("data: "):])["delta"])
+    return "".join(tokens), coalesced
+
+
+def exported_coalesced(text: str) -> int:
+    return sum(
+        int(float(line.rsplit(" ", 1)[1])) for line in text.splitlines()
+        if line.startswith("framework_requests_total") and 'coalesced="true"' in line
+    )
+
+
+async def check_unread_follower() -> bool:
+    """第二个请求挂到运行上但从未开始读取事件（例如在响应开始前断开），第一个请求断开后运行应被取消"""
+    async def slow_run():
+        for index in range(50):
+            await asyncio.sleep(0.02)
+            yield {"event": "token", "data": {"delta": str(index)}}
+
+    single_flight = SingleFlight(enabled=True)
+    state = {"paper_topic": "未读取的合并请求"}
+    flight, _ = single_flight.join("stream", state, slow_run)
+    follower, coalesced = single_flight.join("stream", state, slow_run)
+    unread = follower.subscribe()
+    reader = flight.subscribe()
+    await reader.__anext__()
+    await reader.aclose()
+    await asyncio.gather(flight.task, return_exceptions=True)
+    del unread
+    print(f"未读取的合并请求（合并: {coalesced}）: 第一个请求断开后运行"
+          f"{'已取消' if flight.task.cancelled() else '继续运行到结束'}，收到 {len(flight.events)} 个事件")
+    return coalesced and flight.task.cancelled() and len(flight.events) < 50
+
+
+async def main(n: int) -> bool:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        set_single_flight(SingleFlight(enabled=False))
+        model.calls = 0
+        await invoke_all(client, n)
+        uncoalesced_calls = model.calls
+
+        set_single_flight(SingleFlight(enabled=True))
+        model.calls = 0
+        results = await invoke_all(client, n)
+        coalesced_calls = model.calls
+        frameworks = {result["final_framework"] for result in results}
+        followers = sum(result["coalesced"] for result in results)
+        print(f"{n} 个相同请求: 不合并 {uncoalesced_calls} 次模型调用，合并后 {coalesced_calls} 次，"
+              f"{followers} 个请求被合并，得到 {len(frameworks)} 种框架")
+        ok = coalesced_calls * n == uncoalesced_calls and followers == n - 1 and len(frameworks) == 1
+
+        first, late = await asyncio.gather(stream_text(client, 0), stream_text(client, 0.4))
+        print(f"流式: 第一个请求收到 {len(first[0])} 字，0.4s 后加入的请求收到 {len(late[0])} 字（合并: {late[1]}），"
+              f"内容{'相同' if first[0] == late[0] else '不同'}")
+        ok = ok and first[0] == late[0] and late[1] == "true"
+        ok = await check_unread_follower() and ok
+
+        exported = exported_coalesced((await client.get("/metrics")).text)
+        print(f"/metrics 中被合并的请求数: {exported}")
+        ok = ok and exported == n
+    return ok
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ok = asyncio.run(main(n))
+    print("✅ 相同的并发请求共用一次运行" if ok else "❌ 请求合并未按预期工作")
+    sys.exit(0 if ok else 1)
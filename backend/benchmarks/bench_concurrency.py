@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+验证 /paper-framework/invoke 不会阻塞事件循环：
+N 个并发请求的总耗时应接近单个请求的耗时。
+
+用法：python benchmarks/bench_concurrency.py [并发数]
+"""
+
+import asyncio
+import sys
+import time
+
+import httpx
+
+from fake_llm import install_fake_provider
+
+install_fake_provider(latency=0.3)
+
+from agent.app import app  # noqa: E402
+from agent.coalesce import SingleFlight, set_single_flight  # noqa: E402
+
+# 相同的并发请求默认会合并为一次运行，这里要测的是各自独立运行时的并发
+set_single_flight(SingleFlight(enabled=False))
+
+PARAMS = {
+    "paper_topic": "低资源语言的问题生成",
+    "methodology": "基于知识图谱的Transformer模型",
+    "journal_requirements": "Information Systems Research",
+    "framework_refinement_loops": 1,
+    "framework_model": "fake-model",
+    "api_config": "fake",
+    "bypass_cache": True,
+}
+
+
+async def timed_requests(client: httpx.AsyncClient, n: int) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *[client.post("/paper-framework/invoke", params=PARAMS, json=[]) for _ in range(n)]
+    )
+    elapsed = time.perf_counter() - start
+    for response in responses:
+        response.raise_for_status()
+    return elapsed
+
+
+async def main(n: int) -> bool:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        single = await timed_requests(client, 1)
+        parallel = await timed_requests(client, n)
+
+    ratio = parallel / single
+    print(f"单个请求: {single:.2f}s")
+    print(f"{n} 个并发请求: {parallel:.2f}s (比值 {ratio:.2f})")
+    # 串行执行时比值约为 n；允许一倍的调度开销
+    return ratio < 2.0
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    ok = asyncio.run(main(n))
+    print("✅ 并发请求未阻塞事件循环" if ok else "❌ 并发请求被串行化")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+检查期刊示例检索：
+
+- 模糊的期刊名（大小写、空白、标点、别名、缩写、拼写错误、附加说明）都能匹配到收录的期刊，未收录的期刊不误配；
+- 每次调用放入提示词的示例 token 数：整段示例（旧写法）与检索后在预算内的摘录；
+- 建立索引、以内存映射方式打开已有索引与单次检索的耗时；
+- 用 set_example_store 切换示例目录后，get_journal_examples 不再返回旧示例库缓存的结果；
+- 多个进程同时重建同一目录的索引时各自得到完整的内存映射索引，不留下临时文件。
+
+用法：python benchmarks/bench_examples.py [检索次数]
+"""
+
+import json
+import multiprocessing
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+from agent.examples import DEFAULT_EXAMPLES_DIR, ExampleIndex, ExampleStore, get_example_store, set_example_store
+from agent.llm_call import estimate_tokens
+from agent.tools_and_schemas import get_journal_examples
+
+QUERY = "低资源语言的问题生成 基于知识图谱的Transformer模型 knowledge graph question generation"
+NAMES = {
+    "ACM Low-Resource Language ": "ACM Low-Resource Language",
+    "acm low resource language": "ACM Low-Resource Language",
+    "TALLIP": "ACM Low-Resource Language",
+    "ISR": "Information Systems Research",
+    "Information Systems Research，篇幅8000字": "Information Systems Research",
+    "information and management": "Information & Management",
+    "I&M": "Information & Management",
+    "Journal of Managment Information System": "Journal of Management Information Systems",
+    "European J of Information Systems": "European Journal of Information Systems",
+    "Nature": None,
+    "": None,
+}
+
+
+def check_store_switch() -> bool:
+    """切换示例目录后重新渲染，不沿用旧示例库的缓存"""
+    journal = "Information Systems Research"
+    original = get_example_store()
+    before = get_journal_examples(journal, QUERY)
+    with tempfile.TemporaryDirectory() as directory:
+        examples = pathlib.Path(directory)
+        (examples / "isr.jsonl").write_text(json.dumps({"journal": journal, "text": "切换后的示例"}, ensure_ascii=False), encoding="utf-8")
+        set_example_store(ExampleStore(examples))
+        try:
+            after = get_journal_examples(journal, QUERY)
+        finally:
+            set_example_store(original)
+    restored = get_journal_examples(journal, QUERY)
+    print(f"切换示例目录: 切换前 {estimate_tokens(before)} token，切换后为「{after}」，恢复后{'与切换前相同' if restored == before else '不同'}")
+    return after == "切换后的示例" and restored == before
+
+
+def _rebuild(directory: str, barrier) -> tuple:
+    barrier.wait()
+    index = ExampleIndex.open(pathlib.Path(directory))
+    return bool(index._handles), [index.text(doc_id) for doc_id in range(len(index.docs))]
+
+
+def check_concurrent_rebuild(processes: int = 8, rounds: int = 5) -> bool:
+    """多个进程同时发现索引不存在并重建：都应打开完整的内存映射索引，索引目录中不残留临时文件"""
+    results, leftovers = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        examples = pathlib.Path(directory) / "examples"
+        shutil.copytree(DEFAULT_EXAMPLES_DIR, examples, ignore=shutil.ignore_patterns(".index"))
+        with multiprocessing.Manager() as manager, multiprocessing.Pool(processes) as pool:
+            for _ in range(rounds):
+                shutil.rmtree(examples / ".index", ignore_errors=True)
+                barrier = manager.Barrier(processes)
+                results += pool.starmap(_rebuild, [(str(examples), barrier)] * processes)
+                leftovers += [path.name for path in (examples / ".index").iterdir() if path.suffix == ".tmp"]
+    mapped = sum(is_mapped for is_mapped, _ in results)
+    same = all(texts == results[0][1] for _, texts in results)
+    print(f"并发重建索引: {len(results)} 次打开中 {mapped} 次为内存映射，内容{'一致' if same else '不一致'}，残留临时文件 {len(leftovers)} 个")
+    return mapped == len(results) and same and not leftovers
+
+
+def main(searches: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        examples = pathlib.Path(directory) / "examples"
+        shutil.copytree(DEFAULT_EXAMPLES_DIR, examples, ignore=shutil.ignore_patterns(".index"))
+        start = time.perf_counter()
+        store = ExampleStore(examples)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        store = ExampleStore(examples)
+        open_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = {name: store.match_journal(name) for name, expected in NAMES.items() if store.match_journal(name) != expected}
+    print(f"期刊名匹配: {len(NAMES) - len(mismatches)}/{len(NAMES)} 正确" + (f"，错误: {mismatches}" if mismatches else ""))
+
+    ok = not mismatches
+    for journal in store.journals:
+        full = "\n\n".join(store.index.text(doc_id) for doc_id, doc in enumerate(store.index.docs) if doc["journal"] == journal)
+        retrieved = store.render(journal, QUERY)
+        print(f"{journal}: 整段示例 {estimate_tokens(full)} token -> 检索后 {estimate_tokens(retrieved)} token")
+        ok = ok and estimate_tokens(retrieved) <= estimate_tokens(full)
+
+    start = time.perf_counter()
+    for _ in range(searches):
+        store.search("acm low resource language", QUERY)
+    search_us = (time.perf_counter() - start) / searches * 1e6
+    print(f"建立索引 {build_ms:.1f}ms，打开已有索引 {open_ms:.1f}ms，单次检索 {search_us:.0f}µs")
+    return ok and open_ms < build_ms and check_store_switch() and check_concurrent_rebuild()
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    print("✅ 期刊名模糊匹配正确，检索减少了示例 token" if ok else "❌ 期刊示例检索未按预期工作")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+用本地假服务商检查备用模型链、对冲请求与熔断：
+
+- 对冲：主服务商有 SLOW_RATE 的调用首token很慢，开启 hedge_after 后 p99 应接近备用服务商的正常耗时，
+  落败的请求被取消（主服务商没有残留的进行中请求）；
+- 出错换用：主服务商持续出错时调用仍然成功，连续失败达到阈值后熔断，之后的调用不再发往主服务商；
+  冷却时间过后放行一次探测请求；探测进行中调用被取消时释放探测名额，熔断器继续放行；
+- 流式输出：主服务商输出几个token后出错，事件流先发出 reset 再转发备用服务商的增量文本，
+  客户端按 reset 清空后拼出的文本与调用结果一致；
+- 接口校验备用模型链：格式错误或 api_config 未注册时返回 422，不进入图。
+
+用法：python benchmarks/bench_failover.py [调用次数]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from fake_llm import FakeChatModel
+
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from agent.batch import FrameworkRequest
+from agent.clients import llm_registry, register_provider
+from agent.graph import GENERATION_PROMPT
+from agent.llm_call import LLMCall, arun_llm_call
+from agent.routing import ProviderHealth, get_provider_health, set_provider_health
+from agent.streaming import stream_graph_events
+
+FAST = 0.05
+SLOW = 1.0
+SLOW_RATE = 0.1
+HEDGE_AFTER = 0.15
+INPUTS = {
+    "paper_topic": "低资源语言的问题生成",
+    "methodology": "基于知识图谱的Transformer模型",
+    "journal_requirements": "Information Systems Research",
+    "journal_examples": "示例",
+}
+
+
+def install(primary: FakeChatModel, secondary: FakeChatModel) -> None:
+    register_provider("primary", lambda key, pools: primary, provider="primary")
+    register_provider("secondary", lambda key, pools: secondary, provider="secondary")
+    llm_registry.clear()
+
+
+def new_call(hedge_after=None) -> LLMCall:
+    return LLMCall(
+        node="generate_framework",
+        prompt=GENERATION_PROMPT,
+        inputs=INPUTS,
+        api_config="primary",
+        model="fake-model",
+        bypass_cache=True,
+        fallbacks=[("secondary", "fake-model")],
+        hedge_after=hedge_after,
+    )
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def latencies(n: int, hedge_after) -> tuple:
+    rng = random.Random(0)
+    primary = FakeChatModel(latency_for=lambda: SLOW if rng.random() < SLOW_RATE else FAST, output_tokens=5)
+    secondary = FakeChatModel(latency=FAST, output_tokens=5)
+    install(primary, secondary)
+    set_provider_health(ProviderHealth())
+    results = []
+    for _ in range(n):
+        call = new_call(hedge_after)
+        start = time.perf_counter()
+        await arun_llm_call(call)
+        results.append((time.perf_counter() - start, call))
+    # 落败的请求被取消后不应残留
+    await asyncio.sleep(0)
+    return [elapsed for elapsed, _ in results], [call for _, call in results], primary._in_flight
+
+
+async def failover(n: int) -> tuple:
+    primary = FakeChatModel(latency=0.001, fail_calls=set(range(1, 10 * n)))
+    secondary = FakeChatModel(latency=0.001)
+    install(primary, secondary)
+    set_provider_health(ProviderHealth(failure_threshold=3, cooldown=0.2))
+    calls = [new_call() for _ in range(n)]
+    for call in calls:
+        await arun_llm_call(call)
+    breaker_state = get_provider_health().stats()["primary"]["state"]
+    before_cooldown = primary.calls
+    await asyncio.sleep(0.25)
+    await arun_llm_call(new_call())
+    return calls, before_cooldown, primary.calls - before_cooldown, breaker_state
+
+
+async def cancelled_probe() -> bool:
+    """熔断冷却后的探测请求进行中时取消调用，熔断器应释放探测名额而不是一直拒绝"""
+    primary = FakeChatModel(latency=SLOW, fail_calls={1, 2, 3})
+    install(primary, FakeChatModel(latency=0.001))
+    health = ProviderHealth(failure_threshold=3, cooldown=0.1)
+    set_provider_health(health)
+    for _ in range(3):
+        await arun_llm_call(new_call())
+    await asyncio.sleep(0.15)
+    task = asyncio.create_task(arun_llm_call(new_call()))
+    while not primary._in_flight:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    allowed = health.allow("primary")
+    print(f"探测中取消调用: 熔断器 {health.stats()['primary']['state']}，"
+          f"取消 {health.stats()['primary']['cancelled']} 次，之后{'放行' if allowed else '拒绝'}新的探测")
+    return allowed
+
+
+class StreamState(TypedDict):
+    output: str
+
+
+async def streamed_failover() -> bool:
+    """主服务商中途出错时，事件流中主服务商的增量文本被 reset 作废，客户端最终只保留备用服务商的输出"""
+    primary = FakeChatModel(latency=0.001, token_text="主 ", fail_calls={1}, fail_after_tokens=3)
+    install(primary, FakeChatModel(latency=0.001, token_text="备 ", output_tokens=5))
+    set_provider_health(ProviderHealth())
+
+    async def generate_framework(state: StreamState) -> dict:
+        return {"output": await arun_llm_call(new_call())}
+
+    builder = StateGraph(StreamState)
+    builder.add_node("generate_framework", generate_framework)
+    builder.add_edge(START, "generate_framework")
+    builder.add_edge("generate_framework", END)
+    graph = builder.compile()
+
+    kinds, text, output = [], "", None
+    async for event in stream_graph_events(graph, {"output": ""}):
+        kinds.append(event["event"])
+        if event["event"] == "reset":
+            text = ""
+        elif event["event"] == "token":
+            text += event["data"]["delta"]
+        elif event["event"] == "final":
+            output = event["data"]["output"]["output"]
+    tokens_before_reset = kinds.index("reset") if "reset" in kinds else -1
+    print(f"流式输出中途换用备用模型: 事件 {kinds.count('token')} 个token、{kinds.count('reset')} 次 reset，"
+          f"客户端拼出 {text!r}")
+    return kinds.count("reset") == 1 and text == output == "备 " * 5 and tokens_before_reset > 1
+
+
+def check_validation() -> bool:
+    """接口参数中的备用模型链：合法的通过，格式错误或未注册的 api_config 被拒绝"""
+    install(FakeChatModel(), FakeChatModel())
+    request = {key: INPUTS[key] for key in ("paper_topic", "methodology", "journal_requirements")}
+    request.update(framework_refinement_loops=1, framework_model="m", api_config="primary")
+    results = {}
+    for chain in ("secondary:m", "secondary", "unknown:m", "secondary:m,unknown:m"):
+        try:
+            FrameworkRequest(**request, fallback_models=chain)
+            results[chain] = "通过"
+        except ValueError:
+            results[chain] = "拒绝"
+    print(f"备用模型链校验: {results}")
+    return list(results.values()) == ["通过", "拒绝", "拒绝", "拒绝"]
+
+
+async def main(n: int) -> bool:
+    plain, _, _ = await latencies(n, None)
+    hedged, calls, leftover = await latencies(n, HEDGE_AFTER)
+    extra = sum(call.attempts - 1 for call in calls) / n
+    print(f"不对冲: p50 {percentile(plain, 0.5) * 1000:.0f}ms, p99 {percentile(plain, 0.99) * 1000:.0f}ms")
+    print(f"对冲（{HEDGE_AFTER}s）: p50 {percentile(hedged, 0.5) * 1000:.0f}ms, "
+          f"p99 {percentile(hedged, 0.99) * 1000:.0f}ms，额外请求 {extra:.0%}，主服务商残留请求 {leftover}")
+    ok = percentile(hedged, 0.99) < percentile(plain, 0.99) / 2 and leftover == 0
+
+    calls, primary_calls, probes, state = await failover(20)
+    served = {call.api_config for call in calls}
+    print(f"主服务商持续出错: {len(calls)} 次调用全部由 {', '.join(sorted(served))} 完成，"
+          f"主服务商收到 {primary_calls} 次请求后熔断（{state}），冷却后探测 {probes} 次")
+    ok = ok and served == {"secondary"} and primary_calls == 3 and state == "open" and probes == 1
+    ok = await cancelled_probe() and ok
+    ok = await streamed_failover() and ok
+    return check_validation() and ok
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ok = asyncio.run(main(n))
+    print("✅ 对冲降低了尾延迟，熔断后不再请求故障服务商" if ok else "❌ 对冲或熔断未按预期工作")
+    sys.exit(0 if ok else 1)
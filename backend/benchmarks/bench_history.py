@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+检查长会话中对话历史的压缩：模拟前端每次追问都带上完整的 messages 历史，连续追问多次，
+
+- 压缩后每次请求回传的历史（消息数、JSON 字节数）与运行结束时的状态（pickle 字节数）不随追问次数增长；
+- 对照：只替换被取代的草稿、不折叠旧轮次时仍线性增长；完全不压缩的大小按被取代草稿的原文字数估算；
+- compact_history 节点每次运行的耗时。
+
+用法：python benchmarks/bench_history.py [追问次数]
+"""
+
+import json
+import pickle
+import re
+import sys
+import time
+
+from fake_llm import initial_state, install_fake_provider
+
+install_fake_provider(latency=0.0, output_tokens=400)
+
+from agent import graph  # noqa: E402
+from agent.streaming import to_jsonable  # noqa: E402
+
+NO_ROLLING = {"history_keep_turns": 10**6}
+
+
+def session(turns: int, configurable: dict) -> list:
+    """连续追问 turns 次，返回每次运行后的 (消息数, 回传 JSON 字节数, 状态字节数, 被取代草稿的原文字数, 压缩耗时ms)"""
+    compact = graph.compact_history
+    elapsed = []
+
+    def timed_compact(state, config):
+        start = time.perf_counter()
+        try:
+            return compact(state, config)
+        finally:
+            elapsed.append((time.perf_counter() - start) * 1000)
+
+    graph.compact_history = timed_compact
+    try:
+        app = graph.create_paper_framework_graph()
+    finally:
+        graph.compact_history = compact
+
+    rows, messages = [], []
+    for turn in range(turns):
+        state = {**initial_state(loops=2), "messages": messages + [{"type": "human", "content": f"追问 {turn}：请展开第二部分"}]}
+        result = app.invoke(state, {"configurable": configurable})
+        # 前端保存返回的历史，下一次追问时原样回传
+        messages = to_jsonable(result["messages"])
+        payload = json.dumps(messages, ensure_ascii=False).encode()
+        superseded = sum(int(n) for n in re.findall(r"原文 (\d+) 字", payload.decode()))
+        rows.append((len(messages), len(payload), len(pickle.dumps(result)), superseded, elapsed[-1]))
+    return rows
+
+
+def main(turns: int) -> bool:
+    compacted = session(turns, {})
+    baseline = session(turns, NO_ROLLING)
+    checkpoints = sorted({1, turns // 4, turns // 2, turns})
+    for n in checkpoints:
+        count, payload, state_bytes, _, compact_ms = compacted[n - 1]
+        base_count, base_payload, _, superseded, _ = baseline[n - 1]
+        print(f"第 {n:3d} 次追问: 压缩后 {count} 条消息 / {payload / 1024:.1f}KiB（状态 {state_bytes / 1024:.1f}KiB，"
+              f"压缩 {compact_ms:.2f}ms）；不折叠旧轮次 {base_count} 条 / {base_payload / 1024:.1f}KiB；"
+              f"完全不压缩约 {(base_payload + superseded * 3) / 1024:.1f}KiB")
+
+    # 有界：后半段的最大值不超过前四分之一处的 1.2 倍
+    settled = compacted[turns // 4 - 1]
+    bounded = all(
+        max(row[column] for row in compacted[turns // 4:]) <= settled[column] * 1.2
+        for column in (0, 1, 2)
+    )
+    growing = baseline[-1][1] > baseline[turns // 4 - 1][1] * 2
+    return bounded and growing
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
+    print("✅ 历史与状态大小不随会话长度增长" if ok else "❌ 对话历史压缩未按预期工作")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+检查后台任务接口：
+
+- 提交立即返回（远快于一次完整运行），排队已满时返回 429；
+- 工作协程都忙时，后提交的 high 优先级任务先于更早提交的 low 任务运行；
+- /jobs/{id}/events 推送 status / node_start / token / node_end 事件，任务结束后关闭；
+  任务记录中保存的历史事件不含节点输出，结束后订阅仍能补收状态与节点事件；
+- 取消排队中的任务后它不会运行；
+- 使用 SQLite 存储时，进程重启后未完成的任务重新排队并完成，已完成任务的结果仍可查询。
+
+用法：python benchmarks/bench_jobs.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_llm import install_fake_provider
+
+WORKERS = 2
+QUEUE_SIZE = 4
+os.environ["FRAMEWORK_JOB_WORKERS"] = str(WORKERS)
+os.environ["FRAMEWORK_JOB_QUEUE_SIZE"] = str(QUEUE_SIZE)
+install_fake_provider(latency=0.2, token_delay=0.002, output_tokens=20)
+
+from agent.app import app  # noqa: E402
+from agent.graph import paper_framework_graph  # noqa: E402
+from agent.batch import BatchItem  # noqa: E402
+from agent.jobs import JobManager, SQLiteJobStore  # noqa: E402
+
+ITEM = {
+    "paper_topic": "低资源语言的问题生成",
+    "methodology": "基于知识图谱的Transformer模型",
+    "journal_requirements": "Information Systems Research",
+    "framework_refinement_loops": 1,
+    "framework_model": "fake-model",
+    "api_config": "fake",
+    "bypass_cache": True,
+}
+
+
+async def wait_finished(client: httpx.AsyncClient, job_id: str) -> dict:
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.05)
+
+
+async def read_events(client: httpx.AsyncClient, job_id: str) -> list:
+    events = []
+    async with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+    return events
+
+
+async def api_checks() -> bool:
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post("/jobs", json=ITEM)
+            submit_ms = (time.perf_counter() - start) * 1000
+            first = response.json()
+            events = asyncio.create_task(read_events(client, first["job_id"]))
+
+            # 占满工作协程后依次提交 low 与 high，再提交到排队上限
+            busy = [first["job_id"], (await client.post("/jobs", json=ITEM)).json()["job_id"]]
+            await asyncio.sleep(0.05)
+            low = (await client.post("/jobs", json=ITEM, params={"priority": "low"})).json()
+            high = (await client.post("/jobs", json=ITEM, params={"priority": "high"})).json()
+            cancelled = (await client.post("/jobs", json=ITEM, params={"priority": "low"})).json()
+            filler = (await client.post("/jobs", json=ITEM)).json()
+            rejected = await client.post("/jobs", json=ITEM)
+            print(f"提交耗时 {submit_ms:.1f}ms；high 任务排在第 {high['position']} 位，"
+                  f"排队满 {QUEUE_SIZE} 个后再提交返回 {rejected.status_code}")
+            ok = ok and submit_ms < 100 and high["position"] == 0 and rejected.status_code == 429
+
+            await client.delete(f"/jobs/{cancelled['job_id']}")
+            pending = await client.get(f"/jobs/{low['job_id']}/result")
+            ok = ok and pending.status_code == 409
+
+            finished = {}
+            for job_id in busy + [low["job_id"], high["job_id"], cancelled["job_id"], filler["job_id"]]:
+                finished[job_id] = await wait_finished(client, job_id)
+            order = sorted((job for job in finished.values() if job["started"]), key=lambda job: job["started"])
+            high_before_low = finished[high["job_id"]]["started"] < finished[low["job_id"]]["started"]
+            print(f"运行顺序中 high 先于 low: {high_before_low}；被取消的任务状态 {finished[cancelled['job_id']]['status']}，"
+                  f"共运行 {len(order)} 个任务")
+            ok = ok and high_before_low and finished[cancelled["job_id"]]["status"] == "cancelled"
+            ok = ok and finished[cancelled["job_id"]]["started"] is None
+
+            result = (await client.get(f"/jobs/{first['job_id']}/result")).json()
+            kinds = await events
+            print(f"事件: {', '.join(sorted(set(kinds)))}（{len(kinds)} 条）；结果包含 {result['result']['metrics']['total']['calls']} 次调用")
+            ok = ok and result["status"] == "succeeded" and bool(result["result"]["final_framework"])
+            ok = ok and {"status", "node_start", "token", "node_end"} <= set(kinds)
+
+            history = app.state.jobs.get(first["job_id"]).events
+            replayed = await read_events(client, first["job_id"])
+            size = len(json.dumps(history, ensure_ascii=False))
+            print(f"历史事件: {len(history)} 条共 {size} 字节，不含节点输出: {all('output' not in m['data'] for m in history)}，"
+                  f"结束后订阅补收 {', '.join(sorted(set(replayed)))}")
+            ok = ok and all("output" not in message["data"] and "time" in message["data"] for message in history)
+            ok = ok and {"status", "node_start", "node_end"} == set(replayed)
+            print(json.dumps((await client.get("/jobs/stats")).json(), ensure_ascii=False))
+    return ok
+
+
+async def restart_checks() -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "jobs.sqlite")
+        manager = JobManager(paper_framework_graph, store=SQLiteJobStore(path), workers=1)
+        await manager.start()
+        done = await manager.submit(BatchItem(**ITEM))
+        while manager.get(done.id).status != "succeeded":
+            await asyncio.sleep(0.05)
+        interrupted = await manager.submit(BatchItem(**ITEM))
+        waiting = await manager.submit(BatchItem(**ITEM))
+        await asyncio.sleep(0.1)
+        await manager.stop()
+        before = (manager.get(interrupted.id).status, manager.get(waiting.id).status)
+
+        restarted = JobManager(paper_framework_graph, store=SQLiteJobStore(path), workers=1)
+        await restarted.start()
+        for job_id in (interrupted.id, waiting.id):
+            while restarted.get(job_id).status in ("queued", "running"):
+                await asyncio.sleep(0.05)
+        after = (restarted.get(interrupted.id).status, restarted.get(waiting.id).status)
+        kept = restarted.get(done.id).result["final_framework"]
+        await restarted.stop()
+    print(f"重启前: {before}，重启后: {after}，已完成任务的结果保留: {bool(kept)}")
+    return before == ("running", "queued") and after == ("succeeded", "succeeded") and bool(kept)
+
+
+async def main() -> bool:
+    return await api_checks() and await restart_checks()
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    print("✅ 后台任务按优先级有界排队，进度可订阅，重启后继续" if ok else "❌ 后台任务未按预期工作")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+离线负载基准：用假模型替换真实服务，在并发负载下驱动 paper_framework_graph 与 FastAPI 应用，
+以 JSON 输出吞吐量、p50/p95/p99 耗时、每次运行的内存、事件循环延迟，作为回归基线。
+
+- graph：直接 ``paper_framework_graph.ainvoke``，衡量图本身的开销；
+- app：经 ASGI 调用 ``POST /paper-framework/invoke``，再加上请求解析与序列化的开销。
+
+假模型的首token延迟、token间隔与输出token数可以调节；全部设为 0 时测得的就是框架自身的开销。
+``overhead_ms`` 为每次运行的耗时减去其中模型调用的耗时（仅对串行的 single 生成模式有意义）。
+每次运行的内存为单独一次运行中 tracemalloc 记录的峰值，不受并发影响。
+事件循环延迟为每 LAG_INTERVAL 秒一次的定时唤醒比预期晚的时间。
+
+用法：
+    python benchmarks/bench_load.py --runs 200 --concurrency 20 --output baseline.json
+    python benchmarks/bench_load.py --runs 200 --concurrency 20 --baseline baseline.json
+带 --baseline 时吞吐量下降或 p95 上升超过 --tolerance 即以非零状态退出。
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from fake_llm import initial_state, install_fake_provider
+
+LAG_INTERVAL = 0.01
+TARGETS = ("graph", "app")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """毫秒为单位的平均值与分位数"""
+    ms = [value * 1000 for value in values]
+    return {
+        "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50": round(percentile(ms, 0.5), 3),
+        "p95": round(percentile(ms, 0.95), 3),
+        "p99": round(percentile(ms, 0.99), 3),
+        "max": round(max(ms, default=0.0), 3),
+    }
+
+
+class LoopLagMonitor:
+    """定时唤醒并记录比预期晚了多少，反映事件循环被阻塞的程度"""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - expected, 0.0))
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def run_state(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        **initial_state("fake", args.loops),
+        "bypass_cache": True,
+        "generation_mode": args.generation_mode,
+        "validation_mode": args.validation_mode,
+    }
+
+
+def graph_runner(args: argparse.Namespace) -> Callable[[], Awaitable[List[Dict[str, Any]]]]:
+    from agent.graph import paper_framework_graph
+
+    async def run() -> List[Dict[str, Any]]:
+        result = await paper_framework_graph.ainvoke(run_state(args))
+        assert result["final_framework"], "未生成框架"
+        return result["llm_calls"]
+
+    return run
+
+
+def app_runner(args: argparse.Namespace, client: httpx.AsyncClient) -> Callable[[], Awaitable[List[Dict[str, Any]]]]:
+    params = {
+        key: value for key, value in run_state(args).items()
+        if key not in ("messages", "current_framework", "refinement_count", "final_framework")
+    }
+
+    async def run() -> List[Dict[str, Any]]:
+        response = await client.post("/paper-framework/invoke", params=params, json=[])
+        response.raise_for_status()
+        return response.json()["llm_calls"]
+
+    return run
+
+
+async def memory_per_run(run: Callable[[], Awaitable[Any]]) -> Dict[str, float]:
+    """单独一次运行的内存峰值与运行后仍未释放的内存（KiB）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        await run()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": round(peak / 1024, 1), "retained_kib": round(retained / 1024, 1)}
+
+
+async def load(run: Callable[[], Awaitable[List[Dict[str, Any]]]], runs: int, concurrency: int) -> Dict[str, Any]:
+    """以固定并发数完成 runs 次运行"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    overheads: List[float] = []
+    errors: List[str] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                calls = await run()
+            except Exception as error:  # noqa: BLE001 - 计入错误数，不中断负载
+                errors.append(f"{type(error).__name__}: {error}")
+                return
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            overheads.append(max(elapsed - sum(call.get("latency_ms", 0.0) for call in calls) / 1000, 0.0))
+
+    async with LoopLagMonitor() as monitor:
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(runs)])
+        wall = time.perf_counter() - start
+
+    return {
+        "runs": runs,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "latency_ms": distribution(latencies),
+        "overhead_ms": distribution(overheads),
+        "loop_lag_ms": distribution(monitor.samples),
+    }
+
+
+async def bench_target(target: str, args: argparse.Namespace) -> Dict[str, Any]:
+    if target == "graph":
+        run = graph_runner(args)
+        await run()  # 预热：导入、编译与首次调用的一次性开销不计入
+        result = await load(run, args.runs, args.concurrency)
+        result["memory_per_run"] = await memory_per_run(run)
+        return result
+
+    from agent.app import app
+    from agent.coalesce import SingleFlight, set_single_flight
+
+    # 负载中的请求输入相同，默认会合并为一次运行；这里要测的是每个请求各自运行的开销
+    set_single_flight(SingleFlight(enabled=False))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        run = app_runner(args, client)
+        await run()
+        result = await load(run, args.runs, args.concurrency)
+        result["memory_per_run"] = await memory_per_run(run)
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回超出容差的退化项"""
+    regressions = []
+    for target, current in results["targets"].items():
+        previous = baseline.get("targets", {}).get(target)
+        if not previous:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{target}: 吞吐量 {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+        if current["latency_ms"]["p95"] > previous["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{target}: p95 {previous['latency_ms']['p95']} -> {current['latency_ms']['p95']} ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{target}: 错误数 {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="用假模型在并发负载下测量图与接口的开销")
+    parser.add_argument("--target", choices=(*TARGETS, "all"), default="all")
+    parser.add_argument("--runs", type=int, default=100, help="每个目标的运行次数")
+    parser.add_argument("--concurrency", type=int, default=10, help="同时进行的运行数")
+    parser.add_argument("--latency", type=float, default=0.05, help="假模型首token前的等待秒数")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="假模型每个token之间的间隔秒数")
+    parser.add_argument("--output-tokens", type=int, default=50, help="假模型每次输出的token数")
+    parser.add_argument("--loops", type=int, default=1, help="framework_refinement_loops")
+    parser.add_argument("--generation-mode", choices=("single", "sections"), default="single")
+    parser.add_argument("--validation-mode", choices=("text", "structured"), default="text")
+    parser.add_argument("--lane-concurrency", type=int, default=1024, help="调度器每条通道的并发上限")
+    parser.add_argument("--output", help="把结果写入该 JSON 文件（默认只打印）")
+    parser.add_argument("--baseline", help="与该 JSON 基线比较，退化超出容差时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对退化比例")
+    return parser.parse_args(argv)
+
+
+async def main(args: argparse.Namespace) -> int:
+    install_fake_provider(
+        "fake", latency=args.latency, token_delay=args.token_delay, output_tokens=args.output_tokens,
+    )
+    from agent.clients import llm_registry
+    from agent.scheduler import ProviderScheduler, RateLimits, set_provider_scheduler
+
+    llm_registry.clear()
+    set_provider_scheduler(ProviderScheduler(default=RateLimits(concurrency=args.lane_concurrency)))
+
+    targets = TARGETS if args.target == "all" else (args.target,)
+    results = {
+        "python": platform.python_version(),
+        "settings": {
+            key: getattr(args, key) for key in (
+                "runs", "concurrency", "latency", "token_delay", "output_tokens",
+                "loops", "generation_mode", "validation_mode", "lane_concurrency",
+            )
+        },
+        "targets": {target: await bench_target(target, args) for target in targets},
+        # Linux 上 ru_maxrss 以 KiB 为单位
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+    failed = [target for target, result in results["targets"].items() if result["errors"]]
+    if failed:
+        print(f"❌ 运行出错: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("❌ 相对基线退化：\n" + "\n".join(regressions), file=sys.stderr)
+            return 1
+        print("✅ 未超出基线容差", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+检查 /metrics 与运行结果中的用量统计是否一致，并测量记录一次调用的开销：
+
+- /metrics 中各节点的调用次数、token数与费用应等于各次运行结果中 metrics 的合计；
+- 首个token的时间应小于调用耗时（流式输出）；
+- LLMMetrics.observe 的开销应远小于一次模型调用。
+
+用法：python benchmarks/bench_metrics.py [运行次数]
+"""
+
+import asyncio
+import re
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from fake_llm import initial_state, install_fake_provider
+
+install_fake_provider("fake", provider="anthropic", latency=0.05, token_delay=0.001)
+
+from agent.app import app  # noqa: E402
+from agent.metrics import LLMMetrics, get_llm_metrics  # noqa: E402
+
+MODEL = "claude-sonnet-4-20250514"
+PARAMS = {
+    key: value for key, value in initial_state("fake", 2).items()
+    if key in ("paper_topic", "methodology", "journal_requirements", "framework_refinement_loops", "api_config")
+}
+SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+
+
+def parse(text: str) -> dict:
+    """把 Prometheus 文本解析为 {(指标名, 节点, 其他标签): 值}"""
+    samples = defaultdict(float)
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            labels = dict(re.findall(r'(\w+)="([^"]*)"', labels))
+            if "node" not in labels:
+                continue
+            extra = labels.get("type") or labels.get("response_cache") or labels.get("le") or ""
+            samples[name, labels["node"], extra] += float(value)
+    return samples
+
+
+def observe_overhead(n: int = 20000) -> float:
+    """每次 observe 的耗时（微秒）"""
+    metrics = LLMMetrics()
+    report = {
+        "node": "refine_framework", "provider": "anthropic", "model": MODEL, "response_cache_hit": False,
+        "input_tokens": 1000, "output_tokens": 500, "cached_tokens": 800, "cache_creation_tokens": 0,
+        "latency_ms": 1500.0, "time_to_first_token_ms": 300.0, "cost_usd": 0.01,
+    }
+    start = time.perf_counter()
+    for _ in range(n):
+        metrics.observe(report)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(runs: int) -> bool:
+    get_llm_metrics().clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        results = []
+        for _ in range(runs):
+            response = await client.post(
+                "/paper-framework/invoke",
+                params={**PARAMS, "framework_model": MODEL, "bypass_cache": True},
+                json=[],
+            )
+            response.raise_for_status()
+            results.append(response.json())
+        exported = parse((await client.get("/metrics")).text)
+
+    ok = True
+    by_node = defaultdict(lambda: defaultdict(float))
+    for result in results:
+        for node, summary in result["metrics"]["by_node"].items():
+            for field, value in summary.items():
+                by_node[node][field] += value
+    for node, summary in sorted(by_node.items()):
+        calls = exported["framework_llm_calls_total", node, "miss"]
+        output_tokens = exported["framework_llm_tokens_total", node, "output"]
+        cost = exported["framework_llm_cost_usd_total", node, ""]
+        latency = exported["framework_llm_latency_seconds_sum", node, ""]
+        ttft = exported["framework_llm_time_to_first_token_seconds_sum", node, ""]
+        print(f"{node}: {calls:.0f} 次调用，输出 {output_tokens:.0f} token，费用 ${cost:.4f}，"
+              f"平均耗时 {latency / calls * 1000:.0f}ms，平均首token {ttft / calls * 1000:.0f}ms")
+        ok = ok and calls == summary["calls"] and output_tokens == summary["output_tokens"]
+        ok = ok and abs(cost - summary["cost_usd"]) < 1e-6 and 0 < ttft <= latency
+
+    overhead = observe_overhead()
+    print(f"每次记录开销: {overhead:.1f}µs")
+    return ok and overhead < 100
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    ok = asyncio.run(main(runs))
+    print("✅ /metrics 与运行结果一致，记录开销可以忽略" if ok else "❌ 统计不一致或记录开销过大")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+比较几种模型分配策略每次运行的费用、耗时与通过率：
+
+- strong：所有节点都用 framework_model（贵且慢）；
+- cascade：精炼改用便宜快速的 refine_model，生成与验证仍用 framework_model；
+- cascade+escalate：同上，便宜模型的稿件未通过结构化验证时改用 framework_model 再精炼。
+
+假模型按输出文本区分稿件出自哪个模型：强模型的稿件以 PASS_RATE["strong"] 的概率通过验证，
+便宜模型的稿件以 PASS_RATE["cheap"] 的概率通过。费用按 agent.metrics 的价格表估算。
+
+另外检查精炼次数为 0 和 1、验证始终不通过时，升级后恰好用 framework_model 精炼一次、验证两次后结束。
+
+用法：python benchmarks/bench_model_cascade.py [--runs 每种策略的运行次数，默认 5]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from fake_llm import PASSING_VALIDATION, FakeChatModel, initial_state
+
+from agent.clients import llm_registry, register_provider
+from agent.graph import paper_framework_graph
+from agent.metrics import summarize_calls
+
+STRONG = "claude-opus-4-20250514"
+CHEAP = "gemini-2.0-flash"
+PASS_RATE = {"strong": 0.7, "cheap": 0.5}
+FAILING = {**PASSING_VALIDATION, "overall_score": 5.0, "passed": False, "fixes": ["补充核心变量的定义"]}
+
+STRATEGIES = {
+    "text / strong": {"validation_mode": "text"},
+    "text / cascade": {"validation_mode": "text", "refine_model": f"cheap:{CHEAP}"},
+    "structured / strong": {"validation_mode": "structured"},
+    "structured / cascade": {"validation_mode": "structured", "refine_model": f"cheap:{CHEAP}", "escalate_on_failure": False},
+    "structured / cascade+escalate": {"validation_mode": "structured", "refine_model": f"cheap:{CHEAP}"},
+}
+
+
+def install(seed: int, pass_rate: dict = PASS_RATE) -> None:
+    rng = random.Random(seed)
+
+    def validate(name, messages):
+        drafted_by = "cheap" if "草稿" in str(messages[-1].content) else "strong"
+        return PASSING_VALIDATION if rng.random() < pass_rate[drafted_by] else FAILING
+
+    strong = FakeChatModel(latency=0.3, token_delay=0.003, output_tokens=200, token_text="严谨 ", structured_output_for=validate)
+    cheap = FakeChatModel(latency=0.05, token_delay=0.0005, output_tokens=200, token_text="草稿 ")
+    register_provider("strong", lambda key, pools: strong, provider="anthropic")
+    register_provider("cheap", lambda key, pools: cheap, provider="google")
+    llm_registry.clear()
+
+
+async def run_strategy(settings: dict, runs: int) -> dict:
+    install(seed=0)
+    costs, latencies, calls, passed, escalated = [], [], [], 0, 0
+    for _ in range(runs):
+        state = {**initial_state("strong", 2), "framework_model": STRONG, "bypass_cache": True, **settings}
+        start = time.perf_counter()
+        result = await paper_framework_graph.ainvoke(state)
+        latencies.append(time.perf_counter() - start)
+        summary = summarize_calls(result["llm_calls"])["total"]
+        costs.append(summary["cost_usd"])
+        calls.append(summary["calls"])
+        passed += bool((result.get("validation") or {}).get("passed"))
+        escalated += bool(result.get("model_escalated"))
+    return {
+        "cost": statistics.mean(costs),
+        "latency": statistics.mean(latencies),
+        "calls": statistics.mean(calls),
+        "pass_rate": passed / runs if settings["validation_mode"] == "structured" else None,
+        "escalated": escalated / runs,
+    }
+
+
+async def check_escalation_after_last_loop() -> bool:
+    """精炼次数用完后升级：恰好一次 framework_model 精炼，不再重复验证未修改的稿件"""
+    install(seed=0, pass_rate={"strong": 0.0, "cheap": 0.0})
+    ok = True
+    for loops in (0, 1):
+        state = {
+            **initial_state("strong", loops), "framework_model": STRONG, "bypass_cache": True, "validation_mode": "structured",
+            "generate_model": f"cheap:{CHEAP}", "refine_model": f"cheap:{CHEAP}",
+        }
+        result = await paper_framework_graph.ainvoke(state)
+        nodes = [(call["node"], call["model"]) for call in result["llm_calls"]]
+        strong_refines = nodes.count(("refine_framework", STRONG))
+        validations = sum(1 for node, _ in nodes if node == "validate_framework")
+        print(f"精炼次数 {loops}：framework_model 精炼 {strong_refines} 次，验证 {validations} 次，"
+              f"结束原因 {result.get('refinement_stop_reason')}")
+        ok = ok and result.get("model_escalated") and strong_refines == 1 and validations == 2
+    return ok
+
+
+async def main(runs: int) -> bool:
+    results = {}
+    print(f"{'策略':<32}{'费用/次':>10}{'耗时/次':>9}{'调用/次':>8}{'通过率':>8}{'升级':>7}")
+    for name, settings in STRATEGIES.items():
+        stats = results[name] = await run_strategy(settings, runs)
+        pass_rate = "-" if stats["pass_rate"] is None else f"{stats['pass_rate']:.0%}"
+        print(f"{name:<32}{stats['cost']:>10.4f}{stats['latency']:>8.2f}s{stats['calls']:>8.2f}{pass_rate:>8}{stats['escalated']:>7.0%}")
+
+    return (
+        await check_escalation_after_last_loop()
+        and results["text / cascade"]["cost"] < results["text / strong"]["cost"]
+        and results["text / cascade"]["latency"] < results["text / strong"]["latency"]
+        and results["structured / cascade+escalate"]["pass_rate"] >= results["structured / cascade"]["pass_rate"]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较模型分配策略的费用、耗时与通过率")
+    parser.add_argument("--runs", type=int, default=5, help="每种策略的运行次数（每次运行约 2-4 秒，次数多时统计更稳定）")
+    ok = asyncio.run(main(parser.parse_args().runs))
+    print("✅ 便宜模型精炼降低了费用与耗时，升级规则保住了通过率" if ok else "❌ 模型分配策略未达到预期")
+    sys.exit(0 if ok else 1)
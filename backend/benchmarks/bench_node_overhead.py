@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+节点准备开销基准：对比每次调用都重建提示词模板与期刊示例表（旧写法）
+和使用导入时预编译的模板与缓存查找（当前写法）的耗时，不包含模型调用。
+
+用法：python benchmarks/bench_node_overhead.py [重复次数]
+"""
+
+import json
+import sys
+import timeit
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from fake_llm import initial_state, install_fake_provider
+
+install_fake_provider()
+
+from agent import graph  # noqa: E402
+from agent.examples import get_example_store  # noqa: E402
+from agent.tools_and_schemas import get_journal_examples  # noqa: E402
+
+# 旧写法中的示例字典：每个期刊一段完整示例
+LEGACY_EXAMPLES = {journal: get_journal_examples(journal) for journal in get_example_store().journals}
+
+NODES = {
+    "generate_framework": graph._generation_request,
+    "refine_framework": graph._refinement_request,
+    "validate_framework": graph._validation_request,
+}
+
+
+def legacy_request(request, state):
+    """模拟旧写法：每次重建模板，并重新构建示例字典后按原样查找"""
+    call = request(state)
+    system, human = call.prompt.messages
+    blocks = [{"type": "text", "text": part.template} for part in system.prompt]
+    rebuilt = ChatPromptTemplate.from_messages([("system", blocks), ("human", human.prompt.template)])
+    examples = dict(LEGACY_EXAMPLES)
+    examples.get(state["journal_requirements"])
+    call.llm
+    return rebuilt, call.inputs
+
+
+def current_request(request, state):
+    call = request(state)
+    call.llm
+    return call.prompt, call.inputs
+
+
+def per_call_us(func, request, state, number: int) -> float:
+    def run():
+        prompt, inputs = func(request, state)
+        prompt.format_messages(**inputs)
+    return timeit.timeit(run, number=number) / number * 1e6
+
+
+def main(number: int) -> None:
+    state = initial_state()
+    state["current_framework"] = "框架 " * 500
+    report = {}
+    for node, request in NODES.items():
+        before = per_call_us(legacy_request, request, state, number)
+        after = per_call_us(current_request, request, state, number)
+        report[node] = {"before_us": round(before, 1), "after_us": round(after, 1), "speedup": round(before / after, 2)}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+检查框架提示词的前缀布局与服务商提示词缓存：
+
+- 同一期刊与研究主题下，所有框架节点、所有请求发送的系统消息都以逐字节相同的期刊示例前缀开头；
+- 以 Anthropic 方式（cache_control 断点）运行多次请求时，除首次调用外期刊示例都计入 cached_tokens。
+
+假模型对带 cache_control 的内容块模拟服务商缓存，并在 usage_metadata 中报告 cache_read。
+
+用法：python benchmarks/bench_prompt_cache.py [请求数]
+"""
+
+import asyncio
+import sys
+
+from fake_llm import initial_state, install_fake_provider
+
+install_fake_provider("fake-anthropic", provider="anthropic", latency=0.01)
+install_fake_provider("fake-openai", provider="openai", latency=0.01)
+
+from agent import graph  # noqa: E402
+from agent.llm_call import LLMCall  # noqa: E402
+from agent.prompts import framework_examples_prefix  # noqa: E402
+
+PROMPTS = {name: value for name, value in vars(graph).items() if name.endswith("_PROMPT")}
+
+
+def check_prefix(api_config: str) -> bool:
+    """各节点提示词的系统消息都以相同的期刊示例前缀开头"""
+    state = {**initial_state(api_config), "current_framework": "框架"}
+    examples = graph.journal_examples_for(state)
+    prefix = framework_examples_prefix.format(journal_examples=examples)
+    ok = True
+    for name, prompt in PROMPTS.items():
+        inputs = {variable: "x" for variable in prompt.input_variables}
+        inputs.update({key: state[key] for key in ("paper_topic", "methodology", "journal_requirements")})
+        inputs["journal_examples"] = examples
+        call = LLMCall(node=name, prompt=prompt, inputs=inputs, api_config=api_config, model="fake-model")
+        system = call.request_messages[0].content
+        text = system[0]["text"] if isinstance(system, list) else system
+        ok = ok and text.startswith(prefix)
+    return ok
+
+
+async def cached_share(runs: int) -> dict:
+    calls = []
+    for _ in range(runs):
+        state = {**initial_state("fake-anthropic", 1), "bypass_cache": True}
+        result = await graph.paper_framework_graph.ainvoke(state)
+        calls += result["llm_calls"]
+    input_tokens = sum(call["input_tokens"] for call in calls)
+    cached_tokens = sum(call["cached_tokens"] for call in calls)
+    return {
+        "calls": len(calls),
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_share": round(cached_tokens / input_tokens, 3),
+        "uncached_calls": sum(1 for call in calls if not call["cached_tokens"]),
+    }
+
+
+async def main(runs: int) -> bool:
+    prefix_ok = check_prefix("fake-anthropic") and check_prefix("fake-openai")
+    print(f"系统消息前缀一致: {'是' if prefix_ok else '否'}")
+    stats = await cached_share(runs)
+    print(f"{stats['calls']} 次调用，输入 {stats['input_tokens']} token，其中命中缓存 {stats['cached_tokens']} token"
+          f"（{stats['cached_share']:.0%}），未命中缓存的调用 {stats['uncached_calls']} 次")
+    return prefix_ok and stats["uncached_calls"] == 1
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    ok = asyncio.run(main(runs))
+    print("✅ 期刊示例前缀在调用之间复用" if ok else "❌ 期刊示例前缀未被缓存")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+调度器基准：本地假服务商最多同时处理 capacity 个调用，超出时返回 429。
+
+- 限流收敛：大量并发运行时，调度器遇到 429 后收缩并发，所有运行最终成功；
+- 公平性：一个请求先排入大量调用后，另一个请求的少量调用不必等它们全部完成；
+- 批量接口的并发数小于 1 时直接拒绝（为 0 时曾导致请求永远挂起）。
+
+用法：python benchmarks/bench_scheduler.py
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+from fake_llm import install_fake_provider
+
+CAPACITY = 4
+install_fake_provider(latency=0.1, max_concurrency=CAPACITY)
+
+from agent.batch import BatchItem, positive_int, run_batch  # noqa: E402
+from agent.clients import llm_registry  # noqa: E402
+from agent.scheduler import ProviderScheduler, RateLimits, set_provider_scheduler  # noqa: E402
+
+
+async def throttling_run(n: int) -> dict:
+    """n 个运行同时开始，调度器初始并发上限远高于服务商容量"""
+    scheduler = ProviderScheduler(limits={}, default=RateLimits(concurrency=16))
+    set_provider_scheduler(scheduler)
+    items = [
+        BatchItem(paper_topic=f"主题{i}", methodology="m", journal_requirements="j",
+                  framework_refinement_loops=1, framework_model="fake-model", api_config="fake", bypass_cache=True)
+        for i in range(n)
+    ]
+    start = time.perf_counter()
+    results = [result async for result in run_batch(items, provider_concurrency=n)]
+    model = llm_registry.get("fake", "fake-model")
+    return {
+        "runs": n,
+        "failed": sum(result["status"] == "error" for result in results),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "provider_calls": model.calls,
+        "provider_429": model.throttled,
+        "scheduler": scheduler.stats(),
+    }
+
+
+async def fairness_run() -> dict:
+    """请求A先排入40个调用，随后请求B排入2个调用"""
+    scheduler = ProviderScheduler(limits={}, default=RateLimits(concurrency=CAPACITY))
+    finished: dict = {"A": [], "B": []}
+    start = time.perf_counter()
+
+    async def call(request_id: str) -> None:
+        async with scheduler.slot("fake", "fake-model", request_id):
+            await asyncio.sleep(0.05)
+        finished[request_id].append(time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(call("A")) for _ in range(40)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(call("B")) for _ in range(2)]
+    await asyncio.gather(*tasks)
+    return {"a_last_s": round(max(finished["A"]), 2), "b_last_s": round(max(finished["B"]), 2)}
+
+
+async def concurrency_validation() -> dict:
+    """并发数为 0 或负数时：run_batch 立即抛出 ValueError，接口返回 422，命令行参数被拒绝"""
+    import argparse
+
+    import httpx
+
+    from agent.app import app
+
+    item = BatchItem(paper_topic="主题", methodology="m", journal_requirements="j", framework_model="fake-model", api_config="fake")
+    results = {}
+    try:
+        run_batch([item], provider_concurrency=0)
+        results["run_batch"] = "未拒绝"
+    except ValueError:
+        results["run_batch"] = "ValueError"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for value in (0, -1):
+            response = await asyncio.wait_for(
+                client.post("/paper-framework/batch", params={"concurrency": value}, json=[item.model_dump()]), timeout=5
+            )
+            results[f"接口 concurrency={value}"] = response.status_code
+    try:
+        positive_int("0")
+        results["命令行 --concurrency 0"] = "未拒绝"
+    except argparse.ArgumentTypeError:
+        results["命令行 --concurrency 0"] = "拒绝"
+    return results
+
+
+async def main() -> bool:
+    throttling = await throttling_run(24)
+    fairness = await fairness_run()
+    validation = await concurrency_validation()
+    print(json.dumps({"throttling": throttling, "fairness": fairness, "validation": validation}, indent=2, ensure_ascii=False))
+    rejected = list(validation.values()) == ["ValueError", 422, 422, "拒绝"]
+    return throttling["failed"] == 0 and fairness["b_last_s"] < fairness["a_last_s"] / 2 and rejected
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    print("✅ 调度器在限流下收敛且公平排队" if ok else "❌ 调度器未达到预期")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+比较整体生成与分节并行生成的耗时。
+
+假模型按固定的token间隔输出：整体生成输出 FRAMEWORK_TOKENS 个token，
+分节生成时每节输出其中的一部分，提纲为一次结构化调用。
+长框架的耗时主要由输出长度决定，分节并行生成应明显更快。
+
+用法：python benchmarks/bench_section_fanout.py [框架token数]
+"""
+
+import asyncio
+import sys
+import time
+
+from fake_llm import DEFAULT_OUTLINE, install_fake_provider, initial_state
+
+FRAMEWORK_TOKENS = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+SECTIONS = len(DEFAULT_OUTLINE["sections"])
+
+
+def output_tokens_for(messages) -> int:
+    request = str(messages[-1].content)
+    if "请撰写第" in request:
+        return FRAMEWORK_TOKENS // SECTIONS
+    if request.startswith("请为以下研究生成"):
+        return FRAMEWORK_TOKENS
+    # 验证
+    return 50
+
+
+install_fake_provider(latency=0.2, token_delay=0.002, output_tokens_for=output_tokens_for)
+
+from agent.graph import paper_framework_graph  # noqa: E402
+
+
+async def timed_run(mode: str) -> float:
+    state = {**initial_state("fake", 0), "bypass_cache": True, "generation_mode": mode}
+    start = time.perf_counter()
+    result = await paper_framework_graph.ainvoke(state)
+    elapsed = time.perf_counter() - start
+    assert result["final_framework"], "未生成框架"
+    return elapsed
+
+
+async def main() -> bool:
+    single = await timed_run("single")
+    sections = await timed_run("sections")
+    print(f"整体生成（{FRAMEWORK_TOKENS} token）: {single:.2f}s")
+    print(f"分节并行生成（{SECTIONS} 节）: {sections:.2f}s（{single / sections:.1f} 倍）")
+    return sections < single * 0.75
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    print("✅ 分节并行生成缩短了长框架的耗时" if ok else "❌ 分节并行生成没有明显加速")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+比较整体重写与分节精炼每一轮的输出token数与耗时。
+
+框架由 SECTIONS 个小节组成（分节生成），每轮审阅只指出一个小节有问题：
+整体重写每轮输出整个框架，分节精炼只输出被修改的小节。
+
+用法：python benchmarks/bench_section_refinement.py [框架token数]
+"""
+
+import asyncio
+import sys
+import time
+from collections import Counter
+
+from fake_llm import FakeChatModel, initial_state
+
+from agent.clients import llm_registry, register_provider
+from agent.graph import paper_framework_graph
+
+FRAMEWORK_TOKENS = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+SECTIONS = 8
+LOOPS = 2
+OUTLINE = {"sections": [{"section_name": f"小节{i}", "key_points": ["要点"]} for i in range(1, SECTIONS + 1)]}
+CRITIQUE = {"revisions": [{"section_name": "小节3", "issues": ["概念定义不清"]}]}
+
+
+async def run(refinement_mode: str) -> tuple:
+    tokens: Counter = Counter()
+
+    def output_tokens_for(messages) -> int:
+        request = str(messages[-1].content)
+        if "请撰写第" in request:
+            return FRAMEWORK_TOKENS // SECTIONS
+        if request.startswith("请对以下理论框架进行精炼"):
+            tokens["refine"] += FRAMEWORK_TOKENS
+            return FRAMEWORK_TOKENS
+        if "请修改小节" in request:
+            tokens["refine"] += FRAMEWORK_TOKENS // SECTIONS
+            return FRAMEWORK_TOKENS // SECTIONS
+        return 20
+
+    model = FakeChatModel(
+        latency=0.1,
+        token_delay=0.002,
+        output_tokens_for=output_tokens_for,
+        structured_outputs={"FrameworkOutline": [OUTLINE], "FrameworkCritique": [CRITIQUE]},
+    )
+    register_provider("fake", lambda key, pools: model, provider="fake")
+    llm_registry.clear()
+
+    state = {
+        **initial_state("fake", LOOPS),
+        "bypass_cache": True,
+        "generation_mode": "sections",
+        "refinement_mode": refinement_mode,
+    }
+    start = time.perf_counter()
+    await paper_framework_graph.ainvoke(state)
+    return time.perf_counter() - start, tokens["refine"] / LOOPS
+
+
+async def main() -> bool:
+    full_time, full_tokens = await run("full")
+    section_time, section_tokens = await run("sections")
+    print(f"整体重写: 每轮输出 {full_tokens:.0f} token，总耗时 {full_time:.2f}s")
+    print(f"分节精炼: 每轮输出 {section_tokens:.0f} token，总耗时 {section_time:.2f}s")
+    return section_tokens <= full_tokens / SECTIONS * 1.5 and section_time < full_time
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    print("✅ 精炼开销随修改量而非文档长度增长" if ok else "❌ 分节精炼没有减少开销")
+    sys.exit(0 if ok else 1)
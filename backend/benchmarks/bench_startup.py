@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+检查冷启动的导入耗时与内存：
+
+- 在新进程中导入 agent.graph / agent.app 的耗时与最大常驻内存（RSS），以及加载了哪些服务商 SDK；
+- 对照：启动时导入全部三个服务商 SDK 并编译图（旧写法）；
+- 按 langgraph-api 的方式（从模块的 ``__dict__`` 中取 langgraph.json 所写的变量）能加载到图；
+- 应用启动前 ``GET /ready`` 返回 503，后台预热完成后返回 200；``FRAMEWORK_PREWARM`` 只加载所列服务商的 SDK。
+
+每项在独立的子进程中测量，多次取中位数。
+
+用法：python benchmarks/bench_startup.py [重复次数]
+"""
+
+import asyncio
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+PROVIDER_MODULES = ("langchain_openai", "langchain_anthropic", "langchain_google_genai")
+
+# 子进程中执行的导入；legacy 为改动前模块级导入全部 SDK、导入时编译图的等价写法
+IMPORTS = {
+    "agent.graph": "import agent.graph",
+    "agent.graph（旧写法）": "import langchain_openai, langchain_anthropic, langchain_google_genai\n"
+                            "import agent.graph; agent.graph.get_paper_framework_graph()",
+    "agent.app": "import agent.app",
+    "agent.app（旧写法）": "import langchain_openai, langchain_anthropic, langchain_google_genai\n"
+                          "import agent.app; agent.graph.get_paper_framework_graph()",
+}
+
+MEASURE = """
+import resource, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "providers": [name for name in {providers!r} if name in sys.modules],
+}}))
+"""
+
+
+def child_env(**extra: str) -> dict:
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")]))}
+    env.pop("FRAMEWORK_PREWARM", None)
+    return {**env, **extra}
+
+
+def run_child(args: list, env: dict) -> dict:
+    result = subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(runs: int) -> dict:
+    results = {}
+    for name, code in IMPORTS.items():
+        samples = [
+            run_child(["-c", MEASURE.format(code=code, providers=PROVIDER_MODULES)], child_env())
+            for _ in range(runs)
+        ]
+        results[name] = {
+            "seconds": statistics.median(sample["seconds"] for sample in samples),
+            "rss_mib": statistics.median(sample["rss_mib"] for sample in samples),
+            "providers": samples[-1]["providers"],
+        }
+        row = results[name]
+        print(f"{name:20s} 导入 {row['seconds']:.2f}s，最大RSS {row['rss_mib']:.0f}MiB，"
+              f"服务商 SDK: {', '.join(row['providers']) or '无'}")
+    return results
+
+
+async def readiness_check() -> dict:
+    """子进程中执行：启动应用，记录预热前后 /ready 的状态码与加载的 SDK"""
+    import httpx
+
+    from agent.app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before = (await client.get("/ready")).status_code
+        async with app.router.lifespan_context(app):
+            await app.state.readiness.wait()
+            response = await client.get("/ready")
+            after, stats = response.status_code, response.json()
+    return {
+        "before": before,
+        "after": after,
+        "stats": stats,
+        "providers": [name for name in PROVIDER_MODULES if name in sys.modules],
+    }
+
+
+def check_readiness() -> bool:
+    env = child_env(FRAMEWORK_PREWARM="api1:gpt-4o", OPENAI_API_KEY="sk-bench")
+    result = run_child([os.path.abspath(__file__), "--readiness"], env)
+    stats = result["stats"]
+    print(f"/ready: 启动前 {result['before']}，预热后 {result['after']}；"
+          f"预热步骤 {stats.get('steps')}，错误 {stats.get('errors') or '无'}；服务商 SDK: {', '.join(result['providers'])}")
+    return (
+        result["before"] == 503 and result["after"] == 200 and stats["ready"] and not stats["errors"]
+        and "client:api1:gpt-4o" in stats["steps"] and result["providers"] == ["langchain_openai"]
+    )
+
+
+def check_langgraph_spec() -> bool:
+    """模拟 langgraph dev / langgraph 镜像加载图：按文件路径导入模块，从 __dict__ 中取变量，可调用时当作图工厂调用"""
+    import importlib.util
+
+    from langgraph.pregel import Pregel
+
+    backend = pathlib.Path(__file__).resolve().parent.parent
+    spec_text = json.loads((backend / "langgraph.json").read_text(encoding="utf-8"))["graphs"]["agent"]
+    path, variable = spec_text.rsplit(":", 1)
+    spec = importlib.util.spec_from_file_location("langgraph_spec_module", backend / path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    graph = module.__dict__.get(variable)
+    if callable(graph) and not isinstance(graph, Pregel):
+        graph = graph()
+    print(f"langgraph.json: {spec_text} -> {type(graph).__name__}")
+    return isinstance(graph, Pregel)
+
+
+def main(runs: int) -> bool:
+    results = measure_imports(runs)
+    lazy_ok = all(not results[name]["providers"] for name in ("agent.graph", "agent.app"))
+    faster = all(
+        results[name]["seconds"] < results[f"{name}（旧写法）"]["seconds"]
+        and results[name]["rss_mib"] < results[f"{name}（旧写法）"]["rss_mib"]
+        for name in ("agent.graph", "agent.app")
+    )
+    return lazy_ok and faster and check_langgraph_spec() and check_readiness()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--readiness"]:
+        print(json.dumps(asyncio.run(readiness_check()), ensure_ascii=False))
+        sys.exit(0)
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
+    print("✅ 服务商 SDK 按需导入，冷启动更快，预热完成后才就绪" if ok else "❌ 冷启动或就绪检查未按预期工作")
+    sys.exit(0 if ok else 1)
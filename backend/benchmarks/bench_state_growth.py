@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+状态增长回归基准：节点只返回增量后，每一步提交给 reducer 的消息数、写入的状态大小与
+reducer 耗时应保持恒定，即总量随 framework_refinement_loops 线性增长。
+
+同时模拟旧写法（每步返回完整消息列表并由 add_messages 合并）作为对照。
+
+用法：python benchmarks/bench_state_growth.py [loops ...]
+"""
+
+import json
+import pickle
+import sys
+import time
+
+from langgraph.graph import add_messages
+
+from fake_llm import initial_state, install_fake_provider
+
+install_fake_provider(latency=0.0, output_tokens=200)
+
+from agent.graph import paper_framework_graph  # noqa: E402
+from agent.state import append_messages  # noqa: E402
+
+
+def collect_updates(loops: int) -> list:
+    """运行一次图，返回每一步节点提交的消息增量"""
+    config = {"recursion_limit": loops + 10}
+    updates = []
+    for event in paper_framework_graph.stream(initial_state(loops=loops), config, stream_mode="updates"):
+        for update in event.values():
+            updates.append(update or {})
+    return updates
+
+
+def replay(updates: list, legacy: bool, repeat: int = 5) -> dict:
+    """按顺序把各步的消息交给 reducer，统计提交的消息数与耗时（重复 repeat 次取最快的一次，减小测量噪声）"""
+    reducer = add_messages if legacy else append_messages
+    timings = []
+    for _ in range(repeat):
+        history: list = []
+        submitted = 0
+        update_bytes = 0
+        elapsed = 0.0
+        for update in updates:
+            new_messages = update.get("messages", [])
+            # 旧写法：节点返回 list(state["messages"]) + [...]，并展开 **state
+            right = history + new_messages if legacy else new_messages
+            submitted += len(right)
+            update_bytes += len(pickle.dumps({**update, "messages": right}))
+            start = time.perf_counter()
+            history = reducer(history, right)
+            elapsed += time.perf_counter() - start
+        timings.append(elapsed)
+    return {
+        "steps": len(updates),
+        "messages": len(history),
+        "submitted_messages": submitted,
+        "update_bytes": update_bytes,
+        "reducer_ms": round(min(timings) * 1000, 3),
+    }
+
+
+def main(loop_values: list) -> bool:
+    rows = []
+    for loops in loop_values:
+        updates = collect_updates(loops)
+        rows.append({
+            "loops": loops,
+            "delta": replay(updates, legacy=False),
+            "legacy": replay(updates, legacy=True),
+        })
+    print(json.dumps(rows, indent=2, ensure_ascii=False))
+
+    # 每多一步精炼增加的提交消息数与字节数应与循环次数无关
+    # （生成、验证与历史压缩等固定步骤的增量不同，因此比较相邻两组之间的边际值）
+    first, last = rows[0]["delta"], rows[-1]["delta"]
+    per_step = lambda row, key: row[key] / row["steps"]  # noqa: E731
+    marginal = lambda a, b, key: (b[key] - a[key]) / (b["steps"] - a["steps"])  # noqa: E731
+    early = lambda key: marginal(rows[0]["delta"], rows[1]["delta"], key)  # noqa: E731
+    late = lambda key: marginal(rows[-2]["delta"], rows[-1]["delta"], key)  # noqa: E731
+    linear_messages = late("submitted_messages") <= early("submitted_messages") * 1.1
+    linear_bytes = late("update_bytes") <= early("update_bytes") * 1.5
+    print(f"每步提交消息数: {early('submitted_messages'):.1f} -> {late('submitted_messages'):.1f}")
+    print(f"每步写入字节: {early('update_bytes'):.0f} -> {late('update_bytes'):.0f}")
+    print(f"每步reducer耗时(ms): {per_step(first, 'reducer_ms'):.4f} -> {per_step(last, 'reducer_ms'):.4f}"
+          f" (旧写法 {per_step(rows[-1]['legacy'], 'reducer_ms'):.4f})")
+    # 每步reducer耗时允许有测量噪声，但不应随历史长度成比例增长
+    linear_reducer = per_step(last, "reducer_ms") <= per_step(first, "reducer_ms") * 3
+    return linear_messages and linear_bytes and linear_reducer
+
+
+if __name__ == "__main__":
+    loop_values = [int(arg) for arg in sys.argv[1:]] or [1, 10, 50, 100, 200]
+    ok = main(loop_values)
+    print("✅ 状态增长为线性" if ok else "❌ 状态增长超过线性")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+比较两种验证方式下每次运行的平均LLM调用次数：
+
+- text：固定精炼 framework_refinement_loops 次后验证一次；
+- structured：先验证，只有未通过的框架才带着修改意见回到精炼。
+
+假模型的结构化验证按给定的通过率随机返回通过/未通过。
+
+用法：python benchmarks/bench_validation_routing.py [运行次数]
+"""
+
+import asyncio
+import random
+import sys
+
+from fake_llm import PASSING_VALIDATION, FakeChatModel, initial_state
+
+from agent.clients import llm_registry, register_provider
+from agent.graph import paper_framework_graph
+
+LOOPS = 2
+FAILING_VALIDATION = {**PASSING_VALIDATION, "overall_score": 5.0, "passed": False, "fixes": ["补充核心变量的定义"]}
+
+
+async def calls_per_run(mode: str, pass_rate: float, runs: int) -> float:
+    rng = random.Random(0)
+    outputs = [PASSING_VALIDATION if rng.random() < pass_rate else FAILING_VALIDATION for _ in range(runs * (LOOPS + 1))]
+    model = FakeChatModel(latency=0.001, structured_outputs={"FrameworkValidation": outputs})
+    register_provider("fake", lambda key, pools: model, provider="fake")
+    llm_registry.clear()
+
+    for _ in range(runs):
+        state = {**initial_state("fake", LOOPS), "bypass_cache": True, "validation_mode": mode}
+        await paper_framework_graph.ainvoke(state)
+    return (model.calls + sum(model.structured_calls.values())) / runs
+
+
+async def main(runs: int) -> bool:
+    baseline = await calls_per_run("text", 1.0, runs)
+    print(f"text 模式: 每次运行 {baseline:.2f} 次调用")
+    ok = True
+    for pass_rate in (0.9, 0.7, 0.5):
+        structured = await calls_per_run("structured", pass_rate, runs)
+        print(f"structured 模式（通过率 {pass_rate:.0%}）: 每次运行 {structured:.2f} 次调用")
+        ok = ok and (pass_rate < 0.7 or structured < baseline)
+    return ok
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ok = asyncio.run(main(runs))
+    print("✅ 通过率较高时结构化验证减少了调用次数" if ok else "❌ 结构化验证没有减少调用次数")
+    sys.exit(0 if ok else 1)
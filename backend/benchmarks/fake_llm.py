@@ -0,0 +1,206 @@
+"""
+用于基准测试的本地假模型，不访问网络，按固定延迟输出固定文本
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from agent.clients import register_provider
+from agent.llm_call import estimate_tokens
+from agent.streaming import chunk_text
+
+
+# 结构化输出默认返回的结果：一次通过的框架验证与一份四节提纲
+PASSING_VALIDATION: Dict[str, Any] = {
+    "scores": [{"dimension": "逻辑结构和完整性", "score": 8, "comment": "结构清晰"}],
+    "overall_score": 8.0,
+    "passed": True,
+    "fixes": [],
+    "summary": "框架符合期刊要求",
+}
+
+DEFAULT_OUTLINE: Dict[str, Any] = {
+    "sections": [
+        {"section_name": name, "key_points": ["要点一", "要点二"]}
+        for name in ("总体架构", "知识图谱构建", "问题类型预测", "问题生成器")
+    ]
+}
+
+
+class FakeRateLimitError(Exception):
+    """模拟服务商返回的 429 限流错误"""
+
+    status_code = 429
+
+
+class FakeTimeoutError(Exception):
+    """假模型模拟的服务商超时"""
+
+
+class FakeChatModel(BaseChatModel):
+    """固定延迟的假聊天模型
+
+    ``latency`` 为首个token前的等待秒数（设置 ``latency_for`` 时每次调用由其返回），``token_delay`` 为每个token之间的间隔，
+    输出由 ``output_tokens`` 个 ``token_text`` 组成；设置 ``output_tokens_for`` 时按提示词决定输出token数。
+    设置 ``max_concurrency`` 后，同时进行的流式调用超过该数目时抛出 FakeRateLimitError；
+    第 n 次流式调用（n 在 ``fail_calls`` 中）抛出 FakeTimeoutError，设置 ``fail_after_tokens`` 时在输出这么多token后才抛出。
+    绑定工具（with_structured_output）后以工具调用的形式返回 ``structured_outputs`` 中
+    该结构（按模式名）对应的结果，列表中的结果依次使用，用完后重复最后一个；
+    设置 ``structured_output_for`` 时改为按 (模式名, 提示词) 决定结果。
+    每次调用都报告 usage_metadata；带 cache_control 的内容块再次出现时按命中提示词缓存计入 cache_read。
+    """
+
+    latency: float = 0.5
+    latency_for: Optional[Callable[[], float]] = None
+    token_delay: float = 0.0
+    output_tokens: int = 50
+    output_tokens_for: Optional[Callable[[List[BaseMessage]], int]] = None
+    token_text: str = "框架 "
+    max_concurrency: Optional[int] = None
+    fail_calls: Set[int] = set()
+    fail_after_tokens: int = 0
+    _in_flight: int = PrivateAttr(default=0)
+    _prompt_cache: set = PrivateAttr(default_factory=set)
+    calls: int = 0
+    throttled: int = 0
+    structured_outputs: Dict[str, List[Dict[str, Any]]] = {
+        "FrameworkValidation": [PASSING_VALIDATION],
+        "FrameworkOutline": [DEFAULT_OUTLINE],
+    }
+    structured_calls: Dict[str, int] = {}
+    structured_output_for: Optional[Callable[[str, List[BaseMessage]], Dict[str, Any]]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        count = self.output_tokens_for(messages) if self.output_tokens_for else self.output_tokens
+        return [self.token_text] * count
+
+    def _usage(self, messages: List[BaseMessage], output_tokens: int) -> Dict[str, Any]:
+        input_tokens = sum(estimate_tokens(chunk_text(message)) for message in messages)
+        cache_read = cache_creation = 0
+        for message in messages:
+            if not isinstance(message.content, list):
+                continue
+            for block in message.content:
+                if isinstance(block, dict) and block.get("cache_control"):
+                    tokens = estimate_tokens(block["text"])
+                    if block["text"] in self._prompt_cache:
+                        cache_read += tokens
+                    else:
+                        self._prompt_cache.add(block["text"])
+                        cache_creation += tokens
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+        }
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _message(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        if not tools:
+            tokens = self._tokens(messages)
+            return AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        name = tools[0]["function"]["name"]
+        index = self.structured_calls.get(name, 0)
+        self.structured_calls[name] = index + 1
+        if self.structured_output_for:
+            args = self.structured_output_for(name, messages)
+        else:
+            outputs = self.structured_outputs[name]
+            args = outputs[min(index, len(outputs) - 1)]
+        tool_call = {"name": name, "args": args, "id": f"call_{name}_{index}"}
+        return AIMessage(content="", tool_calls=[tool_call], usage_metadata=self._usage(messages, 20))
+
+    def _tool_call_chunk(self, messages: List[BaseMessage], tools: List[Dict[str, Any]]) -> ChatGenerationChunk:
+        message = self._message(messages, tools)
+        tool_call = message.tool_calls[0]
+        chunk = {"name": tool_call["name"], "args": json.dumps(tool_call["args"]), "id": tool_call["id"], "index": 0}
+        return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[chunk], usage_metadata=message.usage_metadata))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._message(messages, kwargs.get("tools"))
+        time.sleep(self.latency + (0 if message.tool_calls else self.token_delay * len(self._tokens(messages))))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._message(messages, kwargs.get("tools"))
+        await asyncio.sleep(self.latency + (0 if message.tool_calls else self.token_delay * len(self._tokens(messages))))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        if kwargs.get("tools"):
+            yield self._tool_call_chunk(messages, kwargs["tools"])
+            return
+        tokens = self._tokens(messages)
+        for token in tokens:
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, len(tokens))))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        failing = self.calls in self.fail_calls
+        if failing and not self.fail_after_tokens:
+            raise FakeTimeoutError(f"第 {self.calls} 次调用超时")
+        if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+            self.throttled += 1
+            raise FakeRateLimitError("429 Too Many Requests")
+        self._in_flight += 1
+        try:
+            await asyncio.sleep(self.latency_for() if self.latency_for else self.latency)
+            if kwargs.get("tools"):
+                yield self._tool_call_chunk(messages, kwargs["tools"])
+                return
+            tokens = self._tokens(messages)
+            for index, token in enumerate(tokens):
+                if failing and index == self.fail_after_tokens:
+                    raise FakeTimeoutError(f"第 {self.calls} 次调用在第 {index} 个token后超时")
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, len(tokens))))
+        finally:
+            self._in_flight -= 1
+
+
+def install_fake_provider(api_config: str = "fake", provider: Optional[str] = None, **model_kwargs: Any) -> None:
+    """把假模型注册为 ``api_config`` 对应的服务，``provider`` 默认与 api_config 相同"""
+    register_provider(api_config, lambda key, pools: FakeChatModel(**model_kwargs), provider=provider or api_config)
+
+
+def initial_state(api_config: str = "fake", loops: int = 1) -> dict:
+    """构造一次运行的初始状态"""
+    return {
+        "messages": [],
+        "paper_topic": "低资源语言的问题生成",
+        "methodology": "基于知识图谱的Transformer模型",
+        "journal_requirements": "Information Systems Research",
+        "framework_refinement_loops": loops,
+        "framework_model": "fake-model",
+        "api_config": api_config,
+        "current_framework": "",
+        "refinement_count": 0,
+        "final_framework": "",
+    }
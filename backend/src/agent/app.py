@@ -1,13 +1,56 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
+import json
+import uuid
 import pathlib
-from fastapi import FastAPI, Response
+from typing import Annotated, List, Literal, Optional, Tuple
+from contextlib import asynccontextmanager
+from fastapi import Body, FastAPI, HTTPException, Query, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
-from agent.graph import paper_framework_graph
+
+# 在导入读取环境变量的模块之前加载 .env
+load_dotenv()
+
+from agent.batch import DEFAULT_PROVIDER_CONCURRENCY, BatchItem, FrameworkRequest, initial_state_for, run_batch
+from agent.budget import PromptTooLargeError
+from agent.cache import get_response_cache
+from agent.clients import llm_registry
+from agent.configuration import Configuration
+from agent.coalesce import get_single_flight, invoke_events
+from agent.jobs import JobManager, QueueFullError
+from agent.metrics import get_llm_metrics, summarize_calls
+from agent.routing import get_provider_health, validate_fallbacks
+from agent.scheduler import get_provider_scheduler
+from agent.streaming import sse_event, stream_graph_events
+from agent.checkpoint import new_thread_id, open_checkpointer, thread_config
+from agent.graph import create_paper_framework_graph, get_paper_framework_graph
+from agent.warmup import Readiness
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时按配置打开检查点存储、编译一次图并启动后台任务池，在后台预热；关闭时释放共享的LLM客户端与连接池"""
+    # 环境变量中的默认备用链（FRAMEWORK_FALLBACK_MODELS）写错时直接启动失败，而不是等到需要备用模型时才出错
+    validate_fallbacks(Configuration.fallback_models)
+    async with open_checkpointer() as checkpointer:
+        app.state.graph = create_paper_framework_graph(checkpointer) if checkpointer else get_paper_framework_graph()
+        app.state.readiness = Readiness()
+        app.state.readiness.start(compile_graph=False)
+        app.state.jobs = JobManager(app.state.graph)
+        await app.state.jobs.start()
+        try:
+            yield
+        finally:
+            await app.state.jobs.stop()
+            await app.state.readiness.stop()
+    await llm_registry.aclose()
+
 
 # Define the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -22,85 +65,268 @@ app.add_middleware(
 async def root():
     return {"message": "Paper Framework API is running"}
 
+
+@app.get("/ready")
+async def ready(response: Response):
+    """就绪检查：启动后的后台预热（图、期刊示例索引、FRAMEWORK_PREWARM 中的客户端）完成前返回 503"""
+    readiness = getattr(app.state, "readiness", None)
+    if readiness is None:
+        response.status_code = 503
+        return {"ready": False}
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness.stats()
+
+
+@app.get("/llm-clients/stats")
+async def llm_client_stats():
+    """LLM客户端注册表的命中/未命中统计"""
+    return llm_registry.stats()
+
+
+@app.get("/cache/stats")
+async def response_cache_stats():
+    """LLM响应缓存的命中/未命中统计"""
+    return get_response_cache().stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """按节点/服务商/模型汇总的LLM调用耗时、token与费用（Prometheus 文本格式）"""
+    text = get_llm_metrics().render() + get_single_flight().render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/coalescing/stats")
+async def coalescing_stats():
+    """进行中的运行数与被合并的相同请求数"""
+    return get_single_flight().stats()
+
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """各服务商/模型通道的排队深度、等待时间与限流次数"""
+    return get_provider_scheduler().stats()
+
+
+@app.get("/providers/health")
+async def provider_health():
+    """各服务商的熔断状态与成功/失败/对冲次数"""
+    return get_provider_health().stats()
+
+
+class FrameworkQuery(FrameworkRequest):
+    """stream / invoke 接口的查询参数：生成输入，以及启用检查点时可选的 thread_id"""
+
+    thread_id: Optional[str] = None
+
+
+def _graph():
+    """当前使用的图：启用检查点时为启动时编译的带检查点的图"""
+    graph = getattr(app.state, "graph", None)
+    return graph if graph is not None else get_paper_framework_graph()
+
+
+def _run_config(thread_id: Optional[str] = None) -> dict:
+    """为一次运行生成配置，request_id 用于调度器在请求之间公平排队，thread_id 用于检查点"""
+    return thread_config({"metadata": {"request_id": uuid.uuid4().hex}}, thread_id)
+
+
+def _start_run(kind: str, graph, initial_state: dict, thread_id: Optional[str] = None):
+    """发起一次运行，或挂到输入相同的进行中运行上；返回 (运行, 是否为合并的请求, thread_id)
+
+    调用方指定了 thread_id 时不合并，保证该 thread_id 只对应这一次运行。
+    """
+    run_thread_id = new_thread_id(graph, thread_id)
+    config = _run_config(run_thread_id)
+    if kind == "stream":
+        start = lambda: stream_graph_events(graph, initial_state, config)
+    else:
+        start = lambda: invoke_events(graph, initial_state, config)
+    flight, coalesced = get_single_flight().join(
+        kind, initial_state, start, context={"thread_id": run_thread_id}, coalesce=thread_id is None
+    )
+    return flight, coalesced, flight.context["thread_id"]
+
+
+def _invoke_result(result: dict, thread_id: Optional[str], coalesced: bool = False) -> dict:
+    return {
+        "messages": result["messages"],
+        "final_framework": result["final_framework"],
+        "refinement_count": result["refinement_count"],
+        "refinement_stop_reason": result.get("refinement_stop_reason", ""),
+        "validation": result.get("validation"),
+        "model_escalated": result.get("model_escalated", False),
+        "llm_calls": result.get("llm_calls", []),
+        "metrics": summarize_calls(result.get("llm_calls", [])),
+        "thread_id": thread_id,
+        "coalesced": coalesced
+    }
+
+def _run_error(e: Exception, thread_id: Optional[str]) -> Tuple[int, dict]:
+    """运行失败时的状态码与错误详情：invoke 接口作为HTTP错误返回，流式接口作为 error 事件推送"""
+    if isinstance(e, PromptTooLargeError):
+        # 裁剪后仍放不进模型的上下文窗口，在发送前就被拒绝
+        return 413, {"error": str(e), "node": e.node, "prompt_tokens": e.prompt_tokens, "limit": e.limit}
+    # 已完成的节点保存在检查点中，调用方可以凭 thread_id 继续运行
+    return 500, {"error": f"{type(e).__name__}: {e}", "thread_id": thread_id}
+
+
+async def _sse_events(events, thread_id: Optional[str]):
+    """把事件流格式化为SSE；运行出错时以 error 事件（带状态码与错误详情）结束，而不是直接断开"""
+    try:
+        async for event in events:
+            yield sse_event(event["event"], event["data"])
+    except Exception as e:
+        status, detail = _run_error(e, thread_id)
+        yield sse_event("error", {"status": status, **detail})
+
 # 使用sse技术，前端可以接受生成过程的每个步骤
 @app.post("/paper-framework/stream")
 async def stream_paper_framework(
-    messages: list,
-    paper_topic: str,
-    methodology: str,
-    journal_requirements: str,
-    framework_refinement_loops: int,
-    framework_model: str,
-    api_config: str
+    messages: Annotated[list, Body()],
+    query: Annotated[FrameworkQuery, Query()]
 ):
     """流式生成论文框架"""
-    
-    # 初始化状态
-    initial_state = {
-        "messages": messages,
-        "paper_topic": paper_topic,
-        "methodology": methodology,
-        "journal_requirements": journal_requirements,
-        "framework_refinement_loops": framework_refinement_loops,
-        "framework_model": framework_model,
-        "api_config": api_config,
-        "current_framework": "",
-        "refinement_count": 0,
-        "final_framework": ""
-    }
-    
-    # 创建流式响应
-    async def generate():
-        async for event in paper_framework_graph.astream(initial_state):
-            if "generate_framework" in event:
-                yield f"data: {event['generate_framework']}\n\n"
-            elif "refine_framework" in event:
-                yield f"data: {event['refine_framework']}\n\n"
-            elif "validate_framework" in event:
-                yield f"data: {event['validate_framework']}\n\n"
-            elif "messages" in event:
-                # 发送最新的消息
-                latest_message = event["messages"][-1]
-                if isinstance(latest_message, AIMessage):
-                    yield f"data: {latest_message.content}\n\n"
-    
-    return generate()
+
+    # 输入相同的并发请求共用一次运行，后加入的请求先补收已产生的事件
+    flight, coalesced, thread_id = _start_run("stream", _graph(), initial_state_for(query, messages), query.thread_id)
+
+    # 创建流式响应：node_start / token / reset / node_end / final 事件，运行出错时以 error 事件结束
+    # 客户端断开后可以凭 X-Thread-Id 调用 /paper-framework/resume 继续
+    headers = {"X-Coalesced": "true" if coalesced else "false"}
+    if thread_id:
+        headers["X-Thread-Id"] = thread_id
+    return StreamingResponse(_sse_events(flight.subscribe(), thread_id), media_type="text/event-stream", headers=headers)
 
 @app.post("/paper-framework/invoke")
 async def invoke_paper_framework(
-    messages: list,
-    paper_topic: str,
-    methodology: str,
-    journal_requirements: str,
-    framework_refinement_loops: int,
-    framework_model: str,
-    api_config: str
+    messages: Annotated[list, Body()],
+    query: Annotated[FrameworkQuery, Query()]
 ):
     """同步调用生成论文框架"""
-    
-    # 初始化状态
-    initial_state = {
-        "messages": messages,
-        "paper_topic": paper_topic,
-        "methodology": methodology,
-        "journal_requirements": journal_requirements,
-        "framework_refinement_loops": framework_refinement_loops,
-        "framework_model": framework_model,
-        "api_config": api_config,
-        "current_framework": "",
-        "refinement_count": 0,
-        "final_framework": ""
-    }
-    
-    # 执行工作流
-    result = paper_framework_graph.invoke(initial_state)
-    
-    return {
-        "messages": result["messages"],
-        "final_framework": result["final_framework"],
-        "refinement_count": result["refinement_count"]
-    }
 
+    # 异步执行工作流，LLM调用期间不阻塞事件循环；输入相同的并发请求共用一次运行
+    flight, coalesced, thread_id = _start_run("invoke", _graph(), initial_state_for(query, messages), query.thread_id)
+    try:
+        result = await flight.result()
+    except Exception as e:
+        if thread_id is None and not isinstance(e, PromptTooLargeError):
+            raise
+        status, detail = _run_error(e, thread_id)
+        raise HTTPException(status_code=status, detail=detail) from e
+
+    return _invoke_result(result, thread_id, coalesced)
+
+
+@app.post("/paper-framework/resume/{thread_id}")
+async def resume_paper_framework(thread_id: str, stream: bool = False):
+    """从检查点继续一次失败或被取消的运行，已完成的节点不会重新执行"""
+    graph = _graph()
+    if graph.checkpointer is None:
+        raise HTTPException(status_code=400, detail="未启用检查点，请设置 FRAMEWORK_CHECKPOINT_BACKEND")
+    config = _run_config(thread_id)
+    snapshot = await graph.aget_state(config)
+    if not snapshot.values:
+        raise HTTPException(status_code=404, detail=f"没有找到运行 {thread_id}")
+
+    if stream:
+        async def generate():
+            if not snapshot.next:
+                metrics = summarize_calls(snapshot.values.get("llm_calls", []))
+                yield sse_event("final", {"output": snapshot.values, "metrics": metrics})
+                return
+            async for event in _sse_events(stream_graph_events(graph, None, config), thread_id):
+                yield event
+
+        return StreamingResponse(generate(), media_type="text/event-stream", headers={"X-Thread-Id": thread_id})
+
+    # 已经运行结束的直接返回保存的结果
+    result = await graph.ainvoke(None, config) if snapshot.next else snapshot.values
+    return _invoke_result(result, thread_id)
+
+
+
+@app.post("/paper-framework/batch")
+async def batch_paper_framework(
+    items: Annotated[List[BatchItem], Body()],
+    concurrency: Annotated[int, Query(ge=1)] = DEFAULT_PROVIDER_CONCURRENCY
+):
+    """批量生成论文框架，按完成顺序以NDJSON逐条返回结果"""
+    # 在返回响应之前创建，参数错误时不会在已经返回 200 的流中途失败
+    results = run_batch(items, _graph(), provider_concurrency=concurrency)
+
+    async def generate():
+        async for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _jobs() -> JobManager:
+    return app.state.jobs
+
+
+def _job_or_404(job_id: str):
+    job = _jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"没有找到任务 {job_id}")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    item: Annotated[BatchItem, Body()],
+    priority: Literal["high", "normal", "low"] = "normal"
+):
+    """提交后台任务，立即返回任务ID；排队已满时返回 429"""
+    try:
+        job = await _jobs().submit(item, priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"}) from e
+    return {**job.summary(), "position": _jobs().position(job)}
+
+
+@app.get("/jobs/stats")
+async def job_stats():
+    """后台任务池的排队数、运行数、容量与拒绝次数"""
+    return _jobs().stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """任务状态（不含结果）"""
+    job = _job_or_404(job_id)
+    return {**job.summary(), "position": _jobs().position(job)}
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """已结束任务的结果；任务尚未结束时返回 409"""
+    job = _job_or_404(job_id)
+    if job.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail={"status": job.status, "position": _jobs().position(job)})
+    return {**job.summary(), "result": job.result}
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消排队或运行中的任务"""
+    _job_or_404(job_id)
+    job = await _jobs().cancel(job_id)
+    return job.summary()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """以SSE推送任务进度：status / node_start / token / node_end，任务结束后关闭"""
+    _job_or_404(job_id)
+
+    async def generate():
+        async for event in _jobs().subscribe(job_id):
+            yield sse_event(event["event"], event["data"])
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 def create_frontend_router(build_dir="../frontend/dist"):
     """Creates a router to serve the React frontend.
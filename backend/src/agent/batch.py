@@ -0,0 +1,191 @@
+"""批量生成论文框架
+
+既供 ``/paper-framework/batch`` 接口使用，也可以在命令行中处理JSONL文件::
+
+    python -m agent.batch inputs.jsonl outputs.jsonl --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from agent.checkpoint import thread_config
+from agent.clients import llm_registry
+from agent.metrics import summarize_calls
+from agent.routing import validate_fallbacks
+from agent.graph import get_paper_framework_graph
+
+
+DEFAULT_PROVIDER_CONCURRENCY = int(os.getenv("BATCH_PROVIDER_CONCURRENCY", "4"))
+
+
+class FrameworkRequest(BaseModel):
+    """一次生成的输入，接口的查询参数、批量请求与后台任务共用"""
+
+    paper_topic: str
+    methodology: str
+    journal_requirements: str
+    framework_refinement_loops: int
+    framework_model: str
+    api_config: str
+    bypass_cache: bool = False
+    convergence_threshold: Optional[float] = None
+    validation_mode: Optional[str] = None
+    generation_mode: Optional[str] = None
+    refinement_mode: Optional[str] = None
+    fallback_models: Optional[str] = None
+    hedge_after: Optional[float] = None
+    generate_model: Optional[str] = None
+    refine_model: Optional[str] = None
+    validate_model: Optional[str] = None
+    escalate_on_failure: Optional[bool] = None
+    max_prompt_tokens: Optional[int] = None
+
+    @field_validator("fallback_models")
+    @classmethod
+    def _check_fallback_models(cls, value: Optional[str]) -> Optional[str]:
+        """备用模型链在接口处校验，格式错误或 api_config 未注册时返回 422，而不是在运行中途失败"""
+        validate_fallbacks(value)
+        return value
+
+
+class BatchItem(FrameworkRequest):
+    """批量请求中的一行输入"""
+
+    id: Optional[str] = Field(default=None, description="调用方自定义的标识，原样返回")
+    framework_refinement_loops: int = 2
+    api_config: str = "api1"
+
+
+def initial_state_for(item: FrameworkRequest, messages: Optional[list] = None) -> Dict[str, Any]:
+    """把一次请求的输入（与对话历史）转换为图的初始状态"""
+    return {
+        "messages": messages or [],
+        **item.model_dump(include=set(FrameworkRequest.model_fields)),
+        "current_framework": "",
+        "refinement_count": 0,
+        "final_framework": "",
+    }
+
+
+def positive_int(value: str) -> int:
+    """argparse 的类型检查：正整数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"应为正整数，收到 {value}")
+    return number
+
+
+def run_batch(
+    items: List[BatchItem],
+    graph=None,
+    provider_concurrency: int = DEFAULT_PROVIDER_CONCURRENCY,
+) -> AsyncIterator[Dict[str, Any]]:
+    """并发运行一批输入，按完成顺序逐条产出结果
+
+    同一服务商（OpenAI/Anthropic/Gemini）同时运行的条目数不超过 ``provider_concurrency``。
+    单条失败只记录在该条结果中，不影响其余条目；图启用了检查点时结果带有 ``thread_id``，失败的条目可以继续运行。
+    未传入 graph 时使用共享的图实例。
+
+    ``provider_concurrency`` 小于 1 时在调用时就抛出 ValueError（为 0 时所有条目会永远等待），
+    而不是等到开始迭代、接口已经返回 200 之后。
+    """
+    if provider_concurrency < 1:
+        raise ValueError(f"provider_concurrency 应不小于 1，收到 {provider_concurrency}")
+    return _run_batch(items, graph or get_paper_framework_graph(), provider_concurrency)
+
+
+async def _run_batch(items: List[BatchItem], graph, provider_concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    batch_id = uuid.uuid4().hex[:8]
+    semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(provider_concurrency))
+
+    async def run_one(index: int, item: BatchItem) -> Dict[str, Any]:
+        provider = llm_registry.resolve_key(item.api_config, item.framework_model).provider
+        run_id = f"batch-{batch_id}-{index}"
+        thread_id = run_id if graph.checkpointer is not None else None
+        async with semaphores[provider]:
+            try:
+                result = await graph.ainvoke(
+                    initial_state_for(item), thread_config({"metadata": {"request_id": run_id}}, thread_id)
+                )
+            except Exception as e:
+                return {
+                    "index": index,
+                    "id": item.id,
+                    "status": "error",
+                    "error": f"{type(e).__name__}: {e}",
+                    "thread_id": thread_id,
+                }
+        return {
+            "index": index,
+            "id": item.id,
+            "status": "ok",
+            "final_framework": result["final_framework"],
+            "refinement_count": result["refinement_count"],
+            "refinement_stop_reason": result.get("refinement_stop_reason", ""),
+            "validation": result.get("validation"),
+            "model_escalated": result.get("model_escalated", False),
+            "llm_calls": result.get("llm_calls", []),
+            "metrics": summarize_calls(result.get("llm_calls", [])),
+            "thread_id": thread_id,
+        }
+
+    tasks = [asyncio.create_task(run_one(index, item)) for index, item in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # 调用方提前停止读取（例如客户端断开）时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+
+def _parse_line(index: int, line: str) -> BatchItem:
+    try:
+        return BatchItem.model_validate_json(line)
+    except ValueError as e:
+        raise SystemExit(f"第 {index + 1} 行无法解析: {e}")
+
+
+async def _run_cli(args: argparse.Namespace) -> int:
+    with open(args.input, encoding="utf-8") as f:
+        items = [_parse_line(index, line) for index, line in enumerate(f) if line.strip()]
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        async for result in run_batch(items, provider_concurrency=args.concurrency):
+            failed += result["status"] == "error"
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"完成 {len(items)} 条，失败 {failed} 条", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main() -> None:
+    """命令行入口：读取JSONL输入，逐条写出JSONL结果"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="批量生成论文框架")
+    parser.add_argument("input", help="输入JSONL文件，每行一个请求")
+    parser.add_argument("output", nargs="?", default="-", help="输出JSONL文件，默认标准输出")
+    parser.add_argument(
+        "--concurrency", type=positive_int, default=DEFAULT_PROVIDER_CONCURRENCY, help="每个服务商的最大并发数"
+    )
+    sys.exit(asyncio.run(_run_cli(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""提示词与输出的token预算
+
+发送前先统计渲染后的提示词token数（OpenAI 模型在装有 tiktoken 且编码表可用时按其分词，否则粗略估计），
+与模型的上下文窗口、输出上限以及可选的 ``max_prompt_tokens`` 比较：
+
+- 超出时按 ``TRIM_ORDER`` 依次裁剪优先级最低的输入（先从末尾逐段去掉期刊示例摘录），
+  再压缩其余输入中行内多余的空白与空行（保留行首缩进，待精炼的框架正文原样保留）；
+- 仍然超出则在发送前抛出 PromptTooLargeError，不必等到服务商返回错误。
+
+各节点的输出上限（max_tokens）由 ``generate_max_tokens`` / ``refine_max_tokens`` / ``validate_max_tokens`` 设置，
+未设置时按节点预估的输出token数留出余量。
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+
+# 各模型的上下文窗口（token），按模型名的最长前缀匹配
+DEFAULT_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4-turbo": 128_000,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4-mini": 200_000,
+    "claude": 200_000,
+    "gemini-1.5": 1_048_576,
+    "gemini-2.0": 1_048_576,
+    "gemini-2.5": 1_048_576,
+}
+# 未收录的模型
+DEFAULT_CONTEXT_WINDOW = 128_000
+# 未单独设置输出上限时，在节点预估的输出token数上留出的余量，避免在接近目标篇幅时截断
+OUTPUT_HEADROOM = 1.25
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 可以裁剪的提示词输入，按裁剪顺序排列
+TRIM_ORDER = ("journal_examples",)
+# 原样保留、不压缩空白的输入：待精炼或验证的框架正文
+VERBATIM_INPUTS = ("current_framework", "section_content")
+
+
+class PromptTooLargeError(ValueError):
+    """裁剪后提示词仍超出预算"""
+
+    def __init__(self, node: str, model: str, prompt_tokens: int, limit: int):
+        super().__init__(f"{node}: 提示词约 {prompt_tokens} token，超出 {model} 的提示词预算 {limit} token")
+        self.node = node
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.limit = limit
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中日韩字符按一个token计，其余按每4个字符一个token计"""
+    cjk = sum(1 for ch in text if "⺀" <= ch <= "鿿" or "가" <= ch <= "힯")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _tiktoken_encoding(model: str):
+    """OpenAI 模型的 tiktoken 编码；未安装或编码表无法加载（如离线）时返回 None，且不再重试"""
+    if os.getenv("FRAMEWORK_TOKENIZER", "auto") != "auto" or not re.match(r"(gpt-|o\d)", model):
+        return None
+    name = "o200k_base" if re.match(r"(gpt-4o|gpt-4\.1|o\d)", model) else "cl100k_base"
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception:
+                _encodings[name] = None
+        return _encodings[name]
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    """按模型选择计数方法"""
+    encoding = _tiktoken_encoding(model)
+    if encoding is None:
+        return estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[BaseMessage], model: str) -> int:
+    """统计渲染后的提示词消息的token数"""
+    from agent.streaming import chunk_text
+
+    count = token_counter(model)
+    return sum(count(chunk_text(message)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def load_context_windows() -> Dict[str, int]:
+    """默认上下文窗口表，``LLM_CONTEXT_WINDOWS`` 环境变量（JSON，模型前缀 -> token数）可以覆盖或补充"""
+    windows = dict(DEFAULT_CONTEXT_WINDOWS)
+    raw = os.getenv("LLM_CONTEXT_WINDOWS")
+    if raw:
+        windows.update({model: int(value) for model, value in json.loads(raw).items()})
+    return windows
+
+
+_context_windows: Optional[Dict[str, int]] = None
+
+
+def get_context_windows() -> Dict[str, int]:
+    """上下文窗口表（首次使用时读取环境变量，保证 .env 已加载）"""
+    global _context_windows
+    if _context_windows is None:
+        _context_windows = load_context_windows()
+    return _context_windows
+
+
+def context_window(model: str) -> int:
+    windows = get_context_windows()
+    matches = [prefix for prefix in windows if model.startswith(prefix)]
+    return windows[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+def output_limit(expected_output_tokens: int, configured: Optional[int] = None) -> int:
+    """节点的输出上限：配置的值，或在预估输出token数上留出余量"""
+    return configured or math.ceil(expected_output_tokens * OUTPUT_HEADROOM)
+
+
+def prompt_limit(models: List[str], max_output_tokens: int, max_prompt_tokens: Optional[int] = None) -> int:
+    """提示词的token上限：各候选模型中最小的上下文窗口减去输出上限，再受 max_prompt_tokens 限制"""
+    limit = min(context_window(model) for model in models) - max_output_tokens
+    return min(limit, max_prompt_tokens) if max_prompt_tokens else limit
+
+
+def with_output_limit(llm, provider: str, max_output_tokens: Optional[int]):
+    """返回设置了输出上限的模型副本（共享底层客户端）；模型不支持该参数时原样返回"""
+    if not max_output_tokens:
+        return llm
+    field = "max_output_tokens" if provider == "google" else "max_tokens"
+    if field not in type(llm).model_fields:
+        return llm
+    return llm.model_copy(update={field: max_output_tokens})
+
+
+def _drop_last_paragraph(text: str) -> Optional[str]:
+    """去掉最后一段（以空行分隔）；只剩一段时返回 None"""
+    head, sep, _ = text.rstrip().rpartition("\n\n")
+    return head if sep else None
+
+
+def _compress_whitespace(text: str) -> str:
+    """合并行内连续的空白与连续的空行，保留行首缩进（嵌套的 Markdown 列表依赖缩进）"""
+    text = re.sub(r"(?<=\S)[ \t]{2,}", " ", text)
+    text = re.sub(r"[ \t]+$", "", text, flags=re.M)
+    return re.sub(r"\n{3,}", "\n\n", text).strip("\n")
+
+
+def fit_prompt(
+    prompt: ChatPromptTemplate,
+    inputs: Dict[str, Any],
+    model: str,
+    limit: int,
+    node: str = "",
+) -> Tuple[Dict[str, Any], List[BaseMessage], int, int]:
+    """把提示词裁剪到 limit 以内，返回 (裁剪后的输入, 渲染后的消息, 提示词token数, 裁剪掉的token数)
+
+    先按 TRIM_ORDER 从末尾逐段去掉低优先级输入（期刊示例已在检索时按预算取舍，这里只在仍然放不下时再减少），
+    只剩一段时整体去掉；再压缩其余字符串输入中的多余空白（保留行首缩进，VERBATIM_INPUTS 中的框架正文不动）。
+    仍然超出时抛出 PromptTooLargeError。
+    """
+    messages = prompt.format_messages(**inputs)
+    original = tokens = count_message_tokens(messages, model)
+    if tokens <= limit:
+        return inputs, messages, tokens, 0
+
+    inputs = dict(inputs)
+    for key in TRIM_ORDER:
+        while tokens > limit and inputs.get(key):
+            inputs[key] = _drop_last_paragraph(inputs[key]) or ""
+            messages = prompt.format_messages(**inputs)
+            tokens = count_message_tokens(messages, model)
+    if tokens > limit:
+        inputs = {
+            key: _compress_whitespace(value) if isinstance(value, str) and key not in VERBATIM_INPUTS else value
+            for key, value in inputs.items()
+        }
+        messages = prompt.format_messages(**inputs)
+        tokens = count_message_tokens(messages, model)
+    if tokens > limit:
+        raise PromptTooLargeError(node, model, tokens, limit)
+    return inputs, messages, tokens, original - tokens
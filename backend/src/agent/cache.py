@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from agent.prompts import PROMPT_VERSION
+
+
+def cache_key(messages: List[BaseMessage], model_params: Dict[str, Any], prompt_version: str = PROMPT_VERSION) -> str:
+    """根据渲染后的提示词与模型参数计算内容寻址的缓存键"""
+    payload = {
+        "prompt_version": prompt_version,
+        "model": model_params,
+        "messages": [[message.type, message.content] for message in messages],
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def model_params(llm) -> Dict[str, Any]:
+    """提取影响输出的模型参数（类型、模型名、温度等）"""
+    params = dict(getattr(llm, "_identifying_params", {}) or {})
+    params["_type"] = getattr(llm, "_llm_type", type(llm).__name__)
+    return params
+
+
+class ResponseCache:
+    """LLM响应缓存的基类，子类实现 _get/_set/_clear/_size；基类本身即“不缓存”后端"""
+
+    backend = "none"
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回 None"""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入缓存"""
+        self._set(key, value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        self.set(key, value)
+
+    def clear(self) -> None:
+        """清空缓存并重置统计"""
+        self._clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中统计"""
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": self._size(),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _get(self, key: str) -> Optional[str]:
+        return None
+
+    def _set(self, key: str, value: str) -> None:
+        pass
+
+    def _clear(self) -> None:
+        pass
+
+    def _size(self) -> int:
+        return 0
+
+
+class InMemoryLRUCache(ResponseCache):
+    """进程内的LRU缓存"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self._expired(created):
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """保存在本地SQLite文件中的缓存，进程重启后仍然有效"""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self._expired(created):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            overflow = self._size_locked() - self.max_entries
+            if overflow > 0:
+                # 按最近访问时间淘汰最旧的条目
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def _size_locked(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._size_locked()
+
+
+def create_response_cache() -> ResponseCache:
+    """根据环境变量创建响应缓存
+
+    - ``FRAMEWORK_CACHE_BACKEND``: ``memory``（默认）、``sqlite`` 或 ``none``
+    - ``FRAMEWORK_CACHE_PATH``: SQLite文件路径，默认 ``framework_cache.sqlite``
+    - ``FRAMEWORK_CACHE_MAX_ENTRIES``: 最大条目数
+    - ``FRAMEWORK_CACHE_TTL``: 过期秒数，不设置则不过期
+    """
+    backend = os.getenv("FRAMEWORK_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ["FRAMEWORK_CACHE_TTL"]) if os.getenv("FRAMEWORK_CACHE_TTL") else None
+    max_entries = os.getenv("FRAMEWORK_CACHE_MAX_ENTRIES")
+    if backend == "sqlite":
+        return SQLiteCache(
+            os.getenv("FRAMEWORK_CACHE_PATH", "framework_cache.sqlite"),
+            max_entries=int(max_entries or 10000),
+            ttl=ttl,
+        )
+    if backend == "memory":
+        return InMemoryLRUCache(max_entries=int(max_entries or 1024), ttl=ttl)
+    return ResponseCache(max_entries=0)
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程内共享的响应缓存（首次使用时按环境变量创建，保证 .env 已加载）"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = create_response_cache()
+        return _response_cache
+
+
+def set_response_cache(cache: ResponseCache) -> None:
+    """替换共享的响应缓存，用于接入自定义后端"""
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = cache
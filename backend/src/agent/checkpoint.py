@@ -0,0 +1,64 @@
+"""图运行的检查点存储
+
+启用后每个超步（节点执行完成）都会按 ``thread_id`` 保存状态，服务商超时、进程重启或客户端断开后，
+可以从最后完成的节点继续运行，已完成的LLM调用不会重做。
+"""
+
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+@asynccontextmanager
+async def open_checkpointer(backend: Optional[str] = None) -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    """根据环境变量打开检查点存储，退出时关闭连接；未启用时产出 None
+
+    - ``FRAMEWORK_CHECKPOINT_BACKEND``: ``none``（默认）、``memory``、``sqlite`` 或 ``postgres``
+    - ``FRAMEWORK_CHECKPOINT_PATH``: SQLite文件路径，默认 ``framework_checkpoints.sqlite``
+    - ``FRAMEWORK_CHECKPOINT_URI``: Postgres连接串，默认使用 ``POSTGRES_URI``（docker-compose 部署）
+    """
+    backend = (backend or os.getenv("FRAMEWORK_CHECKPOINT_BACKEND", "none")).lower()
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        yield InMemorySaver()
+    elif backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        async with aiosqlite.connect(os.getenv("FRAMEWORK_CHECKPOINT_PATH", "framework_checkpoints.sqlite")) as conn:
+            # WAL 模式下 NORMAL 只在检查点时 fsync，每步写入的开销可以忽略
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            yield AsyncSqliteSaver(conn)
+    elif backend == "postgres":
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError as e:
+            raise RuntimeError("使用 postgres 检查点需要安装 langgraph-checkpoint-postgres") from e
+
+        uri = os.getenv("FRAMEWORK_CHECKPOINT_URI") or os.getenv("POSTGRES_URI")
+        if not uri:
+            raise RuntimeError("请设置 FRAMEWORK_CHECKPOINT_URI 或 POSTGRES_URI")
+        async with AsyncPostgresSaver.from_conn_string(uri) as saver:
+            await saver.setup()
+            yield saver
+    else:
+        yield None
+
+
+def thread_config(config: Dict[str, Any], thread_id: Optional[str]) -> Dict[str, Any]:
+    """把 ``thread_id`` 写入运行配置；图未启用检查点时原样返回"""
+    if thread_id is None:
+        return config
+    configurable = {**config.get("configurable", {}), "thread_id": thread_id}
+    return {**config, "configurable": configurable}
+
+
+def new_thread_id(graph, thread_id: Optional[str] = None) -> Optional[str]:
+    """启用了检查点的图使用调用方给出的 ``thread_id``，否则新建一个；未启用时返回 None"""
+    if graph.checkpointer is None:
+        return None
+    return thread_id or uuid.uuid4().hex
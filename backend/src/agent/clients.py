@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+
+
+DEFAULT_OPENAI_API_BASE = "https://api.openai.com/v1"
+DEFAULT_TEMPERATURE = 0.7
+
+
+class ClientKey(NamedTuple):
+    """LLM客户端在注册表中的键"""
+
+    provider: str
+    model: str
+    base_url: Optional[str]
+    temperature: float
+
+
+@dataclass
+class PoolSettings:
+    """客户端注册表与HTTP连接池的参数"""
+
+    max_clients: int = 32
+    idle_ttl: float = 600.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """从环境变量读取连接池参数"""
+        return cls(
+            max_clients=int(os.getenv("LLM_POOL_MAX_CLIENTS", cls.max_clients)),
+            idle_ttl=float(os.getenv("LLM_POOL_IDLE_TTL", cls.idle_ttl)),
+            max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(
+                os.getenv("LLM_HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections)
+            ),
+            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+        )
+
+
+class _HttpPools:
+    """按 (provider, base_url) 共享的 keep-alive 连接池"""
+
+    def __init__(self, settings: PoolSettings):
+        self.settings = settings
+        self._sync: Dict[Tuple[str, Optional[str]], httpx.Client] = {}
+        self._async: Dict[Tuple[str, Optional[str]], httpx.AsyncClient] = {}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.settings.max_connections,
+            max_keepalive_connections=self.settings.max_keepalive_connections,
+            keepalive_expiry=self.settings.keepalive_expiry,
+        )
+
+    def get(self, provider: str, base_url: Optional[str]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        key = (provider, base_url)
+        if key not in self._sync:
+            self._sync[key] = httpx.Client(limits=self._limits(), timeout=None)
+            self._async[key] = httpx.AsyncClient(limits=self._limits(), timeout=None)
+        return self._sync[key], self._async[key]
+
+    def close(self) -> None:
+        for client in self._sync.values():
+            client.close()
+        # AsyncClient 的连接在进程退出时释放；这里只丢弃引用，避免在已关闭的事件循环上 await
+        self._sync.clear()
+        self._async.clear()
+
+    async def aclose(self) -> None:
+        for client in self._async.values():
+            await client.aclose()
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._sync)
+
+
+# 各服务商的 SDK 在工厂函数中导入：一个部署通常只用一个服务商，不必在启动时加载全部 SDK
+
+
+def _openai_factory(key: ClientKey, pools: _HttpPools) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = pools.get(key.provider, key.base_url)
+    return ChatOpenAI(
+        model=key.model,
+        temperature=key.temperature,
+        openai_api_base=key.base_url,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=http_client,
+        http_async_client=http_async_client,
+        # 流式输出结束时返回用量（含命中前缀缓存的 cached_tokens）
+        stream_usage=True,
+    )
+
+
+def _anthropic_factory(key: ClientKey, pools: _HttpPools) -> BaseChatModel:
+    from langchain_anthropic import ChatAnthropic
+
+    # ChatAnthropic 不接受外部 httpx 客户端，复用实例即可复用其内部连接池
+    return ChatAnthropic(
+        model=key.model,
+        temperature=key.temperature,
+        anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+    )
+
+
+def _google_factory(key: ClientKey, pools: _HttpPools) -> BaseChatModel:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=key.model,
+        temperature=key.temperature,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
+
+
+ProviderFactory = Callable[[ClientKey, _HttpPools], BaseChatModel]
+
+# api_config -> (provider, 默认base_url读取函数, 工厂函数)
+_PROVIDERS: Dict[str, Tuple[str, Callable[[], Optional[str]], ProviderFactory]] = {
+    "api1": ("openai", lambda: os.getenv("OPENAI_API_BASE", DEFAULT_OPENAI_API_BASE), _openai_factory),
+    "api2": ("anthropic", lambda: None, _anthropic_factory),
+    "api3": ("google", lambda: None, _google_factory),
+}
+# 未知配置默认使用OpenAI
+_DEFAULT_API_CONFIG = "api1"
+
+
+def register_provider(
+    api_config: str,
+    factory: ProviderFactory,
+    provider: Optional[str] = None,
+    base_url: Callable[[], Optional[str]] = lambda: None,
+) -> None:
+    """注册（或覆盖）一个 api_config 对应的模型工厂，便于接入新的服务或本地假模型"""
+    _PROVIDERS[api_config] = (provider or api_config, base_url, factory)
+
+
+def has_api_config(api_config: str) -> bool:
+    """api_config 是否为已注册的服务配置"""
+    return api_config in _PROVIDERS
+
+
+class _Entry:
+    __slots__ = ("client", "last_used")
+
+    def __init__(self, client: BaseChatModel):
+        self.client = client
+        self.last_used = time.monotonic()
+
+
+class LLMClientRegistry:
+    """按 (provider, model, base_url, temperature) 缓存的LLM客户端注册表
+
+    同一个键复用同一个模型实例，OpenAI兼容的服务共享 keep-alive 连接池。
+    超过 ``max_clients`` 时按LRU淘汰，空闲超过 ``idle_ttl`` 秒的实例在下一次访问时清理。
+    """
+
+    def __init__(self, settings: Optional[PoolSettings] = None):
+        self.settings = settings or PoolSettings.from_env()
+        self._pools = _HttpPools(self.settings)
+        self._entries: "OrderedDict[ClientKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def resolve_key(
+        self, api_config: str, model: str, temperature: float = DEFAULT_TEMPERATURE
+    ) -> ClientKey:
+        """把 api_config 解析为注册表键"""
+        provider, base_url, _ = _PROVIDERS.get(api_config, _PROVIDERS[_DEFAULT_API_CONFIG])
+        return ClientKey(provider, model, base_url(), float(temperature))
+
+    def get(self, api_config: str, model: str, temperature: float = DEFAULT_TEMPERATURE) -> BaseChatModel:
+        """获取（必要时创建）对应配置的LLM实例"""
+        _, _, factory = _PROVIDERS.get(api_config, _PROVIDERS[_DEFAULT_API_CONFIG])
+        key = self.resolve_key(api_config, model, temperature)
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+                return entry.client
+
+            self.misses += 1
+            entry = _Entry(factory(key, self._pools))
+            self._entries[key] = entry
+            while len(self._entries) > self.settings.max_clients:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return entry.client
+
+    def _evict_idle(self) -> None:
+        deadline = time.monotonic() - self.settings.idle_ttl
+        # OrderedDict 按最近使用排序，最旧的在前
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.last_used > deadline:
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率等统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "clients": len(self._entries),
+                "http_pools": len(self._pools),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "max_clients": self.settings.max_clients,
+                "idle_ttl": self.settings.idle_ttl,
+            }
+
+    def clear(self) -> None:
+        """清空缓存的实例（连接池保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    async def aclose(self) -> None:
+        """关闭所有实例与连接池，用于应用关闭时"""
+        with self._lock:
+            self._entries.clear()
+        await self._pools.aclose()
+
+
+# 进程内共享的注册表
+llm_registry = LLMClientRegistry()
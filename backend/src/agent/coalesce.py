@@ -0,0 +1,189 @@
+"""相同请求的合并（single-flight）
+
+同一时刻到达的多个输入相同的请求（例如一个班级同时提交同一个题目）只运行一次图：
+第一个请求发起运行，其余请求挂到这次运行上，收到同样的事件流与结果。
+后加入的请求先补收已经产生的事件，再接收新事件。所有正在接收事件的请求都断开后运行被取消；
+请求在开始读取事件时才计入，创建了响应却没有读取（例如客户端在响应开始前断开）的请求不会让运行一直挂着。
+
+流式与非流式请求分别合并；调用方指定了 ``thread_id`` 的请求不合并。
+``FRAMEWORK_COALESCE_REQUESTS=0`` 关闭合并。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+
+def _normalize(value: Any) -> Any:
+    """去掉字符串首尾空白并把连续空白合并为一个空格，使仅有空白差异的输入视为相同"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def request_key(kind: str, state: Dict[str, Any]) -> str:
+    """按请求类型与规范化后的初始状态（题目、方法、期刊、模型、精炼次数、服务配置等）计算合并键"""
+    payload = json.dumps({"kind": kind, "state": _normalize(state)}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """一次正在进行的运行，事件转发给所有挂在上面的请求"""
+
+    def __init__(
+        self,
+        source: AsyncIterator[Dict[str, Any]],
+        on_done: Callable[["Flight"], None],
+        context: Optional[Dict[str, Any]] = None,
+    ):
+        # 发起者附带的信息（如 thread_id），合并的请求据此返回与发起者相同的值
+        self.context = context or {}
+        self.events: List[Dict[str, Any]] = []
+        self.output: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._on_done = on_done
+        self._subscribers: Set[asyncio.Queue] = set()
+        # 正在读取事件的请求数，开始迭代 subscribe() 时才计入
+        self._attached = 0
+        self.task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for event in source:
+                if event["event"] == "final":
+                    self.output = event["data"]["output"]
+                self.events.append(event)
+                for queue in self._subscribers:
+                    queue.put_nowait(event)
+        except asyncio.CancelledError:
+            # 所有请求都已断开；之后才开始读取的请求收到这个错误，而不是一个没有结果的事件流
+            self.error = RuntimeError("运行已在所有请求断开后取消")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_done(self)
+            for queue in self._subscribers:
+                queue.put_nowait(None)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """补发已产生的事件后继续接收新事件；运行出错时在事件流末尾抛出该错误"""
+        self._attached += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        replay = list(self.events)
+        if not self.done:
+            self._subscribers.add(queue)
+        try:
+            for event in replay:
+                yield event
+            while not self.done or not queue.empty():
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._subscribers.discard(queue)
+            self._detach()
+
+    async def result(self) -> Dict[str, Any]:
+        """等待运行结束并返回最终状态"""
+        async for _ in self.subscribe():
+            pass
+        return self.output
+
+    def _detach(self) -> None:
+        self._attached -= 1
+        if self._attached <= 0 and not self.done:
+            # 所有请求都已断开，不再需要这次运行
+            self.task.cancel()
+
+
+class SingleFlight:
+    """按合并键登记进行中的运行"""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = os.getenv("FRAMEWORK_COALESCE_REQUESTS", "1") != "0" if enabled is None else enabled
+        self._flights: Dict[str, Flight] = {}
+        self.started: Dict[str, int] = defaultdict(int)
+        self.coalesced: Dict[str, int] = defaultdict(int)
+
+    def join(
+        self,
+        kind: str,
+        state: Dict[str, Any],
+        start: Callable[[], AsyncIterator[Dict[str, Any]]],
+        context: Optional[Dict[str, Any]] = None,
+        coalesce: bool = True,
+    ) -> Tuple[Flight, bool]:
+        """挂到输入相同的进行中运行上，没有则调用 start() 发起新的运行；返回 (运行, 是否为合并的请求)
+
+        coalesce 为假时总是发起新的运行，也不供其他请求合并。
+        """
+        key = request_key(kind, state) if self.enabled and coalesce else None
+        flight = self._flights.get(key) if key else None
+        if flight is not None and not flight.done:
+            self.coalesced[kind] += 1
+            return flight, True
+
+        def on_done(finished: Flight) -> None:
+            if key and self._flights.get(key) is finished:
+                del self._flights[key]
+
+        flight = Flight(start(), on_done, context)
+        if key:
+            self._flights[key] = flight
+        self.started[kind] += 1
+        return flight, False
+
+    def stats(self) -> Dict[str, Any]:
+        """进行中的运行数，以及各类请求发起的运行数与被合并的请求数"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "started": dict(self.started),
+            "coalesced": dict(self.coalesced),
+        }
+
+    def render(self) -> str:
+        """Prometheus 文本格式，附在 /metrics 中"""
+        lines = [
+            "# HELP framework_requests_total Framework requests by endpoint; coalesced requests shared another request's run.",
+            "# TYPE framework_requests_total counter",
+        ]
+        for kind in sorted(set(self.started) | set(self.coalesced)):
+            lines.append(f'framework_requests_total{{endpoint="{kind}",coalesced="false"}} {self.started[kind]}')
+            lines.append(f'framework_requests_total{{endpoint="{kind}",coalesced="true"}} {self.coalesced[kind]}')
+        return "\n".join(lines) + "\n"
+
+
+async def invoke_events(graph, state: Optional[Dict[str, Any]], config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """非流式运行：只产出一个 ``final`` 事件"""
+    yield {"event": "final", "data": {"output": await graph.ainvoke(state, config)}}
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """进程内共享的请求合并登记表（首次使用时按环境变量创建）"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def set_single_flight(single_flight: SingleFlight) -> None:
+    """替换共享的请求合并登记表，用于测试或关闭合并"""
+    global _single_flight
+    _single_flight = single_flight
@@ -1,10 +1,10 @@
 import os
-from typing import Any, Optional
-from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+from dataclasses import dataclass, fields
 
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnableConfig
+
+from agent.clients import DEFAULT_TEMPERATURE, llm_registry
 
 
 @dataclass
@@ -15,43 +15,67 @@ class Configuration:
     framework_refinement_loops: int = 2
     include_few_shot_examples: bool = True
     max_framework_length: int = 3000
+
+    # 生成方式：single 为一次生成整个框架；sections 为先拟提纲，再并行生成各小节后拼接
+    generation_mode: str = "single"
+    max_framework_sections: int = 8
+
+    # 收敛检测：相邻两版框架的相似度达到该阈值时提前结束精炼，None 表示关闭
+    convergence_threshold: Optional[float] = None
+    # 开启收敛检测时至少执行的精炼次数
+    min_refinement_loops: int = 1
+
+    # 精炼方式：full 为每次重写整个框架；sections 为只重写有问题的小节后拼回
+    refinement_mode: str = "full"
+
+    # 验证方式：text 为自由文本评估；structured 为结构化评分，只有未通过的框架才带着修改意见回到精炼
+    validation_mode: str = "text"
+    # 结构化验证的通过分数（总体评分，1-10）
+    validation_pass_score: float = 7.0
+
+    # 按节点选择模型："api_config:model" 或模型名（使用本次运行的 api_config），None 表示使用 framework_model
+    generate_model: Optional[str] = None
+    refine_model: Optional[str] = None
+    validate_model: Optional[str] = None
+    # 按节点的输出上限（max_tokens），None 表示按节点预估的输出token数留出余量
+    generate_max_tokens: Optional[int] = None
+    refine_max_tokens: Optional[int] = None
+    validate_max_tokens: Optional[int] = None
+    # 渲染后提示词的token上限，超出时先裁剪期刊示例，仍超出则拒绝请求；None 表示只受模型上下文窗口限制
+    max_prompt_tokens: Optional[int] = None
+    # 结构化验证判定较便宜模型写的稿件未通过时，改用 framework_model 精炼（至少再精炼一次）
+    escalate_on_failure: bool = True
+
+    # 备用模型链："api_config:model" 以逗号分隔，主模型出错时依次换用；默认取 FRAMEWORK_FALLBACK_MODELS，未设置时只用主模型
+    fallback_models: Optional[str] = os.getenv("FRAMEWORK_FALLBACK_MODELS") or None
+    # 对冲请求：主模型在该秒数内没有输出首个token时，同时向下一个备用模型发起请求，None 表示不对冲
+    hedge_after: Optional[float] = None
+    
+    # 对话历史压缩：原样保留最近的轮数，更早的轮次折叠进不超过该token数的摘要
+    history_keep_turns: int = 6
+    history_summary_tokens: int = 500
     
     # API配置
     openai_api_key: Optional[str] = None
     openai_api_base: Optional[str] = None
     gemini_api_key: Optional[str] = None
 
+    @classmethod
+    def from_runnable_config(cls, config: Optional[RunnableConfig] = None) -> "Configuration":
+        """从 RunnableConfig 的 configurable 中读取配置"""
+        configurable = (config or {}).get("configurable") or {}
+        values = {f.name: configurable[f.name] for f in fields(cls) if configurable.get(f.name) is not None}
+        return cls(**values)
+
+
+def get_run_setting(state: Mapping[str, Any], config: Optional[RunnableConfig], name: str) -> Any:
+    """读取一次运行的设置：优先使用状态中的值，其次是 configurable，最后是默认值"""
+    value = state.get(name)
+    if value is not None:
+        return value
+    return getattr(Configuration.from_runnable_config(config), name)
 
 
-def get_llm_by_config(api_config: str, model: str):
-    """根据API配置获取对应的LLM实例"""
-    if api_config == "api1":
-        # OpenAI API
-        return ChatOpenAI(
-            model=model,
-            temperature=0.7,
-            openai_api_base=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-        )
-    elif api_config == "api2":
-        # Anthropic Claude API
-        return ChatAnthropic(
-            model=model,
-            temperature=0.7,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-        )
-    elif api_config == "api3":
-        # Google Gemini API
-        return ChatGoogleGenerativeAI(
-            model=model,
-            temperature=0.7,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
-    else:
-        # 默认使用OpenAI
-        return ChatOpenAI(
-            model=model,
-            temperature=0.7,
-            openai_api_base=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-        )
+def get_llm_by_config(api_config: str, model: str, temperature: float = DEFAULT_TEMPERATURE):
+    """根据API配置获取对应的LLM实例（从共享注册表中复用）"""
+    return llm_registry.get(api_config, model, temperature)
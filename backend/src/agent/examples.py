@@ -0,0 +1,333 @@
+"""期刊few-shot示例的检索
+
+示例以数据文件的形式保存在目录中（默认 ``agent/journal_examples``，``FRAMEWORK_EXAMPLES_DIR`` 可以改为其他目录）：
+
+- ``*.jsonl``：每行一段摘录，``{"journal": 期刊名, "aliases": [别名...], "section": 小节标题, "text": 摘录}``；
+- ``<期刊名>/*.txt`` 或 ``*.md``：子目录名为期刊名，每个文件是一段摘录，文件名为小节标题。
+
+摘录按文件名与行号排序。新增期刊只需要添加数据文件，不需要改代码。
+
+首次使用时为所有摘录建立 BM25 词法索引，写入 ``FRAMEWORK_EXAMPLES_INDEX`` 目录（默认为示例目录下的 ``.index``），
+之后以内存映射方式打开；示例文件变化后自动重建。目录不可写时索引只保存在内存中。
+
+检索时先把期刊名模糊匹配到收录的期刊（忽略大小写、标点与空白，支持别名、缩写与包含关系），
+再按查询（研究主题与方法）对该期刊的摘录打分，在 token 预算内取最相关的 top-k 段，按原文顺序拼接。
+"""
+
+import difflib
+import hashlib
+import json
+import math
+import mmap
+import os
+import pathlib
+import re
+import tempfile
+import threading
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agent.llm_call import estimate_tokens
+
+
+INDEX_VERSION = 1
+DEFAULT_EXAMPLES_DIR = pathlib.Path(__file__).parent / "journal_examples"
+# BM25 参数
+K1 = 1.2
+B = 0.75
+# 期刊名模糊匹配的最低相似度
+JOURNAL_MATCH_THRESHOLD = 0.8
+_STOPWORDS = frozenset("a an and the of on in for to with by at from is are we our this that as".split())
+_WORD = re.compile(r"[a-z0-9]+|[⺀-鿿가-힯]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """英文按单词（去掉常见虚词），中日韩文字按相邻两字切分"""
+    terms = []
+    for run in _WORD.findall(text.casefold()):
+        if run[0].isascii():
+            if run not in _STOPWORDS:
+                terms.append(run)
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def normalize_journal_name(name: str) -> str:
+    """忽略大小写、标点与多余空白，& 视为 and"""
+    name = name.casefold().replace("&", " and ")
+    return " ".join(re.findall(r"[^\W_]+", name))
+
+
+def _acronym(normalized: str) -> str:
+    return "".join(word[0] for word in normalized.split() if word not in _STOPWORDS)
+
+
+@dataclass(frozen=True)
+class Excerpt:
+    """一段示例摘录"""
+
+    journal: str
+    section: str
+    text: str
+    order: int
+
+
+def load_excerpts(directory: pathlib.Path) -> Tuple[List[Excerpt], Dict[str, List[str]]]:
+    """读取示例目录，返回 (摘录列表, 期刊名 -> 别名)"""
+    records: List[Tuple[str, str, str]] = []
+    aliases: Dict[str, List[str]] = defaultdict(list)
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or any(part.startswith(".") for part in path.relative_to(directory).parts):
+            continue
+        if path.suffix == ".jsonl":
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                records.append((record["journal"], record.get("section", ""), record["text"].strip()))
+                for alias in record.get("aliases", []):
+                    if alias not in aliases[record["journal"]]:
+                        aliases[record["journal"]].append(alias)
+        elif path.suffix in (".txt", ".md") and path.parent != directory:
+            records.append((path.parent.name, path.stem, path.read_text(encoding="utf-8").strip()))
+    excerpts = [Excerpt(journal, section, text, order) for order, (journal, section, text) in enumerate(records) if text]
+    for excerpt in excerpts:
+        aliases.setdefault(excerpt.journal, [])
+    return excerpts, dict(aliases)
+
+
+def _fingerprint(directory: pathlib.Path) -> str:
+    digest = hashlib.sha256(f"v{INDEX_VERSION}".encode())
+    for path in sorted(directory.rglob("*")):
+        relative = path.relative_to(directory)
+        if path.is_file() and not any(part.startswith(".") for part in relative.parts):
+            stat = path.stat()
+            digest.update(f"{relative}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _replace_file(path: pathlib.Path, data: bytes) -> None:
+    """先写入同目录下唯一命名的临时文件再原子替换，多个进程同时重建索引时不会互相覆盖写到一半的文件"""
+    tmp = tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+
+
+class ExampleIndex:
+    """BM25 索引：词典与文档元数据在内存中，倒排表与摘录文本以内存映射方式读取
+
+    倒排表为连续的 uint32 对 (文档号, 词频)，每个词对应其中一段 [start, start + df)。
+    """
+
+    def __init__(self, meta: Dict, postings: memoryview, texts: memoryview, handles: Iterable = ()):
+        self.docs: List[Dict] = meta["docs"]
+        self.terms: Dict[str, Tuple[int, int]] = {term: tuple(span) for term, span in meta["terms"].items()}
+        self.aliases: Dict[str, List[str]] = meta["aliases"]
+        self.avgdl: float = meta["avgdl"] or 1.0
+        self._postings = postings
+        self._texts = texts
+        self._handles = list(handles)
+
+    @staticmethod
+    def build(excerpts: List[Excerpt], aliases: Dict[str, List[str]], fingerprint: str) -> Tuple[Dict, bytes, bytes]:
+        """返回 (元数据, 倒排表字节, 文本字节)"""
+        docs, texts, postings_by_term = [], bytearray(), defaultdict(list)
+        for doc_id, excerpt in enumerate(excerpts):
+            encoded = excerpt.text.encode("utf-8")
+            terms = tokenize(f"{excerpt.section}\n{excerpt.text}")
+            for term, tf in Counter(terms).items():
+                postings_by_term[term].append((doc_id, tf))
+            docs.append({
+                "journal": excerpt.journal,
+                "section": excerpt.section,
+                "order": excerpt.order,
+                "length": len(terms),
+                "tokens": estimate_tokens(excerpt.text),
+                "offset": len(texts),
+                "size": len(encoded),
+            })
+            texts += encoded
+        postings, spans = array("I"), {}
+        for term in sorted(postings_by_term):
+            spans[term] = [len(postings) // 2, len(postings_by_term[term])]
+            for doc_id, tf in postings_by_term[term]:
+                postings.extend((doc_id, tf))
+        meta = {
+            "version": INDEX_VERSION,
+            "fingerprint": fingerprint,
+            "docs": docs,
+            "terms": spans,
+            "aliases": aliases,
+            "avgdl": sum(doc["length"] for doc in docs) / len(docs) if docs else 0.0,
+        }
+        return meta, postings.tobytes(), bytes(texts)
+
+    @classmethod
+    def open(cls, directory: pathlib.Path, index_dir: Optional[pathlib.Path] = None) -> "ExampleIndex":
+        """打开示例目录的索引，索引不存在或已过期时重建"""
+        index_dir = index_dir or directory / ".index"
+        fingerprint = _fingerprint(directory)
+        meta_path = index_dir / "index.json"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("fingerprint") == fingerprint:
+                return cls._mapped(meta, index_dir)
+        except (OSError, ValueError):
+            pass
+
+        meta, postings, texts = cls.build(*load_excerpts(directory), fingerprint)
+        try:
+            index_dir.mkdir(parents=True, exist_ok=True)
+            _replace_file(index_dir / "postings.bin", postings)
+            _replace_file(index_dir / "texts.bin", texts)
+            # 元数据最后写入，保证读到的指纹对应完整的索引文件
+            _replace_file(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            return cls._mapped(meta, index_dir)
+        except OSError:
+            return cls(meta, memoryview(postings).cast("I"), memoryview(texts))
+
+    @classmethod
+    def _mapped(cls, meta: Dict, index_dir: pathlib.Path) -> "ExampleIndex":
+        handles, views = [], []
+        for name in ("postings.bin", "texts.bin"):
+            with open(index_dir / name, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    views.append(memoryview(b""))
+                    continue
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            handles.append(mapped)
+            views.append(memoryview(mapped))
+        postings, texts = views
+        return cls(meta, postings.cast("I") if postings.nbytes else memoryview(array("I")), texts, handles)
+
+    def text(self, doc_id: int) -> str:
+        doc = self.docs[doc_id]
+        return bytes(self._texts[doc["offset"]:doc["offset"] + doc["size"]]).decode("utf-8")
+
+    def score(self, query: str, doc_ids: Iterable[int]) -> Dict[int, float]:
+        """对给定文档按查询计算 BM25 分数"""
+        candidates = set(doc_ids)
+        scores = {doc_id: 0.0 for doc_id in candidates}
+        total = len(self.docs)
+        for term in set(tokenize(query)):
+            span = self.terms.get(term)
+            if span is None:
+                continue
+            start, df = span
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for i in range(start, start + df):
+                doc_id, tf = self._postings[2 * i], self._postings[2 * i + 1]
+                if doc_id in candidates:
+                    length = self.docs[doc_id]["length"]
+                    scores[doc_id] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self.avgdl))
+        return scores
+
+
+class ExampleStore:
+    """按期刊检索示例摘录"""
+
+    def __init__(self, directory: Optional[pathlib.Path] = None, index_dir: Optional[pathlib.Path] = None):
+        self.directory = pathlib.Path(directory or os.getenv("FRAMEWORK_EXAMPLES_DIR") or DEFAULT_EXAMPLES_DIR)
+        index_env = os.getenv("FRAMEWORK_EXAMPLES_INDEX")
+        self.index = ExampleIndex.open(self.directory, index_dir or (pathlib.Path(index_env) if index_env else None))
+        self._doc_ids: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, doc in enumerate(self.index.docs):
+            self._doc_ids[doc["journal"]].append(doc_id)
+        # 规范化后的期刊名、别名与缩写 -> 期刊名
+        self._names: Dict[str, str] = {}
+        for journal, aliases in self.index.aliases.items():
+            for name in (journal, *aliases):
+                normalized = normalize_journal_name(name)
+                self._names.setdefault(normalized, journal)
+                if len(normalized.split()) > 1:
+                    self._names.setdefault(_acronym(normalized), journal)
+
+    @property
+    def journals(self) -> List[str]:
+        return list(self._doc_ids)
+
+    def match_journal(self, name: str) -> Optional[str]:
+        """把调用方给出的期刊名匹配到收录的期刊，匹配不到时返回 None"""
+        normalized = normalize_journal_name(name or "")
+        if not normalized:
+            return None
+        if normalized in self._names:
+            return self._names[normalized]
+        # 期刊要求中带有其他说明时（如 "Information Systems Research, 8000字"）按包含关系匹配，取最长的名字
+        contained = [known for known in self._names if len(known) > 4 and known in normalized]
+        if contained:
+            return self._names[max(contained, key=len)]
+        best, ratio = None, 0.0
+        for known, journal in self._names.items():
+            similarity = difflib.SequenceMatcher(None, normalized, known).ratio()
+            if similarity > ratio:
+                best, ratio = journal, similarity
+        return best if ratio >= JOURNAL_MATCH_THRESHOLD else None
+
+    def search(self, journal_name: str, query: str = "", top_k: int = 4, token_budget: int = 1500) -> List[Excerpt]:
+        """返回该期刊中与查询最相关的至多 top_k 段摘录，总token数不超过预算，按原文顺序排列
+
+        分数相同时按原文顺序取前面的摘录；预算连一段都放不下时只取最相关的一段。
+        """
+        journal = self.match_journal(journal_name)
+        if journal is None:
+            return []
+        scores = self.index.score(query, self._doc_ids[journal])
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], self.index.docs[doc_id]["order"]))
+        chosen, used = [], 0
+        for doc_id in ranked:
+            tokens = self.index.docs[doc_id]["tokens"]
+            if chosen and used + tokens > token_budget:
+                continue
+            chosen.append(doc_id)
+            used += tokens
+            if len(chosen) >= top_k:
+                break
+        chosen.sort(key=lambda doc_id: self.index.docs[doc_id]["order"])
+        return [
+            Excerpt(journal, self.index.docs[doc_id]["section"], self.index.text(doc_id), self.index.docs[doc_id]["order"])
+            for doc_id in chosen
+        ]
+
+    def render(self, journal_name: str, query: str = "", top_k: Optional[int] = None, token_budget: Optional[int] = None) -> str:
+        """检索并拼接为提示词中的示例文本；期刊未收录时返回空字符串"""
+        excerpts = self.search(
+            journal_name,
+            query,
+            top_k=top_k or int(os.getenv("FRAMEWORK_EXAMPLES_TOP_K", "4")),
+            token_budget=token_budget or int(os.getenv("FRAMEWORK_EXAMPLES_TOKEN_BUDGET", "1500")),
+        )
+        return "\n\n".join(excerpt.text for excerpt in excerpts)
+
+
+_example_store: Optional[ExampleStore] = None
+_example_store_lock = threading.Lock()
+
+
+def get_example_store() -> ExampleStore:
+    """获取进程内共享的示例库（首次使用时建立或打开索引）"""
+    global _example_store
+    with _example_store_lock:
+        if _example_store is None:
+            _example_store = ExampleStore()
+        return _example_store
+
+
+def set_example_store(store: ExampleStore) -> None:
+    """替换共享的示例库，用于测试或切换示例目录；同时清空 get_journal_examples 中旧示例库渲染的结果"""
+    from agent.tools_and_schemas import get_journal_examples
+
+    global _example_store
+    with _example_store_lock:
+        _example_store = store
+        get_journal_examples.cache_clear()
@@ -1,187 +1,774 @@
+import threading
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
 
-from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from langchain_core.prompts import ChatPromptTemplate
 
-from agent.state import PaperFrameworkState
-from agent.configuration import get_llm_by_config
+from agent.configuration import get_run_setting
+from agent.history import framework_draft, framework_step, history_update, supersede_previous_draft
+from agent.llm_call import (
+    LLMCall,
+    arun_llm_call,
+    arun_structured_call,
+    estimate_tokens,
+    request_id_from_config,
+    run_llm_call,
+    run_structured_call,
+)
+from agent.metrics import get_llm_metrics
+from agent.routing import parse_fallbacks, parse_model_target
+from agent.sections import find_section, format_outline, merge_sections, split_sections, splice_sections
+from agent.state import PaperFrameworkState, SectionRevisionTask, SectionTask
 from agent.prompts import (
+    framework_examples_prefix,
     framework_generation_instructions,
+    framework_outline_instructions,
+    framework_section_instructions,
     framework_refinement_instructions,
+    framework_section_critique_instructions,
+    framework_section_revision_instructions,
+    framework_structured_validation_instructions,
     framework_validation_instructions,
 )
-from agent.tools_and_schemas import get_journal_examples
+from agent.tools_and_schemas import FrameworkCritique, FrameworkOutline, FrameworkValidation, get_journal_examples
 
-load_dotenv()
 
+def _framework_prompt(instructions: str, human: str) -> ChatPromptTemplate:
+    """框架节点的提示词：系统消息由共享的期刊示例前缀与节点说明两块组成，可变内容只放在用户消息中"""
+    return ChatPromptTemplate.from_messages([
+        ("system", [
+            {"type": "text", "text": framework_examples_prefix},
+            {"type": "text", "text": instructions}
+        ]),
+        ("human", human)
+    ])
 
-def generate_framework(state: PaperFrameworkState) -> PaperFrameworkState:
-    """生成初始理论框架"""
+
+# 提示词模板在导入时构建一次，各节点调用时直接复用
+GENERATION_PROMPT = _framework_prompt(
+    framework_generation_instructions,
+    "请为以下研究生成理论框架：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}"
+)
+
+REFINEMENT_PROMPT = _framework_prompt(
+    framework_refinement_instructions,
+    "请对以下理论框架进行精炼改进：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n当前框架：{current_framework}{review_fixes}"
+)
+
+VALIDATION_PROMPT = _framework_prompt(
+    framework_validation_instructions,
+    "请评估以下理论框架的质量：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n理论框架：{current_framework}"
+)
+
+OUTLINE_PROMPT = _framework_prompt(
+    framework_outline_instructions,
+    "请为以下研究拟定理论框架的小节提纲，给出 3 到 {max_sections} 个小节：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}"
+)
+
+# 同一次运行的各小节调用共享主题与提纲，只有最后的小节要求不同
+SECTION_PROMPT = _framework_prompt(
+    framework_section_instructions,
+    "研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n\n框架提纲：\n{outline}\n\n"
+    "请撰写第 {section_number} 节「{section_name}」，篇幅约 {section_length} 字，要点：\n{key_points}"
+)
+
+SECTION_CRITIQUE_PROMPT = _framework_prompt(
+    framework_section_critique_instructions,
+    "请找出以下理论框架中需要修改的小节：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n理论框架：{current_framework}"
+)
+
+SECTION_REVISION_PROMPT = _framework_prompt(
+    framework_section_revision_instructions,
+    "研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n\n框架各小节标题：\n{headings}\n\n"
+    "请修改小节「{section_name}」：\n{section_content}\n\n需要解决的问题：\n{issues}"
+)
+
+STRUCTURED_VALIDATION_PROMPT = _framework_prompt(
+    framework_structured_validation_instructions,
+    "请评估以下理论框架的质量：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n理论框架：{current_framework}"
+)
+
+
+# 各节点使用的模型设置，未设置时使用 framework_model
+NODE_MODEL_SETTINGS = {
+    "generate_framework": "generate_model",
+    "outline_framework": "generate_model",
+    "generate_section": "generate_model",
+    "refine_framework": "refine_model",
+    "revise_section": "refine_model",
+    "validate_framework": "validate_model",
+}
+# 各节点的输出上限设置，分组与 NODE_MODEL_SETTINGS 相同
+NODE_OUTPUT_SETTINGS = {node: setting.replace("_model", "_max_tokens") for node, setting in NODE_MODEL_SETTINGS.items()}
+
+
+def node_model(state: Mapping[str, Any], config: Optional[RunnableConfig], node: str) -> Tuple[str, str]:
+    """节点使用的 (api_config, model)；模型升级后精炼改用 framework_model"""
+    strong = (state["api_config"], state["framework_model"])
+    setting = NODE_MODEL_SETTINGS[node]
+    if setting == "refine_model" and state.get("model_escalated"):
+        return strong
+    return parse_model_target(get_run_setting(state, config, setting), state["api_config"]) or strong
+
+
+def _call_settings(state: Mapping[str, Any], config: Optional[RunnableConfig], node: str) -> Dict[str, Any]:
+    """节点模型调用共用的参数：模型、缓存、公平排队的请求标识、备用模型链与token预算"""
+    api_config, model = node_model(state, config, node)
+    return {
+        "node": node,
+        "api_config": api_config,
+        "model": model,
+        "bypass_cache": state.get("bypass_cache", False),
+        "request_id": request_id_from_config(config),
+        "fallbacks": parse_fallbacks(get_run_setting(state, config, "fallback_models")),
+        "hedge_after": get_run_setting(state, config, "hedge_after"),
+        "max_output_tokens": get_run_setting(state, config, NODE_OUTPUT_SETTINGS[node]),
+        "max_prompt_tokens": get_run_setting(state, config, "max_prompt_tokens"),
+    }
+
+
+def _with_usage(update: dict, call: LLMCall) -> dict:
+    """在状态增量中附上本次模型调用的用量记录（llm_calls 按调用顺序累加），并计入进程内统计"""
+    report = call.report()
+    get_llm_metrics().observe(report)
+    update["llm_calls"] = [report]
+    return update
+
+
+def journal_examples_for(state) -> str:
+    """按期刊检索与研究主题、方法最相关的示例；同一次运行的各节点（含分节任务）得到同一段文本"""
+    return get_journal_examples(state["journal_requirements"], f"{state['paper_topic']} {state['methodology']}")
+
+
+def _generation_request(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建生成框架的模型调用"""
     # 获取期刊示例
-    journal_examples = get_journal_examples(state["journal_requirements"])
-    
-    # 构建提示词
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", framework_generation_instructions),
-        ("human", "请为以下研究生成理论框架：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}")
-    ])
-    
-    # 根据API配置获取LLM
-    llm = get_llm_by_config(state["api_config"], state["framework_model"])
-    
-    # 生成框架
-    chain = prompt | llm
-    response = chain.invoke({
-        "paper_topic": state["paper_topic"],
-        "methodology": state["methodology"],
-        "journal_requirements": state["journal_requirements"],
-        "journal_examples": journal_examples
-    })
-    
-    framework = response.content
-    
-    # 更新状态
-    new_messages = list(state["messages"]) + [
+    journal_examples = journal_examples_for(state)
+
+    return LLMCall(
+        prompt=GENERATION_PROMPT,
+        **_call_settings(state, config, "generate_framework"),
+        # 输出上限按目标篇幅留出余量，max_framework_length 由此生效
+        expected_output_tokens=get_run_setting(state, config, "max_framework_length"),
+        inputs={
+            "paper_topic": state["paper_topic"],
+            "methodology": state["methodology"],
+            "journal_requirements": state["journal_requirements"],
+            "journal_examples": journal_examples
+        }
+    )
+
+
+def _generation_update(state: PaperFrameworkState, framework: str) -> dict:
+    """根据生成结果返回状态增量，messages 只包含新增消息，由 append_messages 追加；上一版框架替换为引用"""
+    new_messages = supersede_previous_draft(state["messages"]) + [
         HumanMessage(content=f"请为我的研究生成理论框架：\n主题：{state['paper_topic']}\n方法：{state['methodology']}\n期刊：{state['journal_requirements']}"),
-        AIMessage(content=framework)
+        framework_draft(framework)
     ]
-    
+
     return {
-        **state,
         "messages": new_messages,
         "current_framework": framework,
-        "refinement_count": 0
+        "refinement_count": 0,
+        "refinement_stop_reason": "" if state["framework_refinement_loops"] > 0 else "max_loops"
     }
 
 
-def refine_framework(state: PaperFrameworkState) -> PaperFrameworkState:
-    """精炼理论框架"""
-    if state["refinement_count"] >= state["framework_refinement_loops"]:
-        return state
-    
+def generate_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """生成初始理论框架"""
+    call = _generation_request(state, config)
+    return _with_usage(_generation_update(state, run_llm_call(call)), call)
+
+
+async def agenerate_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """生成初始理论框架（异步）"""
+    call = _generation_request(state, config)
+    return _with_usage(_generation_update(state, await arun_llm_call(call)), call)
+
+
+# 分节生成：提纲 -> 并行生成各小节（Send） -> 拼接
+SECTION_TASK_KEYS = (
+    "paper_topic", "methodology", "journal_requirements", "framework_model", "api_config", "bypass_cache",
+    "fallback_models", "hedge_after", "generate_model", "refine_model", "model_escalated", "max_prompt_tokens",
+)
+
+
+# 结构化输出（工具调用 JSON）的预估输出token数按小节数计算，输出上限在此基础上留出余量，
+# 不能用固定的小数目：提纲或修改意见的 JSON 被截断后无法解析
+STRUCTURED_OUTPUT_BASE_TOKENS = 100
+STRUCTURED_TOKENS_PER_SECTION = 200
+
+
+def _outline_request(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建生成小节提纲的模型调用"""
+    max_sections = get_run_setting(state, config, "max_framework_sections")
+    return LLMCall(
+        prompt=OUTLINE_PROMPT,
+        schema=FrameworkOutline,
+        **_call_settings(state, config, "outline_framework"),
+        expected_output_tokens=STRUCTURED_OUTPUT_BASE_TOKENS + STRUCTURED_TOKENS_PER_SECTION * max_sections,
+        inputs={
+            "paper_topic": state["paper_topic"],
+            "methodology": state["methodology"],
+            "journal_requirements": state["journal_requirements"],
+            "journal_examples": journal_examples_for(state),
+            "max_sections": max_sections
+        }
+    )
+
+
+def _outline_update(state: PaperFrameworkState, outline: FrameworkOutline, config: Optional[RunnableConfig] = None) -> dict:
+    max_sections = get_run_setting(state, config, "max_framework_sections")
+    sections = [section.model_dump(exclude={"content"}) for section in outline.sections[:max_sections]]
+    return {"framework_outline": sections, "framework_sections": None}
+
+
+def outline_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """生成框架的小节提纲"""
+    call = _outline_request(state, config)
+    return _with_usage(_outline_update(state, run_structured_call(call), config), call)
+
+
+async def aoutline_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """生成框架的小节提纲（异步）"""
+    call = _outline_request(state, config)
+    return _with_usage(_outline_update(state, await arun_structured_call(call), config), call)
+
+
+def dispatch_sections(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> Union[str, List[Send]]:
+    """为提纲中的每个小节派发一个并行的 generate_section 任务；提纲为空时退回整体生成"""
+    sections = state.get("framework_outline") or []
+    if not sections:
+        return "generate_framework"
+    outline = format_outline(sections)
+    section_length = get_run_setting(state, config, "max_framework_length") // len(sections)
+    base = {key: state[key] for key in SECTION_TASK_KEYS if key in state}
+    return [
+        Send("generate_section", {**base, "outline": outline, "section_index": index, "section": section, "section_length": section_length})
+        for index, section in enumerate(sections)
+    ]
+
+
+def _section_request(task: SectionTask, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建生成单个小节的模型调用"""
+    section = task["section"]
+    return LLMCall(
+        prompt=SECTION_PROMPT,
+        **_call_settings(task, config, "generate_section"),
+        expected_output_tokens=task["section_length"],
+        inputs={
+            "paper_topic": task["paper_topic"],
+            "methodology": task["methodology"],
+            "journal_requirements": task["journal_requirements"],
+            "journal_examples": journal_examples_for(task),
+            "outline": task["outline"],
+            "section_number": task["section_index"] + 1,
+            "section_name": section["section_name"],
+            "key_points": "\n".join(f"- {point}" for point in section.get("key_points", [])),
+            "section_length": task["section_length"]
+        }
+    )
+
+
+def _section_update(task: SectionTask, content: str) -> dict:
+    section = {"index": task["section_index"], "section_name": task["section"]["section_name"], "content": content}
+    return {"framework_sections": [section]}
+
+
+def generate_section(task: SectionTask, config: RunnableConfig) -> dict:
+    """生成一个小节的正文"""
+    call = _section_request(task, config)
+    return _with_usage(_section_update(task, run_llm_call(call)), call)
+
+
+async def agenerate_section(task: SectionTask, config: RunnableConfig) -> dict:
+    """生成一个小节的正文（异步）"""
+    call = _section_request(task, config)
+    return _with_usage(_section_update(task, await arun_llm_call(call)), call)
+
+
+def merge_framework_sections(state: PaperFrameworkState) -> dict:
+    """按提纲顺序拼接各小节，作为初始框架"""
+    return _generation_update(state, merge_sections(state["framework_sections"]))
+
+
+def compact_history(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """压缩追问时带来的对话历史：保留最近几轮，更早的折叠进摘要，被取代的框架草稿替换为引用"""
+    messages = history_update(
+        state["messages"],
+        get_run_setting(state, config, "history_keep_turns"),
+        get_run_setting(state, config, "history_summary_tokens"),
+    )
+    return {"messages": messages} if messages else {}
+
+
+def choose_generation_mode(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> str:
+    """generation_mode 为 sections 时先拟提纲再分节并行生成，否则一次生成整个框架"""
+    if get_run_setting(state, config, "generation_mode") == "sections":
+        return "outline"
+    return "generate"
+
+
+def _review_fixes(state: PaperFrameworkState) -> str:
+    """上一次结构化验证未通过时给出的修改意见，附加在精炼提示词之后"""
+    validation = state.get("validation")
+    if not validation or validation.get("passed") or not validation.get("fixes"):
+        return ""
+    fixes = "\n".join(f"- {fix}" for fix in validation["fixes"])
+    return f"\n\n审稿意见（请逐条修改）：\n{fixes}"
+
+
+def _refinement_request(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建精炼框架的模型调用"""
     # 获取期刊示例
-    journal_examples = get_journal_examples(state["journal_requirements"])
-    
-    # 构建精炼提示词
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", framework_refinement_instructions),
-        ("human", "请对以下理论框架进行精炼改进：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n当前框架：{current_framework}")
-    ])
-    
-    # 根据API配置获取LLM
-    llm = get_llm_by_config(state["api_config"], state["framework_model"])
-    
-    # 精炼框架
-    chain = prompt | llm
-    response = chain.invoke({
-        "paper_topic": state["paper_topic"],
-        "methodology": state["methodology"],
-        "journal_requirements": state["journal_requirements"],
-        "current_framework": state["current_framework"],
-        "journal_examples": journal_examples
-    })
-    
-    refined_framework = response.content
-    
-    # 更新状态
-    new_messages = list(state["messages"]) + [
-        HumanMessage(content="请对当前框架进行精炼改进"),
-        AIMessage(content=refined_framework)
+    journal_examples = journal_examples_for(state)
+
+    return LLMCall(
+        prompt=REFINEMENT_PROMPT,
+        **_call_settings(state, config, "refine_framework"),
+        # 输出上限按目标篇幅留出余量，max_framework_length 由此生效
+        expected_output_tokens=get_run_setting(state, config, "max_framework_length"),
+        inputs={
+            "paper_topic": state["paper_topic"],
+            "methodology": state["methodology"],
+            "journal_requirements": state["journal_requirements"],
+            "current_framework": state["current_framework"],
+            "review_fixes": _review_fixes(state),
+            "journal_examples": journal_examples
+        }
+    )
+
+
+def framework_similarity(previous: str, current: str) -> float:
+    """相邻两版框架的文本相似度，1.0 表示完全相同
+
+    按行比较：框架是分行的Markdown，逐行比较既能反映改动量，
+    又避免了长中文文本逐字比较的平方级开销。
+    """
+    if previous == current:
+        return 1.0
+    if not previous or not current:
+        return 0.0
+    return SequenceMatcher(None, previous.splitlines(), current.splitlines()).ratio()
+
+
+def _refinement_update(state: PaperFrameworkState, refined_framework: str, config: Optional[RunnableConfig] = None) -> dict:
+    """根据精炼结果返回状态增量
+
+    开启收敛检测（convergence_threshold）时，若本次精炼与上一版的相似度达到阈值，
+    记录停止原因为 converged，should_continue_refining 据此提前进入验证。
+    """
+    new_messages = supersede_previous_draft(state["messages"]) + [
+        framework_step("请对当前框架进行精炼改进"),
+        framework_draft(refined_framework)
     ]
-    
-    return {
-        **state,
+    refinement_count = state["refinement_count"] + 1
+
+    update = {
         "messages": new_messages,
         "current_framework": refined_framework,
-        "refinement_count": state["refinement_count"] + 1
+        "refinement_count": refinement_count
     }
 
+    threshold = get_run_setting(state, config, "convergence_threshold")
+    if threshold is not None:
+        similarity = framework_similarity(state["current_framework"], refined_framework)
+        update["framework_similarity"] = similarity
+        min_loops = get_run_setting(state, config, "min_refinement_loops")
+        if similarity >= threshold and refinement_count >= min_loops and refinement_count < state["framework_refinement_loops"]:
+            update["refinement_stop_reason"] = "converged"
+    if "refinement_stop_reason" not in update and refinement_count >= state["framework_refinement_loops"]:
+        update["refinement_stop_reason"] = "max_loops"
+    return update
 
-def validate_framework(state: PaperFrameworkState) -> PaperFrameworkState:
-    """验证框架质量"""
+
+# 分节精炼：找出需要修改的小节 -> 并行修改（Send） -> 拼回原框架
+def _sections_to_refine(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> Optional[List[dict]]:
+    """refinement_mode 为 sections 且框架能按标题拆成多个小节时返回拆分结果，否则返回 None（整体重写）"""
+    if get_run_setting(state, config, "refinement_mode") != "sections":
+        return None
+    sections = split_sections(state["current_framework"])
+    if sum(1 for section in sections if section["heading"]) < 2:
+        return None
+    return sections
+
+
+def _plan_from_validation(state: PaperFrameworkState, sections: List[dict]) -> Optional[List[dict]]:
+    """结构化验证未通过且指出了具体小节时，直接按验证意见确定要修改的小节"""
+    validation = state.get("validation")
+    if not validation or validation.get("passed") or not validation.get("weak_sections"):
+        return None
+    plan = {}
+    for name in validation["weak_sections"]:
+        section = find_section(sections, name)
+        if section is not None:
+            plan[section["index"]] = {"index": section["index"], "issues": validation["fixes"]}
+    return list(plan.values()) or None
+
+
+def _critique_request(
+    state: PaperFrameworkState, config: Optional[RunnableConfig] = None, sections: Optional[List[dict]] = None
+) -> LLMCall:
+    """构建找出待修改小节的模型调用，输出上限按框架的小节数计算"""
+    sections = split_sections(state["current_framework"]) if sections is None else sections
+    return LLMCall(
+        prompt=SECTION_CRITIQUE_PROMPT,
+        schema=FrameworkCritique,
+        **_call_settings(state, config, "refine_framework"),
+        expected_output_tokens=STRUCTURED_OUTPUT_BASE_TOKENS + STRUCTURED_TOKENS_PER_SECTION * max(len(sections), 1),
+        inputs={
+            "paper_topic": state["paper_topic"],
+            "methodology": state["methodology"],
+            "journal_requirements": state["journal_requirements"],
+            "current_framework": state["current_framework"],
+            "journal_examples": journal_examples_for(state)
+        }
+    )
+
+
+def _plan_from_critique(sections: List[dict], critique: FrameworkCritique) -> List[dict]:
+    plan = {}
+    for revision in critique.revisions:
+        section = find_section(sections, revision.section_name)
+        if section is not None:
+            plan.setdefault(section["index"], {"index": section["index"], "issues": []})["issues"] += revision.issues
+    return list(plan.values())
+
+
+def _section_plan_update(state: PaperFrameworkState, plan: List[dict]) -> dict:
+    """记录本轮待修改的小节；没有需要修改的小节时视为已收敛"""
+    if not plan:
+        return {"refinement_count": state["refinement_count"] + 1, "refinement_stop_reason": "converged"}
+    return {"section_revisions": plan, "framework_sections": None}
+
+
+def _escalation_refine_pending(state: PaperFrameworkState) -> bool:
+    """模型已升级但还没有用 framework_model 精炼过"""
+    return bool(state.get("model_escalated")) and not state.get("escalation_refined")
+
+
+def _refinement_exhausted(state: PaperFrameworkState) -> bool:
+    """精炼次数已用完；模型升级后即使次数用完也允许再精炼一次"""
+    return state["refinement_count"] >= state["framework_refinement_loops"] and not _escalation_refine_pending(state)
+
+
+def _mark_escalation_refined(state: PaperFrameworkState, update: dict) -> dict:
+    """升级后的第一次精炼记为已使用，之后按精炼次数正常结束"""
+    if _escalation_refine_pending(state):
+        update["escalation_refined"] = True
+    return update
+
+
+def refine_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """精炼理论框架"""
+    if _refinement_exhausted(state):
+        return {}
+    return _mark_escalation_refined(state, _refine(state, config))
+
+
+def _refine(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    sections = _sections_to_refine(state, config)
+    if sections is not None:
+        plan = _plan_from_validation(state, sections)
+        if plan is not None:
+            return _section_plan_update(state, plan)
+        critique = _critique_request(state, config, sections)
+        plan = _plan_from_critique(sections, run_structured_call(critique))
+        return _with_usage(_section_plan_update(state, plan), critique)
+
+    call = _refinement_request(state, config)
+    return _with_usage(_refinement_update(state, run_llm_call(call), config), call)
+
+
+async def arefine_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """精炼理论框架（异步）"""
+    if _refinement_exhausted(state):
+        return {}
+    return _mark_escalation_refined(state, await _arefine(state, config))
+
+
+async def _arefine(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    sections = _sections_to_refine(state, config)
+    if sections is not None:
+        plan = _plan_from_validation(state, sections)
+        if plan is not None:
+            return _section_plan_update(state, plan)
+        critique = _critique_request(state, config, sections)
+        plan = _plan_from_critique(sections, await arun_structured_call(critique))
+        return _with_usage(_section_plan_update(state, plan), critique)
+
+    call = _refinement_request(state, config)
+    return _with_usage(_refinement_update(state, await arun_llm_call(call), config), call)
+
+
+def dispatch_section_revisions(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> Union[str, List[Send]]:
+    """有待修改的小节时为每节派发一个并行的 revise_section 任务，否则按 should_continue_refining 路由"""
+    plan = state.get("section_revisions")
+    if not plan:
+        return should_continue_refining(state, config)
+    sections = split_sections(state["current_framework"])
+    headings = "\n".join(section["section_name"] for section in sections if section["heading"])
+    base = {key: state[key] for key in SECTION_TASK_KEYS if key in state}
+    return [
+        Send("revise_section", {**base, "headings": headings, "section": sections[item["index"]], "issues": item["issues"]})
+        for item in plan
+    ]
+
+
+def _revision_request(task: SectionRevisionTask, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建修改单个小节的模型调用，输入与输出都只包含该小节"""
+    section = task["section"]
+    return LLMCall(
+        prompt=SECTION_REVISION_PROMPT,
+        **_call_settings(task, config, "revise_section"),
+        expected_output_tokens=estimate_tokens(section["content"]) + 200,
+        inputs={
+            "paper_topic": task["paper_topic"],
+            "methodology": task["methodology"],
+            "journal_requirements": task["journal_requirements"],
+            "journal_examples": journal_examples_for(task),
+            "headings": task["headings"],
+            "section_name": section["section_name"],
+            "section_content": section["content"].strip(),
+            "issues": "\n".join(f"- {issue}" for issue in task["issues"])
+        }
+    )
+
+
+def _revision_update(task: SectionRevisionTask, content: str) -> dict:
+    section = {"index": task["section"]["index"], "section_name": task["section"]["section_name"], "content": content}
+    return {"framework_sections": [section]}
+
+
+def revise_section(task: SectionRevisionTask, config: RunnableConfig) -> dict:
+    """修改一个小节"""
+    call = _revision_request(task, config)
+    return _with_usage(_revision_update(task, run_llm_call(call)), call)
+
+
+async def arevise_section(task: SectionRevisionTask, config: RunnableConfig) -> dict:
+    """修改一个小节（异步）"""
+    call = _revision_request(task, config)
+    return _with_usage(_revision_update(task, await arun_llm_call(call)), call)
+
+
+def splice_revised_sections(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """把修改后的小节拼回框架，其余小节原样保留"""
+    sections = split_sections(state["current_framework"])
+    update = _refinement_update(state, splice_sections(sections, state["framework_sections"]), config)
+    update["section_revisions"] = []
+    return update
+
+
+def _validation_request(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> LLMCall:
+    """构建验证框架的模型调用，structured 模式下要求返回 FrameworkValidation"""
     # 获取期刊示例
-    journal_examples = get_journal_examples(state["journal_requirements"])
-    
-    # 构建验证提示词
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", framework_validation_instructions),
-        ("human", "请评估以下理论框架的质量：\n\n研究主题：{paper_topic}\n研究方法：{methodology}\n目标期刊：{journal_requirements}\n理论框架：{current_framework}")
-    ])
-    
-    # 根据API配置获取LLM
-    llm = get_llm_by_config(state["api_config"], state["framework_model"])
-    
-    # 验证框架
-    chain = prompt | llm
-    response = chain.invoke({
-        "paper_topic": state["paper_topic"],
-        "methodology": state["methodology"],
-        "journal_requirements": state["journal_requirements"],
-        "current_framework": state["current_framework"],
-        "journal_examples": journal_examples
-    })
-    
-    validation_result = response.content
-    
-    # 更新状态
-    new_messages = list(state["messages"]) + [
-        HumanMessage(content="请评估当前框架的质量"),
+    journal_examples = journal_examples_for(state)
+    structured = get_run_setting(state, config, "validation_mode") == "structured"
+
+    return LLMCall(
+        prompt=STRUCTURED_VALIDATION_PROMPT if structured else VALIDATION_PROMPT,
+        schema=FrameworkValidation if structured else None,
+        **_call_settings(state, config, "validate_framework"),
+        inputs={
+            "paper_topic": state["paper_topic"],
+            "methodology": state["methodology"],
+            "journal_requirements": state["journal_requirements"],
+            "current_framework": state["current_framework"],
+            "journal_examples": journal_examples
+        }
+    )
+
+
+def _validation_update(state: PaperFrameworkState, validation_result: str) -> dict:
+    """根据验证结果返回状态增量"""
+    new_messages = [
+        framework_step("请评估当前框架的质量"),
         AIMessage(content=validation_result)
     ]
-    
+
     return {
-        **state,
         "messages": new_messages,
         "final_framework": state["current_framework"]
     }
 
 
-def should_continue_refining(state: PaperFrameworkState) -> str:
-    """决定是否继续精炼"""
+def format_validation(validation: FrameworkValidation, passed: bool) -> str:
+    """把结构化验证结果整理为可读的评估文本"""
+    lines = [f"总体评分：{validation.overall_score:.1f}/10（{'通过' if passed else '未通过'}）", validation.summary, "", "各维度评分："]
+    lines += [f"- {item.dimension}：{item.score}/10，{item.comment}" for item in validation.scores]
+    if validation.fixes:
+        lines += ["", "修改意见："]
+        lines += [f"- {fix}" for fix in validation.fixes]
+    return "\n".join(lines)
+
+
+def _should_escalate(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> bool:
+    """当前稿件是否由比 framework_model 便宜的模型写成且可以升级"""
+    if state.get("model_escalated") or not get_run_setting(state, config, "escalate_on_failure"):
+        return False
+    drafted_by = "refine_framework" if state["refinement_count"] > 0 else "generate_framework"
+    return node_model(state, config, drafted_by) != (state["api_config"], state["framework_model"])
+
+
+def _structured_validation_update(state: PaperFrameworkState, validation: FrameworkValidation, config: Optional[RunnableConfig] = None) -> dict:
+    """根据结构化验证结果返回状态增量
+
+    只有模型判定通过且总体评分不低于 validation_pass_score 才算通过；
+    未通过时修改意见保存在 validation 中，供下一次精炼使用。
+    """
+    passed = validation.passed and validation.overall_score >= get_run_setting(state, config, "validation_pass_score")
+    update = _validation_update(state, format_validation(validation, passed))
+    update["validation"] = {**validation.model_dump(), "passed": passed}
+    if passed:
+        update["refinement_stop_reason"] = "passed"
+    elif _should_escalate(state, config):
+        # 较便宜模型的稿件未通过：之后改用 framework_model 精炼，即使精炼次数已用完也再精炼一次（见 _refinement_exhausted）
+        update["model_escalated"] = True
+        update["refinement_stop_reason"] = ""
+    elif not state.get("refinement_stop_reason") and state["refinement_count"] >= state["framework_refinement_loops"]:
+        update["refinement_stop_reason"] = "max_loops"
+    return update
+
+
+def validate_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """验证框架质量"""
+    call = _validation_request(state, config)
+    if call.schema is not None:
+        return _with_usage(_structured_validation_update(state, run_structured_call(call), config), call)
+    return _with_usage(_validation_update(state, run_llm_call(call)), call)
+
+
+async def avalidate_framework(state: PaperFrameworkState, config: RunnableConfig) -> dict:
+    """验证框架质量（异步）"""
+    call = _validation_request(state, config)
+    if call.schema is not None:
+        return _with_usage(_structured_validation_update(state, await arun_structured_call(call), config), call)
+    return _with_usage(_validation_update(state, await arun_llm_call(call)), call)
+
+
+def should_continue_refining(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> str:
+    """决定是否继续精炼；structured 验证模式下每一版框架都先交给验证"""
+    if get_run_setting(state, config, "validation_mode") == "structured":
+        return "validate"
+    if state.get("refinement_stop_reason") == "converged":
+        return "validate"
     if state["refinement_count"] < state["framework_refinement_loops"]:
         return "refine"
     else:
         return "validate"
 
 
+def should_refine_after_validation(state: PaperFrameworkState, config: Optional[RunnableConfig] = None) -> str:
+    """structured 验证未通过且仍有精炼次数（或模型刚升级）时带着修改意见回到精炼，否则结束"""
+    if get_run_setting(state, config, "validation_mode") != "structured":
+        return "end"
+    if state.get("refinement_stop_reason"):
+        return "end"
+    # 模型刚升级、还没有用 framework_model 精炼过时，即使精炼次数已用完也再精炼一次
+    if not _refinement_exhausted(state):
+        return "refine"
+    return "end"
+
+
+def _node(name: str, func, afunc) -> RunnableLambda:
+    """同时提供同步与异步实现的节点：invoke/stream 走同步版本，ainvoke/astream 走异步版本"""
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+
 # 创建论文Framework生成图
-def create_paper_framework_graph():
-    """创建论文Framework生成的状态图"""
+def create_paper_framework_graph(checkpointer=None):
+    """创建论文Framework生成的状态图
+
+    传入 ``checkpointer`` 时每一步之后按 ``thread_id`` 保存状态，可以从最后完成的节点继续运行。
+    """
     workflow = StateGraph(PaperFrameworkState)
-    
+
     # 添加节点
-    workflow.add_node("generate_framework", generate_framework)
-    workflow.add_node("refine_framework", refine_framework)
-    workflow.add_node("validate_framework", validate_framework)
-    
-    # 设置入口点
-    workflow.set_entry_point("generate_framework")
-    
+    workflow.add_node("compact_history", compact_history)
+    workflow.add_node("generate_framework", _node("generate_framework", generate_framework, agenerate_framework))
+    workflow.add_node("outline_framework", _node("outline_framework", outline_framework, aoutline_framework))
+    workflow.add_node("generate_section", _node("generate_section", generate_section, agenerate_section))
+    workflow.add_node("merge_sections", merge_framework_sections)
+    workflow.add_node("refine_framework", _node("refine_framework", refine_framework, arefine_framework))
+    workflow.add_node("revise_section", _node("revise_section", revise_section, arevise_section))
+    workflow.add_node("splice_sections", splice_revised_sections)
+    workflow.add_node("validate_framework", _node("validate_framework", validate_framework, avalidate_framework))
+
+    # 设置入口点：先压缩对话历史，再整体生成或分节生成
+    workflow.add_edge(START, "compact_history")
+    workflow.add_conditional_edges(
+        "compact_history",
+        choose_generation_mode,
+        {
+            "generate": "generate_framework",
+            "outline": "outline_framework"
+        }
+    )
+
+    # 分节生成：提纲 -> 各小节并行 -> 拼接
+    workflow.add_conditional_edges("outline_framework", dispatch_sections, ["generate_section", "generate_framework"])
+    workflow.add_edge("generate_section", "merge_sections")
+
     # 添加条件边
+    for node in ("generate_framework", "merge_sections", "splice_sections"):
+        workflow.add_conditional_edges(
+            node,
+            should_continue_refining,
+            {
+                "refine": "refine_framework",
+                "validate": "validate_framework"
+            }
+        )
+
+    # 分节精炼：有待修改的小节时并行修改后拼回
     workflow.add_conditional_edges(
-        "generate_framework",
-        should_continue_refining,
+        "refine_framework",
+        dispatch_section_revisions,
         {
             "refine": "refine_framework",
-            "validate": "validate_framework"
+            "validate": "validate_framework",
+            "revise_section": "revise_section"
         }
     )
-    
+    workflow.add_edge("revise_section", "splice_sections")
+
+    # 验证未通过时回到精炼，否则结束
     workflow.add_conditional_edges(
-        "refine_framework",
-        should_continue_refining,
+        "validate_framework",
+        should_refine_after_validation,
         {
             "refine": "refine_framework",
-            "validate": "validate_framework"
+            "end": END
         }
     )
-    
-    # 设置结束点
-    workflow.add_edge("validate_framework", END)
-    
-    return workflow.compile()
+
+    return workflow.compile(checkpointer=checkpointer)
+
+
+_paper_framework_graph = None
+_paper_framework_graph_lock = threading.Lock()
+
+
+def get_paper_framework_graph():
+    """进程内共享的图实例（不带检查点），首次使用时编译一次
+
+    langgraph.json 以此为图工厂：langgraph-api 从模块的 ``__dict__`` 中取图，下面的模块 ``__getattr__`` 对它不可见。
+    """
+    global _paper_framework_graph
+    if _paper_framework_graph is None:
+        with _paper_framework_graph_lock:
+            if _paper_framework_graph is None:
+                _paper_framework_graph = create_paper_framework_graph()
+    return _paper_framework_graph
 
 
-# 创建图实例
-paper_framework_graph = create_paper_framework_graph() 
\ No newline at end of file
+def __getattr__(name: str):
+    # 兼容 ``from agent.graph import paper_framework_graph``，导入模块时不再编译
+    if name == "paper_framework_graph":
+        return get_paper_framework_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,139 @@
+"""对话历史压缩
+
+前端在每次追问时发送完整的 messages 历史，图每生成一版框架又追加一条消息，长会话的请求体、状态与检查点会一直增长。
+图开始时的 compact_history 节点把历史压到有界大小：
+
+- 最近 ``history_keep_turns`` 轮原样保留（一轮从一条用户消息开始，到下一条用户消息之前为止）；
+- 更早的轮次折叠进开头的一条摘要消息。摘要逐轮累加（已有摘要不重新计算），超出 ``history_summary_tokens`` 时丢弃最早的行；
+- 被后续版本取代的框架草稿替换为一行引用，只保留最新一版全文。图内每生成新的一版也会立即替换上一版（见 supersede_previous_draft）。
+
+摘要为抽取式（每条消息截取开头），不额外调用模型：框架提示词并不读取对话历史，模型写的摘要只会增加一次调用的耗时与费用。
+"""
+
+import re
+from typing import List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from agent.budget import estimate_tokens
+from agent.streaming import chunk_text
+
+
+# 图内各步骤的指令、框架草稿、已被取代的草稿引用与历史摘要消息的 name
+STEP_NAME = "framework_step"
+DRAFT_NAME = "framework_draft"
+SUPERSEDED_NAME = "superseded_draft"
+SUMMARY_NAME = "history_summary"
+SUMMARY_HEADER = "此前对话摘要："
+OMITTED_LINE = "（更早的对话已省略）"
+# 摘要中每条消息保留的字数
+SUMMARY_LINE_CHARS = 100
+
+
+def framework_step(content: str) -> HumanMessage:
+    """图在精炼、验证等步骤前追加的指令，摘要中不保留"""
+    return HumanMessage(content=content, name=STEP_NAME)
+
+
+def framework_draft(content: str) -> AIMessage:
+    """图生成的一版框架"""
+    return AIMessage(content=content, name=DRAFT_NAME)
+
+
+def is_draft(message: BaseMessage) -> bool:
+    return isinstance(message, AIMessage) and message.name == DRAFT_NAME
+
+
+def draft_reference(draft: BaseMessage) -> AIMessage:
+    """替换被取代草稿的引用消息，id 不变，由 append_messages 原位替换"""
+    return AIMessage(
+        content=f"[框架草稿，已被后续版本取代，原文 {len(chunk_text(draft))} 字]",
+        name=SUPERSEDED_NAME,
+        id=draft.id,
+    )
+
+
+def supersede_previous_draft(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """生成新一版框架时，把历史中最新的一版替换为引用；没有草稿时返回空列表
+
+    更早的草稿在各自被取代时已经替换过，因此只需从末尾找到第一条草稿。
+    """
+    for message in reversed(messages):
+        if is_draft(message):
+            return [draft_reference(message)]
+    return []
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """按用户消息切分为轮次；第一条用户消息之前的消息单独成一轮"""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _clip(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def summary_lines(turn: Sequence[BaseMessage]) -> List[str]:
+    """一轮对话在摘要中的行"""
+    lines = []
+    for message in turn:
+        if isinstance(message, HumanMessage) and message.name != STEP_NAME:
+            lines.append(f"用户：{_clip(chunk_text(message))}")
+        elif is_draft(message):
+            lines.append(f"助手：生成了一版框架（{len(chunk_text(message))} 字）")
+        # 被取代的草稿不进入摘要
+        elif isinstance(message, AIMessage) and message.name != SUPERSEDED_NAME:
+            lines.append(f"助手：{_clip(chunk_text(message))}")
+    return lines
+
+
+def _summary(previous: Optional[BaseMessage], turns: Sequence[Sequence[BaseMessage]], max_tokens: int) -> SystemMessage:
+    """在已有摘要后追加折叠的轮次，超出预算时从最早的行开始丢弃"""
+    lines = chunk_text(previous).splitlines()[1:] if previous is not None else []
+    omitted = bool(lines) and lines[0] == OMITTED_LINE
+    if omitted:
+        lines = lines[1:]
+    for turn in turns:
+        lines.extend(summary_lines(turn))
+
+    tokens = estimate_tokens("\n".join([SUMMARY_HEADER, OMITTED_LINE, *lines]))
+    start = 0
+    while start < len(lines) and tokens > max_tokens:
+        tokens -= estimate_tokens(lines[start]) + 1
+        start += 1
+    if start:
+        omitted = True
+    body = ([OMITTED_LINE] if omitted else []) + lines[start:]
+    return SystemMessage(content="\n".join([SUMMARY_HEADER, *body]), name=SUMMARY_NAME, id=previous.id if previous else None)
+
+
+def compact_messages(messages: Sequence[BaseMessage], keep_turns: int, summary_tokens: int) -> Optional[List[BaseMessage]]:
+    """压缩后的完整历史；无需压缩时返回 None"""
+    previous = messages[0] if messages and messages[0].name == SUMMARY_NAME else None
+    turns = split_turns(messages[1:] if previous is not None else messages)
+    rolled, kept = (turns[:-keep_turns], turns[-keep_turns:]) if keep_turns > 0 else (turns, [])
+
+    recent = [message for turn in kept for message in turn]
+    drafts = [index for index, message in enumerate(recent) if is_draft(message)]
+    for index in drafts[:-1]:
+        recent[index] = draft_reference(recent[index])
+    if not rolled and len(drafts) <= 1:
+        return None
+
+    head = [_summary(previous, rolled, summary_tokens)] if rolled or previous is not None else []
+    return head + recent
+
+
+def history_update(messages: Sequence[BaseMessage], keep_turns: int, summary_tokens: int) -> List[BaseMessage]:
+    """compact_history 节点提交给 messages reducer 的增量：清空后写入压缩后的历史"""
+    compacted = compact_messages(messages, keep_turns, summary_tokens)
+    if compacted is None:
+        return []
+    return [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]
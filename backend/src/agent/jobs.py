@@ -0,0 +1,398 @@
+"""后台任务：提交后立即返回任务ID，由进程内的有界工作池排队运行
+
+- 排队的任务按优先级（high / normal / low）出队，同一优先级先到先运行；
+- 排队数达到上限时拒绝新任务（接口返回 429），不会无限堆积；
+- 运行中的节点进度与模型输出通过订阅推送（``GET /jobs/{id}/events``）；
+- 任务记录可以保存在本地SQLite文件中，进程重启后未完成的任务重新排队，
+  图启用了检查点时从最后完成的节点继续运行。
+
+配置（环境变量）：
+
+- ``FRAMEWORK_JOB_WORKERS``: 同时运行的任务数，默认 4
+- ``FRAMEWORK_JOB_QUEUE_SIZE``: 最多排队的任务数，默认 100
+- ``FRAMEWORK_JOB_BACKEND``: ``memory``（默认）或 ``sqlite``
+- ``FRAMEWORK_JOB_PATH``: SQLite文件路径，默认 ``framework_jobs.sqlite``
+- ``FRAMEWORK_JOB_RETENTION``: 已结束的任务保留的秒数，默认 86400
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from agent.batch import BatchItem, initial_state_for
+from agent.checkpoint import thread_config
+from agent.metrics import summarize_calls
+from agent.streaming import stream_graph_events, to_jsonable
+
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED = ("succeeded", "failed", "cancelled")
+# 订阅时补发的历史事件类型；token 事件只推送给正在订阅的客户端
+HISTORY_EVENTS = ("status", "node_start", "node_end")
+# 历史事件只保留这些字段与发生时间，node_end 的节点输出不随任务记录保留（完整结果在 job.result 中）
+HISTORY_FIELDS = ("job_id", "status", "error", "node", "task", "section", "time")
+
+
+class QueueFullError(Exception):
+    """排队的任务数已达上限"""
+
+
+@dataclass
+class Job:
+    """一个后台任务的记录"""
+
+    id: str
+    request: Dict[str, Any]
+    priority: str = "normal"
+    status: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    thread_id: Optional[str] = None
+    # 订阅时补发的历史事件：事件类型、节点与时间
+    events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        """不含结果的状态摘要"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "thread_id": self.thread_id,
+        }
+
+
+class JobStore:
+    """任务记录的存储基类，记录只保存在进程内；子类实现 _persist/_delete/_load 以落盘"""
+
+    backend = "memory"
+
+    def __init__(self, retention: Optional[float] = 86400.0):
+        self.retention = retention
+        self.jobs: Dict[str, Job] = {}
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def save(self, job: Job) -> None:
+        self.jobs[job.id] = job
+        await self._persist(job)
+
+    async def load(self) -> List[Job]:
+        """读取已保存的任务（启动时调用）"""
+        for job in await self._load():
+            self.jobs[job.id] = job
+        return list(self.jobs.values())
+
+    async def prune(self) -> int:
+        """删除结束时间早于保留期限的任务"""
+        if self.retention is None:
+            return 0
+        deadline = time.time() - self.retention
+        expired = [job.id for job in self.jobs.values() if job.finished is not None and job.finished < deadline]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            await self._delete(expired)
+        return len(expired)
+
+    async def close(self) -> None:
+        pass
+
+    async def _persist(self, job: Job) -> None:
+        pass
+
+    async def _delete(self, job_ids: List[str]) -> None:
+        pass
+
+    async def _load(self) -> List[Job]:
+        return []
+
+
+class SQLiteJobStore(JobStore):
+    """把任务记录写入本地SQLite文件，进程重启后仍可查询结果"""
+
+    backend = "sqlite"
+    COLUMNS = ("id", "request", "priority", "status", "created", "started", "finished", "result", "error", "thread_id")
+
+    def __init__(self, path: str, retention: Optional[float] = 86400.0):
+        super().__init__(retention)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, request TEXT NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL, "
+            "created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT, thread_id TEXT)"
+        )
+        self._conn.commit()
+
+    def _write(self, job: Job) -> None:
+        row = asdict(job)
+        row["request"] = json.dumps(job.request, ensure_ascii=False)
+        row["result"] = json.dumps(to_jsonable(job.result), ensure_ascii=False) if job.result is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                tuple(row[column] for column in self.COLUMNS),
+            )
+            self._conn.commit()
+
+    def _read(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs ORDER BY created").fetchall()
+        jobs = []
+        for row in rows:
+            values = dict(zip(self.COLUMNS, row))
+            values["request"] = json.loads(values["request"])
+            values["result"] = json.loads(values["result"]) if values["result"] is not None else None
+            jobs.append(Job(**values))
+        return jobs
+
+    def _remove(self, job_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+            self._conn.commit()
+
+    async def _persist(self, job: Job) -> None:
+        await asyncio.to_thread(self._write, job)
+
+    async def _delete(self, job_ids: List[str]) -> None:
+        await asyncio.to_thread(self._remove, job_ids)
+
+    async def _load(self) -> List[Job]:
+        return await asyncio.to_thread(self._read)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store() -> JobStore:
+    """根据环境变量创建任务存储"""
+    retention = float(os.getenv("FRAMEWORK_JOB_RETENTION", "86400"))
+    if os.getenv("FRAMEWORK_JOB_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteJobStore(os.getenv("FRAMEWORK_JOB_PATH", "framework_jobs.sqlite"), retention=retention)
+    return JobStore(retention=retention)
+
+
+def job_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """任务结束时保存的结果"""
+    return {
+        "final_framework": result["final_framework"],
+        "refinement_count": result["refinement_count"],
+        "refinement_stop_reason": result.get("refinement_stop_reason", ""),
+        "validation": result.get("validation"),
+        "model_escalated": result.get("model_escalated", False),
+        "llm_calls": result.get("llm_calls", []),
+        "metrics": summarize_calls(result.get("llm_calls", [])),
+    }
+
+
+class JobManager:
+    """有界的后台任务池：优先级队列 + 固定数目的工作协程"""
+
+    def __init__(self, graph, store: Optional[JobStore] = None, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.graph = graph
+        self.store = store or create_job_store()
+        self.workers = workers or int(os.getenv("FRAMEWORK_JOB_WORKERS", "4"))
+        self.max_queue = max_queue or int(os.getenv("FRAMEWORK_JOB_QUEUE_SIZE", "100"))
+        self._queue: "asyncio.PriorityQueue" = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._queued = 0
+        self._running: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """启动工作协程；上次未完成的任务重新排队（不受排队上限限制）"""
+        for job in sorted(await self.store.load(), key=lambda job: job.created):
+            if job.status in ("queued", "running"):
+                job.status = "queued"
+                await self.store.save(job)
+                self._enqueue(job)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """停止工作协程；运行中的任务保持 running 状态，下次启动时重新排队"""
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.store.close()
+
+    def _enqueue(self, job: Job) -> None:
+        self._queued += 1
+        self._queue.put_nowait((PRIORITIES[job.priority], next(self._order), job.id))
+
+    async def submit(self, item: BatchItem, priority: str = "normal") -> Job:
+        """提交一个任务；排队数已达上限时抛出 QueueFullError"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的优先级 {priority!r}，可选 {', '.join(PRIORITIES)}")
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"排队的任务已达上限 {self.max_queue}")
+        job_id = uuid.uuid4().hex
+        job = Job(
+            id=job_id,
+            request=item.model_dump(),
+            priority=priority,
+            thread_id=job_id if self.graph.checkpointer is not None else None,
+        )
+        await self.store.save(job)
+        self._enqueue(job)
+        self._publish(job, "status", {"status": job.status})
+        await self.store.prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """任务前面还有多少个排队的任务（不在排队时为 None）"""
+        if job.status != "queued":
+            return None
+        rank = (PRIORITIES[job.priority], job.created)
+        return sum(
+            1 for other in self.store.jobs.values()
+            if other.status == "queued" and other.id != job.id and (PRIORITIES[other.priority], other.created) <= rank
+        )
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消排队或运行中的任务；已结束的任务原样返回"""
+        job = self.store.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        if job.status == "queued":
+            self._queued -= 1
+            await self._finish(job, "cancelled")
+        else:
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or job.status != "queued":
+                # 排队期间已被取消
+                continue
+            self._queued -= 1
+            task = asyncio.create_task(self._run(job))
+            self._running[job_id] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                # 工作池停止：中断当前任务，保持 running 状态以便下次启动时继续
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            finally:
+                self._running.pop(job_id, None)
+            if task.cancelled() and job.status not in FINISHED and not self._stopping:
+                await self._finish(job, "cancelled")
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started = "running", time.time()
+        await self.store.save(job)
+        self._publish(job, "status", {"status": job.status})
+
+        config = thread_config({"metadata": {"request_id": f"job-{job.id}"}}, job.thread_id)
+        state: Optional[Dict[str, Any]] = initial_state_for(BatchItem.model_validate(job.request))
+        if job.thread_id is not None:
+            snapshot = await self.graph.aget_state(config)
+            if snapshot.values and snapshot.next:
+                # 进程重启前已经运行了一部分，从检查点继续
+                state = None
+
+        try:
+            async for event in stream_graph_events(self.graph, state, config):
+                if event["event"] == "final":
+                    job.result = job_result(event["data"]["output"])
+                else:
+                    self._publish(job, event["event"], event["data"])
+        except asyncio.CancelledError:
+            if not self._stopping:
+                await self._finish(job, "cancelled")
+            raise
+        except Exception as e:
+            await self._finish(job, "failed", error=f"{type(e).__name__}: {e}")
+            return
+        await self._finish(job, "succeeded")
+
+    async def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status, job.finished, job.error = status, time.time(), error
+        await self.store.save(job)
+        self._publish(job, "status", {"status": status, "error": error})
+
+    def _publish(self, job: Job, event: str, data: Dict[str, Any]) -> None:
+        message = {"event": event, "data": {"job_id": job.id, **data}}
+        if event in HISTORY_EVENTS:
+            message["data"]["time"] = time.time()
+            history = {key: value for key, value in message["data"].items() if key in HISTORY_FIELDS}
+            job.events.append({"event": event, "data": history})
+        for queue in self._subscribers.get(job.id, ()):
+            queue.put_nowait(message)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """先补发已发生的状态与节点事件（不含节点输出），再推送新事件，直到任务结束"""
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        history = list(job.events) or [{"event": "status", "data": {"job_id": job.id, "status": job.status, "error": job.error}}]
+        if job.status in FINISHED:
+            for message in history:
+                yield message
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            for message in history:
+                yield message
+            while True:
+                message = await queue.get()
+                yield message
+                if message["event"] == "status" and message["data"]["status"] in FINISHED:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """排队数、运行数、容量与拒绝次数"""
+        statuses: Dict[str, int] = {}
+        for job in self.store.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "backend": self.store.backend,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "running": len(self._running),
+            "rejected": self.rejected,
+            "jobs": statuses,
+        }
@@ -0,0 +1,501 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from langchain_core.callbacks import adispatch_custom_event
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages.ai import UsageMetadata, add_usage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
+
+from agent.budget import estimate_tokens, fit_prompt, output_limit, prompt_limit, with_output_limit
+from agent.cache import cache_key, get_response_cache, model_params
+from agent.clients import llm_registry
+from agent.configuration import get_llm_by_config
+from agent.metrics import estimate_cost
+from agent.routing import ProviderHealth, get_provider_health
+from agent.scheduler import get_provider_scheduler, is_throttling_error
+from agent.streaming import ATTEMPT_DISCARDED_EVENT, ATTEMPT_METADATA_KEY, chunk_text, join_chunks
+
+
+# 遇到限流时由调度器退避后重试的最大次数
+MAX_THROTTLE_RETRIES = int(os.getenv("LLM_THROTTLE_RETRIES", "3"))
+
+T = TypeVar("T")
+
+
+def request_id_from_config(config: Optional[RunnableConfig]) -> str:
+    """从运行配置中取出用于公平排队的请求标识（thread_id 或 metadata.request_id）"""
+    if not config:
+        return "default"
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    return str(thread_id or (config.get("metadata") or {}).get("request_id") or "default")
+
+
+# 需要显式标记缓存断点的服务商；OpenAI/Gemini 对相同前缀自动缓存
+CACHE_CONTROL_PROVIDERS = {"anthropic"}
+
+
+def provider_messages(messages: List[BaseMessage], provider: str) -> List[BaseMessage]:
+    """按服务商调整提示词中的系统消息
+
+    框架提示词的系统消息由两个文本块组成：共享的期刊示例前缀与节点说明。
+    Anthropic 在前缀块上加 cache_control 断点；其他服务商合并为普通字符串，
+    保持前缀逐字节相同，以命中自动前缀缓存。
+    """
+    prepared = []
+    for message in messages:
+        if isinstance(message, SystemMessage) and isinstance(message.content, list):
+            if provider in CACHE_CONTROL_PROVIDERS:
+                blocks = [dict(block) for block in message.content]
+                blocks[0]["cache_control"] = {"type": "ephemeral"}
+                message = SystemMessage(content=blocks)
+            else:
+                message = SystemMessage(content="\n\n".join(block["text"] for block in message.content))
+        prepared.append(message)
+    return prepared
+
+
+def merge_usage(chunks) -> Optional[UsageMetadata]:
+    """合并流式输出各块的用量（Anthropic 在首块报告输入token，在末块报告输出token）"""
+    usage = None
+    for chunk in chunks:
+        if getattr(chunk, "usage_metadata", None):
+            usage = add_usage(usage, chunk.usage_metadata) if usage else chunk.usage_metadata
+    return usage
+
+
+@dataclass
+class LLMCall:
+    """节点的一次模型调用：提示词模板、输入与所用的模型"""
+
+    node: str
+    prompt: ChatPromptTemplate
+    inputs: Dict[str, Any]
+    api_config: str
+    model: str
+    bypass_cache: bool = False
+    request_id: str = "default"
+    # 预估的输出token数，用于token限额；未设置 max_output_tokens 时据此留出余量作为输出上限
+    expected_output_tokens: int = 2000
+    # 输出上限（max_tokens）与提示词的token上限（None 为只受上下文窗口限制），见 agent.budget
+    max_output_tokens: Optional[int] = None
+    max_prompt_tokens: Optional[int] = None
+    # 设置后按该模式返回结构化结果（见 run_structured_call）
+    schema: Optional[Type[BaseModel]] = None
+    # 按顺序的备用模型链 [(api_config, model), ...]，以及对冲请求的首token等待秒数（None 为不对冲）
+    fallbacks: List[Tuple[str, str]] = field(default_factory=list)
+    hedge_after: Optional[float] = None
+    # 调用结束后记录的token用量
+    usage: Optional[UsageMetadata] = field(default=None, repr=False)
+    response_cache_hit: bool = False
+    # 耗时与首个token的时间（秒），从开始排队算起
+    latency: float = 0.0
+    time_to_first_token: Optional[float] = None
+    # 实际发起的请求数（含出错换用的备用模型与对冲请求）
+    attempts: int = 1
+    # 渲染后提示词的token数，以及为放进预算裁剪掉的token数
+    prompt_tokens: int = 0
+    trimmed_tokens: int = 0
+    # 备用模型链上各候选的标识，事件流据此只转发胜出候选的增量文本
+    attempt_id: str = field(default="", repr=False)
+    _messages: Optional[List[BaseMessage]] = field(default=None, repr=False)
+    _started: float = field(default=0.0, repr=False)
+
+    @property
+    def llm(self):
+        return get_llm_by_config(self.api_config, self.model)
+
+    @property
+    def request_llm(self):
+        """设置了本节点输出上限的模型，用于实际请求与缓存键"""
+        return with_output_limit(self.llm, self.provider, self.output_limit)
+
+    @property
+    def output_limit(self) -> int:
+        return output_limit(self.expected_output_tokens, self.max_output_tokens)
+
+    @property
+    def provider(self) -> str:
+        return llm_registry.resolve_key(self.api_config, self.model).provider
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """渲染后的提示词消息（只渲染一次）
+
+        渲染时按主模型与备用模型中最小的上下文窗口裁剪到预算以内，放不下时抛出 PromptTooLargeError，
+        在查缓存与排队之前就拒绝请求。
+        """
+        if self._messages is None:
+            models = [self.model] + [model for _, model in self.fallbacks]
+            limit = prompt_limit(models, self.output_limit, self.max_prompt_tokens)
+            self.inputs, self._messages, self.prompt_tokens, self.trimmed_tokens = fit_prompt(
+                self.prompt, self.inputs, self.model, limit, self.node,
+            )
+        return self._messages
+
+    @property
+    def request_messages(self) -> List[BaseMessage]:
+        """按服务商调整后实际发送的消息"""
+        return provider_messages(self.messages, self.provider)
+
+    def estimated_tokens(self) -> int:
+        self.messages
+        return self.prompt_tokens + self.expected_output_tokens
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+
+    def observe_chunk(self, chunk) -> bool:
+        """记录首个带文本的输出块到达的时间，该块是首个token时返回 True"""
+        if self.time_to_first_token is None and chunk_text(chunk):
+            self.time_to_first_token = time.perf_counter() - self._started
+            return True
+        return False
+
+    def finish(self) -> None:
+        self.latency = time.perf_counter() - self._started
+        # 非流式的结构化调用以整体完成的时间计
+        if self.time_to_first_token is None:
+            self.time_to_first_token = self.latency
+
+    def report(self) -> Dict[str, Any]:
+        """本次调用的用量记录，cached_tokens 为命中服务商提示词缓存的输入token数"""
+        usage = self.usage or {}
+        details = usage.get("input_token_details") or {}
+        tokens = {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0),
+            "cache_creation_tokens": details.get("cache_creation", 0),
+        }
+        return {
+            "node": self.node,
+            "provider": self.provider,
+            "model": self.model,
+            "response_cache_hit": self.response_cache_hit,
+            "attempts": self.attempts,
+            "prompt_tokens": self.prompt_tokens,
+            "trimmed_tokens": self.trimmed_tokens,
+            **tokens,
+            "latency_ms": round(self.latency * 1000, 1),
+            "time_to_first_token_ms": round((self.time_to_first_token or 0.0) * 1000, 1),
+            "cost_usd": estimate_cost(self.model, **tokens),
+        }
+
+    def cache_key(self, llm) -> str:
+        params = model_params(llm)
+        if self.schema is not None:
+            params["schema"] = self.schema.__name__
+        return cache_key(self.messages, params)
+
+
+def _attempts(call: LLMCall) -> List[LLMCall]:
+    """主模型与备用模型链上的各候选调用，共享已渲染的提示词与开始时间"""
+    call.messages
+    targets = [(call.api_config, call.model)] + call.fallbacks
+    return [
+        replace(call, api_config=api_config, model=model, fallbacks=[], attempt_id=uuid.uuid4().hex)
+        for api_config, model in targets
+    ]
+
+
+async def _discard(attempts: List[LLMCall]) -> None:
+    """通知事件流丢弃出错或落败候选已输出的增量文本；不在图中运行（没有事件流）时忽略"""
+    for attempt in attempts:
+        try:
+            await adispatch_custom_event(ATTEMPT_DISCARDED_EVENT, {"attempt": attempt.attempt_id})
+        except RuntimeError:
+            return
+
+
+def _launchable(attempts: List[LLMCall], health: ProviderHealth) -> Iterator[LLMCall]:
+    """依次产出熔断器放行的候选；全部处于熔断时仍尝试主模型"""
+    launched = False
+    for attempt in attempts:
+        if health.allow(attempt.provider):
+            launched = True
+            yield attempt
+    if not launched:
+        yield attempts[0]
+
+
+def _adopt(call: LLMCall, winner: LLMCall, attempts: int) -> None:
+    """把胜出候选的模型与用量记到调用上"""
+    call.api_config, call.model = winner.api_config, winner.model
+    call.usage = winner.usage
+    call.time_to_first_token = winner.time_to_first_token
+    call.attempts = attempts
+    call.finish()
+
+
+def _run_routed(call: LLMCall, run_attempt: Callable[[LLMCall], T]) -> Tuple[LLMCall, T]:
+    """同步路径：按备用模型链依次尝试，出错时换下一个候选（不发起对冲请求）"""
+    health = get_provider_health()
+    call.start()
+    error: Optional[Exception] = None
+    for count, attempt in enumerate(_launchable(_attempts(call), health), 1):
+        try:
+            result = run_attempt(attempt)
+        except Exception as e:
+            health.record_failure(attempt.provider)
+            error = e
+            continue
+        health.record_success(attempt.provider)
+        _adopt(call, attempt, count)
+        return attempt, result
+    raise error
+
+
+async def _arun_routed(
+    call: LLMCall,
+    run_attempt: Callable[[LLMCall, Callable[[LLMCall], None]], Awaitable[T]],
+    hedge_after: Optional[float] = None,
+) -> Tuple[LLMCall, T]:
+    """按备用模型链执行一次调用，返回 (胜出的候选, 结果)
+
+    候选出错时换下一个；设置 hedge_after 时，若该秒数内还没有候选输出首个token，就向下一个候选发起对冲请求。
+    先输出首个token的候选胜出，其余请求被取消；胜出者中途出错时继续换下一个候选。
+    出错或被取消的候选会通知事件流丢弃其已输出的增量文本（见 streaming.stream_graph_events）。
+    """
+    health = get_provider_health()
+    call.start()
+    candidates = _launchable(_attempts(call), health)
+    running: Dict[asyncio.Task, LLMCall] = {}
+    first_token = asyncio.Event()
+    leader: List[LLMCall] = []
+    launched = 0
+    exhausted = False
+    error: Optional[BaseException] = None
+
+    def on_first_token(attempt: LLMCall) -> None:
+        if not leader:
+            leader.append(attempt)
+            first_token.set()
+
+    def launch(hedge: bool = False) -> bool:
+        nonlocal launched, exhausted
+        attempt = next(candidates, None)
+        if attempt is None:
+            exhausted = True
+            return False
+        if hedge:
+            health.record_hedge(attempt.provider)
+        launched += 1
+        running[asyncio.create_task(run_attempt(attempt, on_first_token))] = attempt
+        return True
+
+    def cancel(tasks: List[asyncio.Task]) -> List[LLMCall]:
+        cancelled = [running.pop(task) for task in tasks]
+        for task, attempt in zip(tasks, cancelled):
+            task.cancel()
+            health.record_cancelled(attempt.provider)
+        return cancelled
+
+    waiter: Optional[asyncio.Future] = None
+    launch()
+    try:
+        while running:
+            hedging = hedge_after is not None and not leader and not exhausted
+            waiter = None if leader else asyncio.ensure_future(first_token.wait())
+            done, _ = await asyncio.wait(
+                [*running, *([waiter] if waiter else [])],
+                timeout=hedge_after if hedging else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if waiter:
+                waiter.cancel()
+            for task in done:
+                if task is waiter:
+                    continue
+                attempt = running.pop(task)
+                if task.exception() is None:
+                    health.record_success(attempt.provider)
+                    await _discard(cancel(list(running)))
+                    _adopt(call, attempt, launched)
+                    return attempt, task.result()
+                health.record_failure(attempt.provider)
+                error = task.exception()
+                await _discard([attempt])
+                if leader and leader[0] is attempt:
+                    leader.clear()
+                    first_token.clear()
+            if leader:
+                # 已有候选输出首个token，取消其余请求
+                await _discard(cancel([task for task, attempt in running.items() if attempt is not leader[0]]))
+            elif not done and hedging:
+                launch(hedge=True)
+            if not running:
+                launch()
+    finally:
+        # 调用被取消（例如任务被取消）时等待中的 waiter 也要一并取消；
+        # 进行中的请求与对冲落败者一样记为取消，释放半开熔断器的探测名额
+        if waiter:
+            waiter.cancel()
+        cancel(list(running))
+    raise error
+
+
+def _winner_key(key: str, primary: Tuple[str, str], winner: LLMCall) -> str:
+    """结果写入缓存的键：胜出的是备用模型时按该模型计算"""
+    if (winner.api_config, winner.model) == primary:
+        return key
+    return winner.cache_key(winner.request_llm)
+
+
+def _stream_attempt(attempt: LLMCall) -> list:
+    chunks = []
+    for chunk in attempt.request_llm.stream(attempt.request_messages):
+        attempt.observe_chunk(chunk)
+        chunks.append(chunk)
+    attempt.usage = merge_usage(chunks)
+    return chunks
+
+
+def run_llm_call(call: LLMCall) -> str:
+    """以流式方式执行一次模型调用，使增量输出可以通过图的事件流实时推送
+
+    相同的渲染后提示词与模型参数命中响应缓存时直接返回缓存结果；
+    bypass_cache 为真时跳过读取缓存，但仍用新结果刷新缓存。
+    设置了备用模型链时出错换用下一个模型，结果按实际使用的模型写入缓存。
+    同步路径不经过调度器（调度器基于 asyncio），也不发起对冲请求。
+    """
+    cache = get_response_cache()
+    key = call.cache_key(call.request_llm)
+    if not call.bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            call.response_cache_hit = True
+            return cached
+
+    primary = (call.api_config, call.model)
+    winner, chunks = _run_routed(call, _stream_attempt)
+    output = join_chunks(chunks)
+    if output:
+        cache.set(_winner_key(key, primary, winner), output)
+    return output
+
+
+async def _run_scheduled(call: LLMCall, invoke: Callable[[Callable[[float], None]], Awaitable[T]]) -> T:
+    """在调度器的通道中执行一次调用；遇到限流时重新排队，最多重试 MAX_THROTTLE_RETRIES 次"""
+    scheduler = get_provider_scheduler()
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        try:
+            async with scheduler.slot(call.provider, call.model, call.request_id, call.estimated_tokens()) as record_usage:
+                return await invoke(record_usage)
+        except Exception as e:
+            # 限流错误已由调度器收缩并发并暂停通道，重新排队即可
+            if not is_throttling_error(e) or attempt == MAX_THROTTLE_RETRIES:
+                raise
+    raise AssertionError("unreachable")
+
+
+async def _astream_attempt(attempt: LLMCall, on_first_token: Callable[[LLMCall], None]) -> list:
+    llm = attempt.request_llm
+
+    async def invoke(record_usage):
+        chunks = []
+        config = {"metadata": {ATTEMPT_METADATA_KEY: attempt.attempt_id}}
+        async for chunk in llm.astream(attempt.request_messages, config=config):
+            if attempt.observe_chunk(chunk):
+                on_first_token(attempt)
+            chunks.append(chunk)
+        attempt.usage = merge_usage(chunks)
+        if attempt.usage:
+            record_usage(attempt.usage.get("total_tokens", 0))
+        return chunks
+
+    return await _run_scheduled(attempt, invoke)
+
+
+async def arun_llm_call(call: LLMCall) -> str:
+    """run_llm_call 的异步版本：等待模型输出时不阻塞事件循环，并经过服务商调度器排队限流
+
+    设置 hedge_after 时，主模型迟迟没有首个token会向备用模型发起对冲请求。
+    """
+    cache = get_response_cache()
+    key = call.cache_key(call.request_llm)
+    if not call.bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            call.response_cache_hit = True
+            return cached
+
+    primary = (call.api_config, call.model)
+    winner, chunks = await _arun_routed(call, _astream_attempt, call.hedge_after)
+    output = join_chunks(chunks)
+    if output:
+        await cache.aset(_winner_key(key, primary, winner), output)
+    return output
+
+
+def _parse_structured(call: LLMCall, result: Dict[str, Any]) -> BaseModel:
+    """取出 with_structured_output(include_raw=True) 的解析结果，解析失败时抛出异常"""
+    if result.get("parsing_error") is not None:
+        raise result["parsing_error"]
+    parsed = result.get("parsed")
+    if parsed is None:
+        raise ValueError(f"{call.node}: 模型未返回 {call.schema.__name__} 结构")
+    return parsed
+
+
+def _structured_attempt(attempt: LLMCall) -> BaseModel:
+    structured = attempt.request_llm.with_structured_output(attempt.schema, include_raw=True)
+    result = structured.invoke(attempt.request_messages)
+    attempt.usage = getattr(result.get("raw"), "usage_metadata", None)
+    return _parse_structured(attempt, result)
+
+
+def run_structured_call(call: LLMCall) -> BaseModel:
+    """执行一次结构化输出调用，返回 call.schema 的实例
+
+    与 run_llm_call 共用响应缓存，缓存中保存结果的JSON；解析失败也会换用备用模型。
+    """
+    cache = get_response_cache()
+    key = call.cache_key(call.request_llm)
+    if not call.bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            call.response_cache_hit = True
+            return call.schema.model_validate_json(cached)
+
+    primary = (call.api_config, call.model)
+    winner, parsed = _run_routed(call, _structured_attempt)
+    cache.set(_winner_key(key, primary, winner), parsed.model_dump_json())
+    return parsed
+
+
+async def _astructured_attempt(attempt: LLMCall, on_first_token: Callable[[LLMCall], None]) -> BaseModel:
+    structured = attempt.request_llm.with_structured_output(attempt.schema, include_raw=True)
+
+    async def invoke(record_usage):
+        result = await structured.ainvoke(attempt.request_messages)
+        attempt.usage = getattr(result.get("raw"), "usage_metadata", None)
+        if attempt.usage:
+            record_usage(attempt.usage.get("total_tokens", 0))
+        return result
+
+    return _parse_structured(attempt, await _run_scheduled(attempt, invoke))
+
+
+async def arun_structured_call(call: LLMCall) -> BaseModel:
+    """run_structured_call 的异步版本，经过服务商调度器排队限流
+
+    结构化输出不流式返回，没有首个token可以比较，因此只在出错时换用备用模型，不发起对冲请求。
+    """
+    cache = get_response_cache()
+    key = call.cache_key(call.request_llm)
+    if not call.bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            call.response_cache_hit = True
+            return call.schema.model_validate_json(cached)
+
+    primary = (call.api_config, call.model)
+    winner, parsed = await _arun_routed(call, _astructured_attempt)
+    await cache.aset(_winner_key(key, primary, winner), parsed.model_dump_json())
+    return parsed
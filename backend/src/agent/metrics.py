@@ -0,0 +1,217 @@
+"""LLM调用的耗时、token用量与费用统计
+
+每次模型调用的记录（``LLMCall.report()``）在进程内按 节点/服务商/模型 汇总为直方图与计数器，
+由 ``/metrics`` 以 Prometheus 文本格式导出；``summarize_calls`` 汇总单次运行的记录，附在运行结果中。
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# 每百万token的美元价格：(输入, 输出, 缓存读取, 缓存写入)，按模型名的最长前缀匹配
+DEFAULT_MODEL_PRICES: Dict[str, Tuple[float, float, float, float]] = {
+    "gpt-4o": (2.5, 10.0, 1.25, 2.5),
+    "gpt-4o-mini": (0.15, 0.6, 0.075, 0.15),
+    "gpt-4.1": (2.0, 8.0, 0.5, 2.0),
+    "gpt-4.1-mini": (0.4, 1.6, 0.1, 0.4),
+    "claude-3-5-sonnet": (3.0, 15.0, 0.3, 3.75),
+    "claude-3-5-haiku": (0.8, 4.0, 0.08, 1.0),
+    "claude-sonnet-4": (3.0, 15.0, 0.3, 3.75),
+    "claude-opus-4": (15.0, 75.0, 1.5, 18.75),
+    "gemini-2.0-flash": (0.1, 0.4, 0.025, 0.1),
+    "gemini-2.5-flash": (0.3, 2.5, 0.075, 0.3),
+    "gemini-2.5-pro": (1.25, 10.0, 0.31, 1.25),
+}
+
+# 秒
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+LABELS = ("node", "provider", "model")
+TOKEN_TYPES = ("input", "output", "cached", "cache_creation")
+
+
+def load_model_prices() -> Dict[str, Tuple[float, float, float, float]]:
+    """默认价格表，``LLM_MODEL_PRICES`` 环境变量（JSON，模型前缀 -> 四个价格）可以覆盖或补充"""
+    prices = dict(DEFAULT_MODEL_PRICES)
+    raw = os.getenv("LLM_MODEL_PRICES")
+    if raw:
+        prices.update({model: tuple(value) for model, value in json.loads(raw).items()})
+    return prices
+
+
+def model_price(model: str, prices: Dict[str, Tuple[float, float, float, float]]) -> Optional[Tuple[float, float, float, float]]:
+    matches = [prefix for prefix in prices if model.startswith(prefix)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cached_tokens: int = 0,
+    cache_creation_tokens: int = 0,
+    prices: Optional[Dict[str, Tuple[float, float, float, float]]] = None,
+) -> float:
+    """按价格表估算一次调用的美元费用；input_tokens 包含缓存读取与写入的部分，未知模型按 0 计"""
+    price = model_price(model, get_model_prices() if prices is None else prices)
+    if price is None:
+        return 0.0
+    input_price, output_price, cache_read_price, cache_write_price = price
+    uncached = max(input_tokens - cached_tokens - cache_creation_tokens, 0)
+    return (
+        uncached * input_price
+        + cached_tokens * cache_read_price
+        + cache_creation_tokens * cache_write_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+class Histogram:
+    """累积分桶的直方图（Prometheus 语义）"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, result = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((f"{bound:g}", total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Tuple[str, ...], **extra: str) -> str:
+    pairs = list(zip(LABELS, key)) + list(extra.items())
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class LLMMetrics:
+    """进程内的LLM调用统计，按 (节点, 服务商, 模型) 分组"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[Tuple[Tuple[str, ...], str], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, ...], Histogram] = defaultdict(Histogram)
+        self.time_to_first_token: Dict[Tuple[str, ...], Histogram] = defaultdict(Histogram)
+        self.tokens: Dict[Tuple[Tuple[str, ...], str], int] = defaultdict(int)
+        self.cost: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self.trimmed: Dict[Tuple[str, ...], int] = defaultdict(int)
+
+    def observe(self, report: Dict[str, Any]) -> None:
+        """记录一次调用；命中响应缓存的调用只计入调用次数与裁剪掉的提示词token"""
+        key = tuple(str(report[name]) for name in LABELS)
+        with self._lock:
+            self.calls[key, "hit" if report["response_cache_hit"] else "miss"] += 1
+            # 裁剪发生在查缓存之前，命中缓存的调用也计入
+            self.trimmed[key] += report.get("trimmed_tokens", 0)
+            if report["response_cache_hit"]:
+                return
+            self.latency[key].observe(report["latency_ms"] / 1000)
+            self.time_to_first_token[key].observe(report["time_to_first_token_ms"] / 1000)
+            for kind in TOKEN_TYPES:
+                self.tokens[key, kind] += report[f"{kind}_tokens"]
+            self.cost[key] += report["cost_usd"]
+
+    def clear(self) -> None:
+        with self._lock:
+            for metric in (self.calls, self.latency, self.time_to_first_token, self.tokens, self.cost, self.trimmed):
+                metric.clear()
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP framework_llm_calls_total LLM calls by node, provider and model.",
+                "# TYPE framework_llm_calls_total counter",
+            ]
+            lines += [
+                f"framework_llm_calls_total{_labels(key, response_cache=hit)} {count}"
+                for (key, hit), count in sorted(self.calls.items())
+            ]
+            for name, histograms, help_text in (
+                ("framework_llm_latency_seconds", self.latency, "LLM call wall time, including scheduler queueing."),
+                ("framework_llm_time_to_first_token_seconds", self.time_to_first_token, "Time to the first output token."),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, histogram in sorted(histograms.items()):
+                    lines += [f"{name}_bucket{_labels(key, le=bound)} {count}" for bound, count in histogram.cumulative()]
+                    lines.append(f"{name}_sum{_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            lines += [
+                "# HELP framework_llm_tokens_total Tokens by type (input includes cached and cache_creation).",
+                "# TYPE framework_llm_tokens_total counter",
+            ]
+            lines += [
+                f"framework_llm_tokens_total{_labels(key, type=kind)} {count}"
+                for (key, kind), count in sorted(self.tokens.items())
+            ]
+            lines += [
+                "# HELP framework_llm_cost_usd_total Estimated cost in US dollars.",
+                "# TYPE framework_llm_cost_usd_total counter",
+            ]
+            lines += [f"framework_llm_cost_usd_total{_labels(key)} {cost:.6f}" for key, cost in sorted(self.cost.items())]
+            lines += [
+                "# HELP framework_llm_prompt_trimmed_tokens_total Prompt tokens trimmed to fit the token budget.",
+                "# TYPE framework_llm_prompt_trimmed_tokens_total counter",
+            ]
+            lines += [
+                f"framework_llm_prompt_trimmed_tokens_total{_labels(key)} {count}" for key, count in sorted(self.trimmed.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def summarize_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总一次运行的调用记录：合计与按节点的调用数、耗时、token、裁剪掉的提示词token与费用"""
+
+    def empty() -> Dict[str, Any]:
+        return {"calls": 0, "response_cache_hits": 0, "latency_ms": 0.0, "cost_usd": 0.0, "trimmed_tokens": 0,
+                **{f"{kind}_tokens": 0 for kind in TOKEN_TYPES}}
+
+    total, by_node = empty(), defaultdict(empty)
+    for call in calls:
+        for summary in (total, by_node[call["node"]]):
+            summary["calls"] += 1
+            summary["response_cache_hits"] += call["response_cache_hit"]
+            summary["latency_ms"] += call.get("latency_ms", 0.0)
+            summary["cost_usd"] += call.get("cost_usd", 0.0)
+            summary["trimmed_tokens"] += call.get("trimmed_tokens", 0)
+            for kind in TOKEN_TYPES:
+                summary[f"{kind}_tokens"] += call[f"{kind}_tokens"]
+    return {"total": total, "by_node": dict(by_node)}
+
+
+_model_prices: Optional[Dict[str, Tuple[float, float, float, float]]] = None
+_llm_metrics = LLMMetrics()
+
+
+def get_model_prices() -> Dict[str, Tuple[float, float, float, float]]:
+    """价格表（首次使用时读取环境变量，保证 .env 已加载）"""
+    global _model_prices
+    if _model_prices is None:
+        _model_prices = load_model_prices()
+    return _model_prices
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """进程内共享的LLM调用统计"""
+    return _llm_metrics
@@ -1,6 +1,10 @@
 from datetime import datetime
 
 
+# 提示词版本：修改框架相关提示词时递增，使旧的响应缓存失效
+PROMPT_VERSION = "2"
+
+
 # Get current date in a readable format
 def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
@@ -71,14 +75,21 @@ Please provide a well-structured answer with proper citations."""
 
 
 # 新增论文Framework生成提示词
+#
+# 系统提示词分为两块：所有框架节点共享的期刊示例前缀，以及各节点自己的说明。
+# 前缀只依赖目标期刊，放在最前面，使服务商的提示词缓存（Anthropic cache_control、
+# OpenAI 自动前缀缓存）可以在同一期刊的所有调用之间复用；研究主题等每次请求不同的
+# 内容只出现在用户消息中。
+framework_examples_prefix = """以下是目标期刊中已发表论文的框架部分示例。后续任务中，请学习示例中框架部分的结构和写法，不考虑其具体内容。
+
+{journal_examples}"""
+
+
 framework_generation_instructions = """你是一位资深的学术研究专家，十分擅长撰写NLP领域的aci论文，专门负责为论文生成高质量的框架部分。
 
 你的任务是基于给定的研究主题、方法和目标期刊要求，不考虑引言、相关工作、实验部分、结论和参考文献，只生成一个结构清晰、逻辑严密的框架部分。
 
-期刊中已发表的论文的框架部分：
-{journal_examples}
-
-请学习给出论文的框架部分是如何写的，分析示例中论文结构，不考虑内容，只考虑写法，再参考示例结构撰写论文。
+请学习上述示例中论文的框架部分是如何写的，分析示例中论文结构，不考虑内容，只考虑写法，再参考示例结构撰写论文。
 
 要求：
 - 框架部分要符合目标期刊的学术标准
@@ -88,12 +99,6 @@ framework_generation_instructions = """你是一位资深的学术研究专家
 - 语言表达专业、准确
 - 避免AI式话语
 
-请为以下研究生成理论框架：
-
-研究主题：{paper_topic}
-研究方法：{methodology}
-目标期刊：{journal_requirements}
-
 请生成一个完整的理论框架。"""
 
 
@@ -101,9 +106,6 @@ framework_refinement_instructions = """你是一位资深的学术研究专家
 
 你的任务是对现有的理论框架进行改进，使其更加完善、逻辑更加严密，并更好地符合目标期刊的要求。
 
-期刊示例格式：
-{journal_examples}
-
 精炼要求：
 1. 改进逻辑结构和层次关系
 2. 增强理论依据和文献支持
@@ -112,26 +114,28 @@ framework_refinement_instructions = """你是一位资深的学术研究专家
 5. 强化理论贡献和创新点
 6. 确保符合期刊学术标准
 
-请基于当前框架进行精炼改进。
+请基于当前框架进行精炼改进，生成精炼后的框架。"""
 
-请对以下理论框架进行精炼改进：
 
-研究主题：{paper_topic}
-研究方法：{methodology}
-目标期刊：{journal_requirements}
-当前框架：{current_framework}
+framework_validation_instructions = """你是一位资深的学术期刊审稿专家，负责评估理论框架的质量和合规性。
 
-请生成精炼后的框架。"""
+你的任务是对理论框架进行全面的质量评估，确保其符合目标期刊的学术标准和要求。
 
+评估维度：
+1. 理论贡献和创新性
+2. 逻辑结构和完整性
+3. 文献基础和理论依据
+4. 研究设计的合理性
+5. 方法论的适用性
+6. 学术表达的规范性
+7. 期刊要求的符合度
 
-framework_validation_instructions = """你是一位资深的学术期刊审稿专家，负责评估理论框架的质量和合规性。
+请对框架进行详细评估，提供详细的质量评估和改进建议。"""
 
-你的任务是对理论框架进行全面的质量评估，确保其符合目标期刊的学术标准和要求。
 
-期刊示例格式：
-{journal_examples}
+framework_structured_validation_instructions = """你是一位资深的学术期刊审稿专家，负责评估理论框架的质量和合规性，并给出结构化的评审结果。
 
-评估维度：
+请按以下维度逐项打分（1-10分）并简要说明理由：
 1. 理论贡献和创新性
 2. 逻辑结构和完整性
 3. 文献基础和理论依据
@@ -140,13 +144,52 @@ framework_validation_instructions = """你是一位资深的学术期刊审稿
 6. 学术表达的规范性
 7. 期刊要求的符合度
 
-请对框架进行详细评估，并提供改进建议。
+评审要求：
+- 给出总体评分（1-10分）
+- 只有框架无需再修改即可达到目标期刊标准时才判定为通过
+- 未通过时列出具体、可执行的修改意见，每条针对框架中的一个具体问题；通过时修改意见为空
+- 未通过时列出需要修改的小节标题（与框架中的标题一致）"""
+
+
+framework_outline_instructions = """你是一位资深的学术研究专家，十分擅长撰写NLP领域的aci论文，负责为论文的框架部分拟定提纲。
+
+请学习示例中框架部分的结构，不考虑内容，只考虑写法，为给定研究拟定框架部分的小节提纲。
+
+要求：
+- 只考虑框架部分，不包括引言、相关工作、实验部分、结论和参考文献
+- 按行文顺序排列小节，小节数量见用户要求
+- 每个小节给出标题和 2 到 4 个要点，不撰写正文
+- 小节之间逻辑递进，研究方法与框架匹配"""
+
+
+framework_section_instructions = """你是一位资深的学术研究专家，十分擅长撰写NLP领域的aci论文，正在与其他作者分工撰写论文框架部分中的一个小节。
+
+请学习给出论文的框架部分是如何写的，只考虑写法，按照提纲撰写指定的小节。
 
-请评估以下理论框架的质量：
+要求：
+- 只撰写指定小节的正文，不要重复小节标题，不要撰写其他小节
+- 覆盖该小节的全部要点，与提纲中前后小节衔接自然
+- 篇幅见用户要求
+- 杜绝主观陈述，要以客观视角撰写
+- 语言表达专业、准确，避免AI式话语"""
+
+
+framework_section_critique_instructions = """你是一位资深的学术期刊审稿专家，负责找出理论框架中需要修改的小节。
+
+请逐节审阅理论框架，从逻辑结构、理论依据、概念定义、研究设计、期刊规范等方面找出存在明显问题的小节。
 
-研究主题：{paper_topic}
-研究方法：{methodology}
-目标期刊：{journal_requirements}
-理论框架：{current_framework}
+要求：
+- 只列出确实需要修改的小节，质量已经达标的小节不要列出
+- 小节标题必须与框架中的标题完全一致
+- 每个小节给出具体、可执行的问题描述
+- 所有小节都已达标时返回空列表"""
+
+
+framework_section_revision_instructions = """你是一位资深的学术研究专家，负责修改理论框架中的一个小节。
 
-请提供详细的质量评估和改进建议。"""
+要求：
+- 只输出修改后的小节正文，不要重复小节标题，不要撰写其他小节
+- 逐条解决给出的问题，没有问题的内容尽量保持原样
+- 与框架中其他小节保持衔接，不引入与其他小节重复的内容
+- 杜绝主观陈述，要以客观视角撰写
+- 语言表达专业、准确，避免AI式话语"""
@@ -0,0 +1,175 @@
+"""多服务商路由：备用模型链与熔断
+
+一次调用可以带一条按顺序排列的备用链（``fallback_models``，如 ``"api2:claude-sonnet-4-20250514,api3:gemini-2.0-flash"``）。
+主模型出错时换下一个候选；设置 ``hedge_after`` 时，候选在该秒数内没有输出首个token就向下一个候选发起对冲请求，
+先输出首个token的一方胜出，其余请求被取消（见 ``llm_call.arun_llm_call``）。
+
+各服务商的健康状态由熔断器跟踪：连续失败达到阈值后熔断，熔断期间跳过该服务商；
+冷却时间过后放行一次探测请求，成功则恢复，失败则继续熔断。
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from agent.clients import has_api_config
+
+
+def parse_model_target(value: Optional[str], default_api_config: str) -> Optional[Tuple[str, str]]:
+    """把 ``"api_config:model"`` 或单独的模型名解析为 (api_config, model)，单独的模型名使用 default_api_config
+
+    冒号前不是已注册的服务配置时整体视为模型名（如 ``ft:gpt-4o-mini:org``）。
+    """
+    if not value:
+        return None
+    api_config, sep, model = value.partition(":")
+    if sep and model and has_api_config(api_config):
+        return api_config.strip(), model.strip()
+    return default_api_config, value.strip()
+
+
+def parse_fallbacks(value: Union[str, Sequence[str], None]) -> List[Tuple[str, str]]:
+    """把 ``"api_config:model,..."`` 或其列表解析为 [(api_config, model), ...]"""
+    if not value:
+        return []
+    items = value.split(",") if isinstance(value, str) else value
+    fallbacks = []
+    for item in items:
+        item = item.strip()
+        if not item:
+            continue
+        api_config, sep, model = item.partition(":")
+        if not sep or not model:
+            raise ValueError(f"备用模型应写作 api_config:model，收到 {item!r}")
+        fallbacks.append((api_config.strip(), model.strip()))
+    return fallbacks
+
+
+def validate_fallbacks(value: Union[str, Sequence[str], None]) -> List[Tuple[str, str]]:
+    """解析备用模型链并检查每个 api_config 都已注册，格式错误或配置未知时抛出 ValueError
+
+    接口与启动时调用：未注册的配置在图中会被当作默认服务商，只有真正需要备用模型时才会出错。
+    """
+    fallbacks = parse_fallbacks(value)
+    unknown = [f"{api_config}:{model}" for api_config, model in fallbacks if not has_api_config(api_config)]
+    if unknown:
+        raise ValueError(f"备用模型中的 api_config 未注册：{', '.join(unknown)}")
+    return fallbacks
+
+
+class CircuitBreaker:
+    """单个服务商的熔断器：closed（正常）-> open（熔断）-> half_open（放行一次探测）"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.hedges = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否可以向该服务商发起请求；half_open 时只放行一个探测请求"""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def record_cancelled(self) -> None:
+        """对冲中落败被取消的请求不计为失败，但释放探测名额"""
+        self.cancelled += 1
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+        }
+
+
+class ProviderHealth:
+    """跨请求共享的各服务商熔断器"""
+
+    def __init__(self, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self._breakers[provider]
+
+    def allow(self, provider: str) -> bool:
+        with self._lock:
+            return self._breaker(provider).allow()
+
+    def record_success(self, provider: str) -> None:
+        with self._lock:
+            self._breaker(provider).record_success()
+
+    def record_failure(self, provider: str) -> None:
+        with self._lock:
+            self._breaker(provider).record_failure()
+
+    def record_cancelled(self, provider: str) -> None:
+        with self._lock:
+            self._breaker(provider).record_cancelled()
+
+    def record_hedge(self, provider: str) -> None:
+        with self._lock:
+            self._breaker(provider).hedges += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """各服务商的熔断状态与成功/失败/取消/对冲次数"""
+        with self._lock:
+            return {provider: breaker.stats() for provider, breaker in self._breakers.items()}
+
+
+_provider_health: Optional[ProviderHealth] = None
+
+
+def get_provider_health() -> ProviderHealth:
+    """获取进程内共享的熔断器（首次使用时按环境变量创建）"""
+    global _provider_health
+    if _provider_health is None:
+        _provider_health = ProviderHealth()
+    return _provider_health
+
+
+def set_provider_health(health: ProviderHealth) -> None:
+    """替换共享的熔断器，用于测试或自定义阈值"""
+    global _provider_health
+    _provider_health = health
@@ -0,0 +1,275 @@
+"""按服务商/模型限流的调度器
+
+每个 (provider, model) 是一条通道（lane），通道内：
+
+- 两个令牌桶分别限制每分钟请求数与每分钟token数；
+- 排队的调用按请求（request_id）轮转出队，一个大请求不会饿死其他请求；
+- 并发上限按 AIMD 自适应：遇到限流响应（429）减半并暂停，成功调用逐步加一。
+
+限额通过环境变量 ``LLM_RATE_LIMITS`` 配置（JSON），键为 ``provider`` 或 ``provider:model``::
+
+    {"openai": {"rpm": 500, "tpm": 200000, "concurrency": 8},
+     "anthropic:claude-3-5-sonnet-latest": {"rpm": 50}}
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+@dataclass
+class RateLimits:
+    """一条通道的限额，None 表示不限制"""
+
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    concurrency: int = 16
+
+
+def load_rate_limits() -> Dict[str, RateLimits]:
+    """从 ``LLM_RATE_LIMITS`` 环境变量读取各通道的限额"""
+    raw = os.getenv("LLM_RATE_LIMITS")
+    if not raw:
+        return {}
+    return {key: RateLimits(**value) for key, value in json.loads(raw).items()}
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """判断异常是否为服务商的限流响应"""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "ResourceExhausted" in name or "TooManyRequests" in name
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """读取限流响应中的 Retry-After 头"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶：按 ``per_minute`` 的速率补充，最多积攒 ``burst_seconds`` 秒的额度"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """取出 amount 个令牌还需等待的秒数；超过容量的请求按满桶处理"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正预估值，amount 为正表示多用了"""
+        self.tokens -= amount
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued", "epoch")
+
+    def __init__(self, future: asyncio.Future, tokens: float):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.epoch = 0
+
+
+class _Lane:
+    """一个 (provider, model) 通道的排队与限流状态"""
+
+    def __init__(self, limits: RateLimits):
+        self.limits = limits
+        self.requests = TokenBucket(limits.rpm) if limits.rpm else None
+        self.tokens = TokenBucket(limits.tpm) if limits.tpm else None
+        self.limit = limits.concurrency
+        self.in_flight = 0
+        self.queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.paused_until = 0.0
+        self.successes_since_increase = 0
+        self.consecutive_throttles = 0
+        # 每次收缩并发时递增；放行时间早于最近一次收缩的调用再遇到限流，视为同一次拥塞
+        self.epoch = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # 指标
+        self.granted = 0
+        self.throttles = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _schedule(self, delay: float) -> None:
+        if self.timer is not None and not self.timer.cancelled():
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(delay, self.pump)
+
+    def pump(self) -> None:
+        """在并发与限额允许时，按请求轮转放行排队的调用"""
+        self.timer = None
+        while self.queues and self.in_flight < self.limit:
+            now = time.monotonic()
+            if now < self.paused_until:
+                self._schedule(self.paused_until - now)
+                return
+
+            request_id, queue = next(iter(self.queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():
+                # 已取消的等待者
+                queue.popleft()
+                if not queue:
+                    del self.queues[request_id]
+                continue
+
+            wait = max(
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(waiter.tokens) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            queue.popleft()
+            if queue:
+                self.queues.move_to_end(request_id)
+            else:
+                del self.queues[request_id]
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(waiter.tokens)
+
+            waited = now - waiter.enqueued
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.granted += 1
+            self.in_flight += 1
+            waiter.epoch = self.epoch
+            waiter.future.set_result(None)
+
+    def release(self, epoch: int, throttled: bool, retry_after: Optional[float]) -> None:
+        self.in_flight -= 1
+        if throttled:
+            self.throttles += 1
+        if throttled and epoch == self.epoch:
+            # 乘性减小并暂停通道
+            self.epoch += 1
+            self.consecutive_throttles += 1
+            self.limit = max(1, self.limit // 2)
+            self.successes_since_increase = 0
+            backoff = retry_after or min(30.0, 2.0 ** (self.consecutive_throttles - 1))
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+        elif not throttled:
+            # 加性增大：每成功 limit 次并发上限加一
+            self.consecutive_throttles = 0
+            self.successes_since_increase += 1
+            if self.limit < self.limits.concurrency and self.successes_since_increase >= self.limit:
+                self.limit += 1
+                self.successes_since_increase = 0
+        self.pump()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "waiting_requests": len(self.queues),
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.limit,
+            "max_concurrency": self.limits.concurrency,
+            "granted": self.granted,
+            "throttles": self.throttles,
+            "wait_avg_ms": self.wait_total / self.granted * 1000 if self.granted else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+
+class ProviderScheduler:
+    """跨请求共享的服务商调度器"""
+
+    def __init__(self, limits: Optional[Dict[str, RateLimits]] = None, default: Optional[RateLimits] = None):
+        self.limits = load_rate_limits() if limits is None else limits
+        self.default = default or RateLimits(concurrency=int(os.getenv("LLM_DEFAULT_CONCURRENCY", "16")))
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+
+    def _lane(self, provider: str, model: str) -> _Lane:
+        key = (provider, model)
+        if key not in self._lanes:
+            limits = self.limits.get(f"{provider}:{model}") or self.limits.get(provider) or self.default
+            self._lanes[key] = _Lane(limits)
+        return self._lanes[key]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str, request_id: str = "default", tokens: float = 0):
+        """排队获取一次调用的执行权，退出时根据是否遇到限流调整并发
+
+        Yields:
+            一个回调，调用方拿到实际token用量后可调用它修正预估值。
+        """
+        lane = self._lane(provider, model)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens)
+        lane.queues.setdefault(request_id, deque()).append(waiter)
+        lane.pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已放行但调用方被取消，归还并发额度
+                lane.release(waiter.epoch, throttled=False, retry_after=None)
+            raise
+
+        def record_usage(actual_tokens: float) -> None:
+            if lane.tokens and actual_tokens:
+                lane.tokens.adjust(actual_tokens - tokens)
+
+        try:
+            yield record_usage
+        except BaseException as e:
+            throttled = isinstance(e, Exception) and is_throttling_error(e)
+            lane.release(waiter.epoch, throttled, retry_after_seconds(e) if throttled else None)
+            raise
+        else:
+            lane.release(waiter.epoch, throttled=False, retry_after=None)
+
+    def stats(self) -> Dict[str, Any]:
+        """各通道的排队深度、等待时间与限流次数"""
+        return {f"{provider}:{model}": lane.stats() for (provider, model), lane in self._lanes.items()}
+
+
+_provider_scheduler: Optional[ProviderScheduler] = None
+
+
+def get_provider_scheduler() -> ProviderScheduler:
+    """获取进程内共享的调度器（首次使用时按环境变量创建）"""
+    global _provider_scheduler
+    if _provider_scheduler is None:
+        _provider_scheduler = ProviderScheduler()
+    return _provider_scheduler
+
+
+def set_provider_scheduler(scheduler: ProviderScheduler) -> None:
+    """替换共享的调度器，用于测试或自定义限额"""
+    global _provider_scheduler
+    _provider_scheduler = scheduler
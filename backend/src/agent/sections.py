@@ -0,0 +1,112 @@
+"""理论框架按小节拆分与拼接"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# 小节标题：Markdown标题、“3.1 标题”式编号标题、“一、标题”式中文编号标题
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_NUMBERED_HEADING = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+(\S.{0,60})$")
+_CHINESE_HEADING = re.compile(r"^[一二三四五六七八九十]+、\s*(\S.{0,60})$")
+
+
+def format_outline(sections: Iterable[Dict[str, Any]]) -> str:
+    """把提纲整理为编号列表，供各小节的提示词引用"""
+    lines = []
+    for number, section in enumerate(sections, 1):
+        lines.append(f"{number}. {section['section_name']}")
+        lines += [f"   - {point}" for point in section.get("key_points", [])]
+    return "\n".join(lines)
+
+
+def _strip_heading(content: str, section_name: str) -> str:
+    """去掉模型在正文开头重复输出的小节标题"""
+    content = content.strip()
+    first_line, _, rest = content.partition("\n")
+    if first_line.lstrip("#").strip().strip("*").strip() == section_name.strip():
+        return rest.strip()
+    return content
+
+
+def merge_sections(sections: List[Dict[str, Any]]) -> str:
+    """按提纲顺序把各小节拼接为完整框架，每节以二级标题开头"""
+    ordered = sorted(sections, key=lambda section: section["index"])
+    return "\n\n".join(
+        f"## {section['section_name']}\n\n{_strip_heading(section['content'], section['section_name'])}"
+        for section in ordered
+    )
+
+
+def _heading(line: str) -> Optional[tuple]:
+    """识别标题行，返回 (层级, 标题)；不是标题时返回 None"""
+    line = line.strip()
+    match = _MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2).strip("* ")
+    match = _NUMBERED_HEADING.match(line)
+    if match and not match.group(2).endswith(("。", "．", ".")):
+        return match.group(1).count(".") + 1, line
+    match = _CHINESE_HEADING.match(line)
+    if match:
+        return 1, line
+    return None
+
+
+def split_sections(framework: str) -> List[Dict[str, Any]]:
+    """按标题把框架拆分为小节，使用至少出现两次的最高一级标题
+
+    每个小节包含 index、section_name、heading（原标题行）与 content（原样保留的正文）。
+    第一个标题之前的文字作为标题为空的小节保留，join_sections 可以还原出原文。
+    """
+    lines = framework.split("\n")
+    headings = [(number, *heading) for number, heading in ((n, _heading(line)) for n, line in enumerate(lines)) if heading]
+    levels = sorted({heading_level for _, heading_level, _ in headings})
+    level = next((lv for lv in levels if sum(1 for _, heading_level, _ in headings if heading_level == lv) >= 2), None)
+    if level is None:
+        return [{"index": 0, "section_name": "", "heading": "", "content": framework}]
+    starts = [(number, name) for number, heading_level, name in headings if heading_level == level]
+
+    sections = []
+    if starts[0][0] > 0:
+        sections.append({"section_name": "", "heading": "", "content": "\n".join(lines[:starts[0][0]])})
+    for position, (number, name) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(lines)
+        sections.append({"section_name": name, "heading": lines[number], "content": "\n".join(lines[number + 1:end])})
+    for index, section in enumerate(sections):
+        section["index"] = index
+    return sections
+
+
+def join_sections(sections: List[Dict[str, Any]]) -> str:
+    """split_sections 的逆操作"""
+    return "\n".join(
+        f"{section['heading']}\n{section['content']}" if section["heading"] else section["content"]
+        for section in sorted(sections, key=lambda section: section["index"])
+    )
+
+
+def splice_sections(sections: List[Dict[str, Any]], revised: List[Dict[str, Any]]) -> str:
+    """用修改后的小节正文替换对应小节，其余小节原样保留"""
+    replacements = {section["index"]: section["content"] for section in revised}
+    return join_sections([
+        {**section, "content": f"\n{_strip_heading(replacements[section['index']], section['section_name'])}\n"}
+        if section["index"] in replacements else section
+        for section in sections
+    ])
+
+
+def _normalize_name(name: str) -> str:
+    name = _heading(name)[1] if _heading(name) else name
+    return re.sub(r"^[\d.\s一二三四五六七八九十、]+", "", name).strip("*# ").casefold()
+
+
+def find_section(sections: List[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+    """按标题查找小节，忽略编号、Markdown标记与大小写，允许标题互相包含"""
+    target = _normalize_name(name)
+    if not target:
+        return None
+    for section in sections:
+        candidate = _normalize_name(section["section_name"])
+        if candidate and (candidate == target or target in candidate or candidate in target):
+            return section
+    return None
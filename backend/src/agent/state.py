@@ -1,11 +1,63 @@
 from __future__ import annotations
 
+import operator
+import uuid
 from dataclasses import dataclass, field
-from typing import TypedDict, List, Dict, Any
+from typing import TypedDict, List, Dict, Any, Optional
 
+from langchain_core.messages import RemoveMessage, convert_to_messages, message_chunk_to_message
 from langgraph.graph import add_messages
+from typing_extensions import Annotated, NotRequired
 from typing_extensions import Annotated
-from typing_extensions import Annotated
+
+
+class MessageList(list):
+    """append_messages 产出的消息列表，附带按id的下标索引
+
+    索引随状态值本身传递：下一步合并时 left 正是这个列表，直接复用其索引。
+    经检查点序列化后还原为普通 list，下一次合并时重新建立索引即可。
+    """
+
+    __slots__ = ("index",)
+
+    def __init__(self, messages=(), index: Optional[Dict[str, int]] = None):
+        super().__init__(messages)
+        self.index = index if index is not None else {m.id: i for i, m in enumerate(self)}
+
+
+def append_messages(left: list, right: list) -> list:
+    """add_messages 的增量版本
+
+    语义与 add_messages 相同（按id替换、RemoveMessage 删除）。当 left 是上一步产出的 MessageList 时，
+    只处理 right 中的新消息，在复制的索引上追加或替换，不再对整个历史做转换和重建索引，
+    使每一步的合并耗时与历史长度基本无关。
+    """
+    if not isinstance(right, list):
+        right = [right]
+    right = [message_chunk_to_message(m) for m in convert_to_messages(right)]
+
+    if not isinstance(left, MessageList) or len(left.index) != len(left) or any(isinstance(m, RemoveMessage) for m in right):
+        # 首次合并、从检查点还原或需要删除消息时走完整路径，并为结果建立索引
+        return MessageList(add_messages(left, right))
+
+    merged = MessageList(left, dict(left.index))
+    for m in right:
+        if m.id is None:
+            m.id = str(uuid.uuid4())
+        existing_idx = merged.index.get(m.id)
+        if existing_idx is not None:
+            merged[existing_idx] = m
+        else:
+            merged.index[m.id] = len(merged)
+            merged.append(m)
+    return merged
+
+
+def collect_sections(left: Optional[list], right: Optional[list]) -> list:
+    """并行小节任务结果的归并：追加新结果，写入 None 时清空"""
+    if right is None:
+        return []
+    return (left or []) + right
 
 @dataclass(kw_only=True)
 
@@ -30,7 +82,7 @@ class PaperWritingState(TypedDict):
 
 # 新增论文Framework生成相关状态
 class PaperFrameworkState(TypedDict):
-    messages: Annotated[list, add_messages]
+    messages: Annotated[list, append_messages]
     paper_topic: str
     methodology: str
     journal_requirements: str
@@ -40,9 +92,86 @@ class PaperFrameworkState(TypedDict):
     current_framework: str
     refinement_count: int
     final_framework: str
+    # 为真时本次运行跳过响应缓存的读取
+    bypass_cache: NotRequired[bool]
+    # 收敛检测：相邻两版相似度达到该阈值时提前结束精炼，不设置时使用 Configuration 的默认值
+    convergence_threshold: NotRequired[Optional[float]]
+    min_refinement_loops: NotRequired[int]
+    # 最近一次精炼与上一版的相似度（开启收敛检测时记录）
+    framework_similarity: NotRequired[float]
+    # 精炼结束的原因：converged（已收敛）、passed（结构化验证通过）或 max_loops（达到次数上限）
+    refinement_stop_reason: NotRequired[str]
+    # 验证方式（text / structured），不设置时使用 Configuration 的默认值
+    validation_mode: NotRequired[str]
+    validation_pass_score: NotRequired[float]
+    # 最近一次结构化验证的结果（FrameworkValidation 的字段）
+    validation: NotRequired[Dict[str, Any]]
+    # 分节生成：generation_mode 为 sections 时使用
+    generation_mode: NotRequired[str]
+    framework_outline: NotRequired[List[Dict[str, Any]]]
+    # 并行生成/修改的小节结果
+    framework_sections: NotRequired[Annotated[List[Dict[str, Any]], collect_sections]]
+    # 分节精炼：refinement_mode 为 sections 时本轮待修改的小节（index 与 issues）
+    refinement_mode: NotRequired[str]
+    section_revisions: NotRequired[List[Dict[str, Any]]]
+    # 每次模型调用的用量记录（节点、模型、输入/输出token、命中服务商缓存的token等）
+    llm_calls: NotRequired[Annotated[List[Dict[str, Any]], operator.add]]
+    # 备用模型链与对冲等待秒数，不设置时使用 Configuration 的默认值
+    fallback_models: NotRequired[Optional[str]]
+    hedge_after: NotRequired[Optional[float]]
+    # 按节点选择的模型，不设置时使用 framework_model
+    generate_model: NotRequired[Optional[str]]
+    refine_model: NotRequired[Optional[str]]
+    validate_model: NotRequired[Optional[str]]
+    escalate_on_failure: NotRequired[Optional[bool]]
+    # 渲染后提示词的token上限，不设置时使用 Configuration 的默认值
+    max_prompt_tokens: NotRequired[Optional[int]]
+    # 较便宜模型的稿件未通过验证后，精炼改用 framework_model
+    model_escalated: NotRequired[bool]
+    # 升级后是否已用 framework_model 精炼过（精炼次数用完时只允许这一次）
+    escalation_refined: NotRequired[bool]
+
+
+class SectionTask(TypedDict):
+    """分节生成时派发给 generate_section 的输入"""
+    paper_topic: str
+    methodology: str
+    journal_requirements: str
+    framework_model: str
+    api_config: str
+    bypass_cache: NotRequired[bool]
+    fallback_models: NotRequired[Optional[str]]
+    hedge_after: NotRequired[Optional[float]]
+    generate_model: NotRequired[Optional[str]]
+    refine_model: NotRequired[Optional[str]]
+    model_escalated: NotRequired[bool]
+    max_prompt_tokens: NotRequired[Optional[int]]
+    outline: str
+    section_index: int
+    section: Dict[str, Any]
+    section_length: int
 
 
 class FrameworkGenerationState(TypedDict):
     framework_content: str
     section_breakdown: dict[str, str]
     citations: list[dict]
+
+
+class SectionRevisionTask(TypedDict):
+    """分节精炼时派发给 revise_section 的输入"""
+    paper_topic: str
+    methodology: str
+    journal_requirements: str
+    framework_model: str
+    api_config: str
+    bypass_cache: NotRequired[bool]
+    fallback_models: NotRequired[Optional[str]]
+    hedge_after: NotRequired[Optional[float]]
+    generate_model: NotRequired[Optional[str]]
+    refine_model: NotRequired[Optional[str]]
+    model_escalated: NotRequired[bool]
+    max_prompt_tokens: NotRequired[Optional[int]]
+    headings: str
+    section: Dict[str, Any]
+    issues: List[str]
@@ -0,0 +1,127 @@
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Set
+
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+
+from agent.metrics import summarize_calls
+
+
+# 图中会向前端报告进度的节点
+GRAPH_NODES = (
+    "generate_framework",
+    "outline_framework",
+    "generate_section",
+    "merge_sections",
+    "refine_framework",
+    "revise_section",
+    "splice_sections",
+    "validate_framework",
+)
+# 备用模型链上各候选的模型调用在 metadata 中带有该键（见 llm_call._arun_routed）；
+# 候选出错或落败时派发 ATTEMPT_DISCARDED_EVENT 自定义事件，事件流据此丢弃其增量文本
+ATTEMPT_METADATA_KEY = "llm_attempt"
+ATTEMPT_DISCARDED_EVENT = "llm_attempt_discarded"
+
+
+def chunk_text(chunk: BaseMessageChunk) -> str:
+    """提取消息块中的文本（兼容字符串内容与Anthropic式的内容块列表）"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
+
+def join_chunks(chunks: Iterable[BaseMessageChunk]) -> str:
+    """把流式输出的消息块拼接成完整文本"""
+    return "".join(chunk_text(chunk) for chunk in chunks)
+
+
+def to_jsonable(value: Any) -> Any:
+    """把状态中的消息对象转换为可JSON序列化的结构"""
+    if isinstance(value, BaseMessage):
+        data = {"type": value.type, "content": value.content, "id": value.id}
+        # 框架草稿与历史摘要以 name 标记，客户端回传历史时据此压缩
+        if value.name:
+            data["name"] = value.name
+        return data
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条带类型的SSE事件"""
+    payload = json.dumps(to_jsonable(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_graph_events(graph, initial_state: Dict[str, Any], config=None) -> AsyncIterator[Dict[str, Any]]:
+    """把图的运行过程转换为带类型的事件流
+
+    事件类型：
+        - ``node_start``: 节点开始执行，``{"node": ..., "task": ...}``；分节生成时还带有 ``"section"`` 小节标题
+        - ``token``: 模型输出的增量文本，``{"node": ..., "task": ..., "delta": ...}``
+        - ``reset``: 该任务此前的增量文本作废（模型中途出错换用备用模型），``{"node": ..., "task": ...}``；
+          客户端清空已收到的文本，之后的 ``token`` 来自备用模型
+        - ``node_end``: 节点执行结束，``{"node": ..., "task": ..., "output": 节点返回的状态更新}``
+        - ``final``: 整个图执行结束，``{"output": 最终状态, "metrics": 本次运行的用量汇总}``
+
+    ``task`` 标识节点的一次执行，并行生成的各小节据此区分各自的增量文本。
+    同一任务同时有多个候选在输出时（对冲请求）只转发最先输出的一个，其余暂存，
+    当前候选被丢弃时发出 ``reset`` 再转发暂存的下一个候选。
+    """
+    root_run_id = None
+    # 各任务正在转发的候选、其余候选暂存的增量文本，以及已丢弃的候选
+    streaming: Dict[str, str] = {}
+    held: Dict[str, Dict[str, List[str]]] = {}
+    discarded: Set[str] = set()
+    async for event in graph.astream_events(initial_state, config=config, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+        if root_run_id is None and kind == "on_chain_start":
+            root_run_id = event["run_id"]
+            continue
+
+        node = event.get("metadata", {}).get("langgraph_node")
+        task = event.get("metadata", {}).get("langgraph_checkpoint_ns")
+        # 只报告图直接调度的节点任务，忽略节点内部同名的可运行对象
+        is_node_task = name in GRAPH_NODES and event.get("parent_ids") == [root_run_id]
+        if kind == "on_chain_start" and is_node_task:
+            data = {"node": name, "task": task}
+            section = (event["data"].get("input") or {}).get("section")
+            if section:
+                data["section"] = section["section_name"]
+            yield {"event": "node_start", "data": data}
+        elif kind == "on_chat_model_stream" and node in GRAPH_NODES:
+            delta = chunk_text(event["data"]["chunk"])
+            attempt = event.get("metadata", {}).get(ATTEMPT_METADATA_KEY)
+            if not delta or attempt in discarded:
+                continue
+            if attempt and streaming.setdefault(task, attempt) != attempt:
+                held.setdefault(task, {}).setdefault(attempt, []).append(delta)
+                continue
+            yield {"event": "token", "data": {"node": node, "task": task, "delta": delta}}
+        elif kind == "on_custom_event" and name == ATTEMPT_DISCARDED_EVENT:
+            attempt = event["data"]["attempt"]
+            discarded.add(attempt)
+            pending = held.get(task, {})
+            pending.pop(attempt, None)
+            if streaming.get(task) != attempt:
+                continue
+            del streaming[task]
+            yield {"event": "reset", "data": {"node": node, "task": task}}
+            if pending:
+                attempt = next(iter(pending))
+                streaming[task] = attempt
+                for delta in pending.pop(attempt):
+                    yield {"event": "token", "data": {"node": node, "task": task, "delta": delta}}
+        elif kind == "on_chain_end" and is_node_task:
+            yield {"event": "node_end", "data": {"node": name, "task": task, "output": event["data"].get("output")}}
+        elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+            output = event["data"].get("output") or {}
+            yield {"event": "final", "data": {"output": output, "metrics": summarize_calls(output.get("llm_calls", []))}}
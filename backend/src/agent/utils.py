@@ -1,41 +1,102 @@
-from typing import Any, Dict, List
-from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, SystemMessage
+
+from agent.history import SUMMARY_NAME
 
 
 def get_research_topic(messages: List[AnyMessage]) -> str:
     """
     Get the research topic from the messages.
+    A compacted history starts with a running summary of the older turns, which is kept.
     """
     # check if request has a history and combine the messages into a single string
     if len(messages) == 1:
-        research_topic = messages[-1].content
-    else:
-        research_topic = ""
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                research_topic += f"User: {message.content}\n"
-            elif isinstance(message, AIMessage):
-                research_topic += f"Assistant: {message.content}\n"
-    return research_topic
+        return messages[-1].content
+    lines = []
+    for message in messages:
+        if isinstance(message, SystemMessage) and message.name == SUMMARY_NAME:
+            lines.append(f"{message.content}\n")
+        elif isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}\n")
+        elif isinstance(message, AIMessage):
+            lines.append(f"Assistant: {message.content}\n")
+    return "".join(lines)
 
 
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     """
     Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
     Ensures each original URL gets a consistent shortened form while maintaining uniqueness.
+    Chunks without a web uri are skipped; the index in the short url is the position of the
+    URL's first occurrence, so it is stable for a given list of chunks.
     """
     prefix = f"https://vertexaisearch.cloud.google.com/id/"
-    urls = [site.web.uri for site in urls_to_resolve]
-
-    # Create a dictionary that maps each unique URL to its first occurrence index
     resolved_map = {}
-    for idx, url in enumerate(urls):
-        if url not in resolved_map:
+    for idx, site in enumerate(urls_to_resolve):
+        url = getattr(getattr(site, "web", None), "uri", None)
+        if url and url not in resolved_map:
             resolved_map[url] = f"{prefix}{id}-{idx}"
-
     return resolved_map
 
 
+def citation_marker(citation: Dict[str, Any]) -> str:
+    """The markdown links inserted after a cited segment."""
+    return "".join(f" [{segment['label']}]({segment['short_url']})" for segment in citation["segments"])
+
+
+class CitationInserter:
+    """
+    Inserts citation markers into text that arrives in pieces, in a single pass.
+
+    Markers are kept in a heap ordered by (end_index, start_index); each call to ``feed``
+    emits the new text with every marker whose end_index falls inside it, so the total
+    work is O(n + k log k) for n characters and k citations. Citations can be added while
+    streaming; one whose end_index has already been emitted is placed at the current
+    position. ``finish`` flushes markers that point past the end of the text.
+
+    The output is identical to inserting the markers one by one from the end of the
+    original text (markers sharing an end_index are ordered by start_index, and ties keep
+    the reverse of their input order).
+    """
+
+    def __init__(self, citations_list: Iterable[Dict[str, Any]] = ()):
+        self.offset = 0
+        self._pending: List[Tuple[int, int, int, str]] = []
+        self._added = 0
+        self.add(citations_list)
+
+    def add(self, citations_list: Iterable[Dict[str, Any]]) -> None:
+        for citation in citations_list:
+            self._added += 1
+            marker = citation_marker(citation)
+            if marker:
+                heapq.heappush(self._pending, (citation["end_index"], citation["start_index"], -self._added, marker))
+
+    def feed(self, chunk: str) -> str:
+        """Return ``chunk`` with the markers that fall inside it."""
+        end = self.offset + len(chunk)
+        pieces, pos = [], 0
+        while self._pending and self._pending[0][0] <= end:
+            index, _, _, marker = heapq.heappop(self._pending)
+            split = max(index - self.offset, 0)
+            if split > pos:
+                pieces.append(chunk[pos:split])
+                pos = split
+            pieces.append(marker)
+        if not pieces:
+            self.offset = end
+            return chunk
+        pieces.append(chunk[pos:])
+        self.offset = end
+        return "".join(pieces)
+
+    def finish(self) -> str:
+        """Markers whose end_index lies beyond the text, appended at the end."""
+        markers = [heapq.heappop(self._pending)[3] for _ in range(len(self._pending))]
+        return "".join(markers)
+
+
 def insert_citation_markers(text, citations_list):
     """
     Inserts citation markers into a text string based on start and end indices.
@@ -44,35 +105,25 @@ def insert_citation_markers(text, citations_list):
         text (str): The original text string.
         citations_list (list): A list of dictionaries, where each dictionary
                                contains 'start_index', 'end_index', and
-                               'segment_string' (the marker to insert).
+                               'segments' (the links to insert, see get_citations).
                                Indices are assumed to be for the original text.
 
     Returns:
         str: The text with citation markers inserted.
+
+    All splice points are collected first and the result is built with a single
+    join, so long documents with many citations take linear time. Use
+    CitationInserter directly for streamed text.
     """
-    # Sort citations by end_index in descending order.
-    # If end_index is the same, secondary sort by start_index descending.
-    # This ensures that insertions at the end of the string don't affect
-    # the indices of earlier parts of the string that still need to be processed.
-    sorted_citations = sorted(
-        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
-    )
-
-    modified_text = text
-    for citation_info in sorted_citations:
-        # These indices refer to positions in the *original* text,
-        # but since we iterate from the end, they remain valid for insertion
-        # relative to the parts of the string already processed.
-        end_idx = citation_info["end_index"]
-        marker_to_insert = ""
-        for segment in citation_info["segments"]:
-            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
-        # Insert the citation marker at the original end_idx position
-        modified_text = (
-            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
-        )
-
-    return modified_text
+    inserter = CitationInserter(citations_list)
+    return inserter.feed(text) + inserter.finish()
+
+
+def _chunk_label(title: Optional[str]) -> str:
+    """Site name from a grounding chunk title such as "example.com"."""
+    if not title:
+        return ""
+    return title.split(".", 1)[0] if "." in title else title
 
 
 def get_citations(response, resolved_urls_map):
@@ -87,8 +138,8 @@ def get_citations(response, resolved_urls_map):
     Args:
         response: The response object from the Gemini model, expected to have
                   a structure including `candidates[0].grounding_metadata`.
-                  It also relies on a `resolved_map` being available in its
-                  scope to map chunk URIs to resolved URLs.
+        resolved_urls_map: The map returned by resolve_urls for the same
+                           grounding chunks.
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a citation
@@ -98,69 +149,47 @@ def get_citations(response, resolved_urls_map):
                                      if not specified.
               - "end_index" (int): The character index immediately after the
                                    end of the cited segment (exclusive).
-              - "segments" (list[str]): A list of individual markdown-formatted
-                                        links for each grounding chunk.
-              - "segment_string" (str): A concatenated string of all markdown-
-                                        formatted links for the citation.
+              - "segments" (list[dict]): The supporting chunks, each with a
+                                         "label", "short_url" and "value".
               Returns an empty list if no valid candidates or grounding supports
               are found, or if essential data is missing.
+
+    Each grounding chunk is formatted once, however many supports refer to it;
+    chunk indices that are out of range or point at chunks without a web source
+    are skipped.
     """
-    citations = []
+    candidates = getattr(response, "candidates", None) if response else None
+    if not candidates:
+        return []
+    metadata = getattr(candidates[0], "grounding_metadata", None)
+    supports = getattr(metadata, "grounding_supports", None) if metadata else None
+    if not supports:
+        return []
+
+    chunks = getattr(metadata, "grounding_chunks", None) or []
+    segments: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+    for ind, chunk in enumerate(chunks):
+        web = getattr(chunk, "web", None)
+        if web is not None and web.uri:
+            segments[ind] = {
+                "label": _chunk_label(web.title),
+                "short_url": resolved_urls_map.get(web.uri),
+                "value": web.uri,
+            }
 
-    # Ensure response and necessary nested structures are present
-    if not response or not response.candidates:
-        return citations
-
-    candidate = response.candidates[0]
-    if (
-        not hasattr(candidate, "grounding_metadata")
-        or not candidate.grounding_metadata
-        or not hasattr(candidate.grounding_metadata, "grounding_supports")
-    ):
-        return citations
-
-    for support in candidate.grounding_metadata.grounding_supports:
-        citation = {}
-
-        # Ensure segment information is present
-        if not hasattr(support, "segment") or support.segment is None:
-            continue  # Skip this support if segment info is missing
-
-        start_index = (
-            support.segment.start_index
-            if support.segment.start_index is not None
-            else 0
-        )
-
-        # Ensure end_index is present to form a valid segment
-        if support.segment.end_index is None:
-            continue  # Skip if end_index is missing, as it's crucial
-
-        # Add 1 to end_index to make it an exclusive end for slicing/range purposes
-        # (assuming the API provides an inclusive end_index)
-        citation["start_index"] = start_index
-        citation["end_index"] = support.segment.end_index
-
-        citation["segments"] = []
-        if (
-            hasattr(support, "grounding_chunk_indices")
-            and support.grounding_chunk_indices
-        ):
-            for ind in support.grounding_chunk_indices:
-                try:
-                    chunk = candidate.grounding_metadata.grounding_chunks[ind]
-                    resolved_url = resolved_urls_map.get(chunk.web.uri, None)
-                    citation["segments"].append(
-                        {
-                            "label": chunk.web.title.split(".")[:-1][0],
-                            "short_url": resolved_url,
-                            "value": chunk.web.uri,
-                        }
-                    )
-                except (IndexError, AttributeError, NameError):
-                    # Handle cases where chunk, web, uri, or resolved_map might be problematic
-                    # For simplicity, we'll just skip adding this particular segment link
-                    # In a production system, you might want to log this.
-                    pass
-        citations.append(citation)
+    citations = []
+    for support in supports:
+        segment = getattr(support, "segment", None)
+        # end_index is required to place the marker
+        if segment is None or segment.end_index is None:
+            continue
+        indices = getattr(support, "grounding_chunk_indices", None) or ()
+        citations.append({
+            "start_index": segment.start_index or 0,
+            "end_index": segment.end_index,
+            "segments": [
+                dict(segments[ind]) for ind in indices
+                if 0 <= ind < len(segments) and segments[ind] is not None
+            ],
+        })
     return citations
@@ -0,0 +1,86 @@
+"""启动预热与就绪状态
+
+服务商 SDK 在首次创建客户端时才导入，图在首次使用时才编译，冷启动与每个 worker 的内存因此只包含用到的部分。
+代价落在第一个请求上；应用启动后在后台预热，完成前 ``GET /ready`` 返回 503，负载均衡据此再把流量切过来：
+
+- 编译共享的图（启用检查点时为启动时编译的图，这里跳过）；
+- 打开期刊示例索引；
+- ``FRAMEWORK_PREWARM`` 中列出的 ``"api_config:model"``（逗号分隔）逐个创建客户端：导入对应的 SDK 并建立连接池，不发送请求。
+
+预热在线程中执行，不阻塞事件循环与启动；预热失败只记录错误，不影响就绪（首个请求会再试一次）。
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.clients import llm_registry
+from agent.routing import validate_fallbacks
+
+
+def prewarm_targets() -> List[Tuple[str, str]]:
+    """需要预热的 (api_config, model)，来自 ``FRAMEWORK_PREWARM``；格式错误或 api_config 未注册时抛出 ValueError"""
+    return validate_fallbacks(os.getenv("FRAMEWORK_PREWARM"))
+
+
+def warm_up(targets: List[Tuple[str, str]], compile_graph: bool = True) -> Dict[str, Any]:
+    """同步执行预热，返回各步骤的耗时（毫秒）与出错信息"""
+    from agent.examples import get_example_store
+    from agent.graph import get_paper_framework_graph
+
+    steps: List[Tuple[str, Any]] = [("examples", get_example_store)]
+    if compile_graph:
+        steps.insert(0, ("graph", get_paper_framework_graph))
+    steps += [(f"client:{api_config}:{model}", lambda t=(api_config, model): llm_registry.get(*t)) for api_config, model in targets]
+
+    report: Dict[str, Any] = {"steps": {}, "errors": {}}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:  # noqa: BLE001 - 预热失败不影响启动
+            report["errors"][name] = f"{type(e).__name__}: {e}"
+        report["steps"][name] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+class Readiness:
+    """应用的就绪状态：后台预热完成后变为就绪"""
+
+    def __init__(self):
+        self.ready = False
+        self.report: Dict[str, Any] = {}
+        self.started = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, targets: Optional[List[Tuple[str, str]]] = None, compile_graph: bool = True) -> None:
+        """在后台开始预热"""
+        targets = prewarm_targets() if targets is None else targets
+        self._task = asyncio.create_task(self._run(targets, compile_graph))
+
+    async def _run(self, targets: List[Tuple[str, str]], compile_graph: bool) -> None:
+        try:
+            self.report = await asyncio.to_thread(warm_up, targets, compile_graph)
+        finally:
+            self.ready = True
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        """应用关闭时取消尚未完成的预热（线程中的步骤会自行结束）"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            **self.report,
+        }